@@ -0,0 +1,132 @@
+"""Dekoodauksen vertailu: stdlib json vs orjson vs msgspec, koko vastaus vs muoto.
+
+Aja:
+  uv run python bench/decode_bench.py            # tallennetut tai synteettiset vastaukset
+  uv run python bench/decode_bench.py --record   # tallenna oikeat vastaukset TMDB:stä (vaatii avaimen)
+
+Tallennetut vastaukset: bench/payloads/<muoto>__<nimi>.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from search import decode as dec  # noqa: E402
+
+PAYLOAD_DIR = Path(__file__).parent / "payloads"
+
+SHAPES = {
+    "page": dec.Page,
+    "person": dec.PersonDetails,
+    "movie": dec.MovieDetails,
+    "tv": dec.TvDetails,
+}
+
+# Isoja vastauksia: tuotteliaat näyttelijät, laaja discover, multi-haku
+RECORD = [
+    ("person", "samuel_l_jackson", "/person/2231", {"language": "en", "append_to_response": "combined_credits"}),
+    ("person", "christopher_lee", "/person/113", {"language": "en", "append_to_response": "combined_credits"}),
+    ("page", "discover_movie", "/discover/movie", {"language": "en", "sort_by": "popularity.desc"}),
+    ("page", "search_multi_star", "/search/multi", {"language": "en", "query": "star"}),
+    ("movie", "the_matrix", "/movie/603", {"language": "en"}),
+    ("tv", "doctor_who", "/tv/57243", {"language": "en"}),
+]
+
+
+async def record() -> None:
+    import httpx
+    from search.memory import TMDB_API_KEY, TMDB_BASE
+
+    PAYLOAD_DIR.mkdir(exist_ok=True)
+    async with httpx.AsyncClient() as client:
+        for shape, name, path, params in RECORD:
+            r = await client.get(f"{TMDB_BASE}{path}", params={"api_key": TMDB_API_KEY, **params})
+            r.raise_for_status()
+            (PAYLOAD_DIR / f"{shape}__{name}.json").write_bytes(r.content)
+            print(f"tallennettu {shape}__{name}.json ({len(r.content) // 1024} KB)")
+
+
+def _synthetic_person(n_credits: int = 1500) -> bytes:
+    """Tuotteliaan näyttelijän kokoinen combined_credits, jos tallenteita ei ole."""
+    credit = {
+        "adult": False, "backdrop_path": "/abcdefghijklmnop.jpg", "genre_ids": [18, 80, 53],
+        "original_language": "en", "original_title": "Original Title", "overview": "x" * 300,
+        "popularity": 12.345, "poster_path": "/qrstuvwxyz.jpg", "release_date": "1999-03-31",
+        "title": "Some Title", "video": False, "vote_average": 7.1, "vote_count": 1234,
+        "character": "Someone", "credit_id": "52fe4a1ac3a36847f81c2e2b", "order": 3,
+        "media_type": "movie",
+    }
+    cast = [{**credit, "id": i} for i in range(n_credits)]
+    crew = [{**credit, "id": i, "job": "Producer", "department": "Production"} for i in range(n_credits // 5)]
+    person = {
+        "id": 2231, "name": "Synthetic Person", "biography": "y" * 2000, "birthday": "1948-12-21",
+        "known_for_department": "Acting", "place_of_birth": "Somewhere",
+        "combined_credits": {"cast": cast, "crew": crew},
+    }
+    return json.dumps(person).encode()
+
+
+def _payloads() -> list[tuple[str, str, bytes]]:
+    files = sorted(PAYLOAD_DIR.glob("*__*.json")) if PAYLOAD_DIR.exists() else []
+    if files:
+        return [(f.stem.split("__")[0], f.stem, f.read_bytes()) for f in files]
+    print("Ei tallennettuja vastauksia — käytetään synteettistä (aja --record oikeille)\n")
+    return [("person", "synthetic_person", _synthetic_person())]
+
+
+def _time(fn, content: bytes, rounds: int) -> float:
+    fn(content)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(content)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def _retained_kb(fn, content: bytes) -> float:
+    gc.collect()
+    tracemalloc.start()
+    result = fn(content)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 1024
+
+
+def bench(rounds: int) -> None:
+    backends = ["json"]
+    if dec.orjson is not None:
+        backends.append("orjson")
+    if dec.msgspec is not None:
+        backends.append("msgspec")
+
+    for shape_name, name, content in _payloads():
+        shape = SHAPES[shape_name]
+        print(f"{name} ({len(content) // 1024} KB)")
+        print(f"  {'backend':<10} {'muoto':<7} {'ms/kutsu':>9} {'muisti KB':>10}")
+        for backend in backends:
+            for label, sh in (("koko", None), ("muoto", shape)):
+                fn = lambda c, b=backend, s=sh: dec.decode(c, s, backend=b)
+                print(f"  {backend:<10} {label:<7} {_time(fn, content, rounds):>9.3f} {_retained_kb(fn, content):>10.0f}")
+        print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="tallenna vastaukset TMDB:stä")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record())
+    bench(args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Palvelimen käynnistysaika: server.py:n tuonti ja työkalulista tuoreessa prosessissa.
+
+MCP-asiakas käynnistää palvelimen usein per istunto, joten tuontiaika on se mitä
+käyttäjä odottaa ennen työkalulistaa. Verrataan:
+  laiska  — nykyinen: DSPy tuodaan vasta ensimmäisellä smart_search-kutsulla
+  ahne    — kuten ennen: luokittelija ja rerankerit tuodaan heti (DSPy + litellm)
+
+Aja:
+  uv run python bench/startup_bench.py
+  uv run python bench/startup_bench.py --rounds 10
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Ajetaan erillisessä prosessissa — moduulivälimuisti ei saa vääristää mittausta
+_PROBE = """
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import server
+{extra}
+t1 = time.perf_counter()
+tools = asyncio.run(server.mcp.list_tools())
+t2 = time.perf_counter()
+print(json.dumps({{"import": t1 - t0, "list_tools": t2 - t1, "tools": len(tools), "dspy": "dspy" in sys.modules}}))
+"""
+
+VARIANTS = {
+    "laiska": "",
+    "ahne": "import search.classifier, search.rerank",
+}
+
+
+def _run(extra: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", _PROBE.format(extra=extra)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'tapa':<8} {'tuonti s':>9} {'list_tools ms':>14} {'työkaluja':>10} {'dspy':>5}")
+    for name, extra in VARIANTS.items():
+        runs = [_run(extra) for _ in range(args.rounds)]
+        imp = statistics.median(r["import"] for r in runs)
+        lst = statistics.median(r["list_tools"] for r in runs) * 1000
+        print(f"{name:<8} {imp:>9.2f} {lst:>14.1f} {runs[0]['tools']:>10} {str(runs[0]['dspy']):>5}")
+
+
+if __name__ == "__main__":
+    main()
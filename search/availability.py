@@ -0,0 +1,119 @@
+"""Katselupalveluindeksi: teos → maassa suoratoistavat palvelut. Oma indeksi per maa.
+
+Täyttyy kolmesta lähteestä:
+  - /movie|tv/{id}/watch/providers — koko palvelulista (complete)
+  - get_details (append_to_response: watch/providers) — koko palvelulista
+  - discover with_watch_providers (discover, _similar_to) — tiedetään vain
+    että teos on kyseisessä palvelussa, ei mitä muita palveluja on
+
+Suoratoistoksi lasketaan flatrate, free ja ads — vuokraus ja osto eivät.
+"""
+
+import asyncio
+from collections.abc import Iterable
+
+import httpx
+
+from .cache import TTLCache
+from .decode import WatchProviders
+from .memory import DEFAULT_REGION
+from .tmdb import get_json
+
+# Tarjonta vaihtuu kuukauden vaihteessa — päivä on riittävän tuore
+AVAILABILITY_TTL = 24 * 3600
+STREAM_OFFERS = ("flatrate", "free", "ads")
+WATCH_REGION = DEFAULT_REGION
+
+
+def streaming_names(region: dict) -> frozenset[str]:
+    """Yhden maan watch/providers-osio → suoratoistopalvelujen nimet."""
+    return frozenset(p["provider_name"] for kind in STREAM_OFFERS for p in region.get(kind, []))
+
+
+class AvailabilityIndex:
+    """(media_type, id) → (palvelut, complete). complete=False: vain osa palveluista tiedossa."""
+
+    __slots__ = ("_cache",)
+
+    def __init__(self, maxsize: int = 20000, ttl: float = AVAILABILITY_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, media_type: str, id: int) -> tuple[frozenset[str], bool] | None:
+        return self._cache.get((media_type, id))
+
+    def set(self, media_type: str, id: int, providers: Iterable[str]) -> None:
+        """Koko palvelulista (watch/providers-vastauksesta)."""
+        self._cache.set((media_type, id), (frozenset(providers), True))
+
+    def add(self, media_type: str, ids: Iterable[int], provider: str) -> None:
+        """discover-with-provider: nämä teokset ovat ainakin palvelussa `provider`."""
+        for id in ids:
+            known = self._cache.get((media_type, id))
+            if known is None:
+                self._cache.set((media_type, id), (frozenset((provider,)), False))
+            elif provider not in known[0]:
+                self._cache.set((media_type, id), (known[0] | {provider}, known[1]))
+
+    def answers(self, media_type: str, id: int, wanted: frozenset[str] | None) -> bool:
+        """Voiko kysymykseen vastata ilman hakua?
+        wanted=None: halutaan koko lista. Muuten riittää yksi tunnettu osuma."""
+        known = self.get(media_type, id)
+        if known is None:
+            return False
+        providers, complete = known
+        return complete or (wanted is not None and bool(providers & wanted))
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+def partition(
+    index: AvailabilityIndex, media_type: str, titles: list, names: list[str],
+) -> tuple[dict[str, list], list]:
+    """OR-haun (with_watch_providers=a|b) tulokset palveluittain indeksin perusteella.
+    Teos voi päätyä useaan osioon. Palauttaa (osiot, tuntemattomat) — tuntemattomat
+    ovat ainakin yhdessä palveluista, mutta indeksi ei vielä tiedä missä."""
+    sections: dict[str, list] = {name: [] for name in names}
+    unknown = []
+    for t in titles:
+        known = index.get(media_type, t.id)
+        on = [name for name in names if known and name in known[0]]
+        for name in on:
+            sections[name].append(t)
+        if not on:
+            unknown.append(t)
+    return sections, unknown
+
+
+async def fetch_availability(
+    client: httpx.AsyncClient, index: AvailabilityIndex, ids: list[int], media_type: str,
+    wanted: frozenset[str] | None = None, region: str = WATCH_REGION,
+) -> dict[int, frozenset[str]]:
+    """Palvelut jokaiselle id:lle. Indeksistä vastaamattomat haetaan rinnakkain.
+    region: maa jonka palvelut poimitaan vastauksesta — index on saman maan indeksi."""
+    missing = [id for id in ids if not index.answers(media_type, id, wanted)]
+
+    async def _one(id: int) -> None:
+        data = await get_json(client, f"/{media_type}/{id}/watch/providers", shape=WatchProviders)
+        index.set(media_type, id, streaming_names(data.get("results", {}).get(region, {})))
+
+    # Epäonnistunut haku (404 tms.) → id jää pois tuloksesta
+    await asyncio.gather(*[_one(id) for id in missing], return_exceptions=True)
+
+    out = {}
+    for id in ids:
+        known = index.get(media_type, id)
+        if known is not None:
+            out[id] = known[0]
+    return out
+
+
+# Prosessin yhteiset indeksit, yksi per maa
+_indexes: dict[str, AvailabilityIndex] = {}
+
+
+def availability_for(region: str) -> AvailabilityIndex:
+    index = _indexes.get(region)
+    if index is None:
+        index = _indexes[region] = AvailabilityIndex()
+    return index
@@ -0,0 +1,121 @@
+"""Katkaisijat (circuit breaker) TMDB:lle ja kielimallille.
+
+Kun lähde on alhaalla, jokainen kutsu odottaisi virhettä ja kasvattaisi viivettä.
+Katkaisija laskee viimeisimpien kutsujen virheosuuden ja aukeaa kun se ylittää
+rajan: auki ollessa kutsua ei tehdä ollenkaan, vaan kutsuja käyttää varaa heti
+(vanhentunut välimuistirivi TMDB:ltä, heuristinen intent tai paikallinen
+järjestys kielimallin tilalla). Jäähdytyksen jälkeen yksi koekutsu kerrallaan
+päästetään läpi (puoliauki): onnistuminen sulkee katkaisijan, virhe avaa sen uudelleen.
+
+Katkaisijat:
+  tmdb:<polun alku>   — tmdb:search, tmdb:discover, tmdb:movie, tmdb:tv, ...
+  llm                 — luokittelu ja rerank
+
+Tila näkyy metriikoissa (server.py: tmdb://metrics).
+"""
+
+import os
+import time
+from collections import deque
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Virheosuus jolla katkaisija aukeaa, ja montako kutsua ikkunassa vähintään
+ERROR_RATE = float(os.getenv("TMDB_BREAKER_ERROR_RATE", "0.5"))
+MIN_CALLS = int(os.getenv("TMDB_BREAKER_MIN_CALLS", "5"))
+WINDOW = 20
+# Sekunteja auki ennen koekutsua
+COOLDOWN = float(os.getenv("TMDB_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitOpen(Exception):
+    """Katkaisija on auki — kutsua ei tehty."""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} ei ole käytettävissä (katkaisija auki)")
+        self.name = name
+
+
+class CircuitBreaker:
+    __slots__ = ("name", "state", "_results", "_opened_at", "_probe_at", "trips", "rejected")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self._results: deque[bool] = deque(maxlen=WINDOW)
+        self._opened_at = 0.0
+        # Koekutsun alkuhetki, 0 = ei koekutsua menossa
+        self._probe_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Saako kutsun tehdä. Auki → ei; jäähdytyksen jälkeen yksi koekutsu.
+        Koekutsu joka ei kirjannut tulosta (peruttu) ei lukitse katkaisijaa: uusi
+        koe sallitaan kun edellisestä on kulunut jäähdytyksen verran."""
+        now = time.monotonic()
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self._opened_at >= COOLDOWN:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and (not self._probe_at or now - self._probe_at >= COOLDOWN):
+            self._probe_at = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool) -> None:
+        if self.state == HALF_OPEN:
+            self._probe_at = 0.0
+            if ok:
+                self.state = CLOSED
+                self._results.clear()
+            else:
+                self._open()
+            return
+        self._results.append(ok)
+        failures = self._results.count(False)
+        if (self.state == CLOSED and len(self._results) >= MIN_CALLS
+                and failures / len(self._results) >= ERROR_RATE):
+            self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._results.clear()
+        self.trips += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "error_rate": round(self._results.count(False) / len(self._results), 3) if self._results else 0.0,
+            "calls_in_window": len(self._results),
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retry_in": round(max(0.0, COOLDOWN - (time.monotonic() - self._opened_at)), 1)
+            if self.state == OPEN else None,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    b = _breakers.get(name)
+    if b is None:
+        b = _breakers[name] = CircuitBreaker(name)
+    return b
+
+
+def tmdb_family(path: str) -> str:
+    """'/search/movie' → 'tmdb:search', '/movie/603/credits' → 'tmdb:movie'."""
+    return f"tmdb:{path.strip('/').split('/', 1)[0]}"
+
+
+def states() -> dict[str, dict]:
+    return {name: b.snapshot() for name, b in sorted(_breakers.items())}
+
+
+def reset() -> None:
+    """Kaikki katkaisijat pois (testit)."""
+    _breakers.clear()
@@ -0,0 +1,99 @@
+"""Pieni prosessinsisäinen TTL-välimuisti.
+
+Käytetään hakutuloksille jotka muuttuvat harvoin (franchisejen jäsenet,
+kokoelmat). Vanhimmat poistetaan kun koko ylittyy — ei taustasäiettä,
+vanhentuneet siivotaan lukuhetkellä.
+
+Jokaisen rivin koko arvioidaan tallennettaessa (avain + arvo, sys.getsizeof),
+joten välimuistin muistinkäyttö näkyy metriikoissa (nbytes). maxbytes rajaa
+sen: vanhimpia poistetaan kunnes sekä rivimäärä että tavut mahtuvat.
+Operaatiot ovat lukon alla — samaa välimuistia voi käyttää myös säikeistä.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+_MISSING = object()
+
+
+def sizeof(key: Hashable, value: Any) -> int:
+    """Rivin arvioitu koko. Tuplet ja listat yhden tason syvyydeltä — riittää
+    avaimille (polku, parametrit) ja merkkijono-/tavuarvoille."""
+    size = sys.getsizeof(key) + sys.getsizeof(value)
+    for part in (key, value):
+        if isinstance(part, (tuple, list)):
+            size += sum(sys.getsizeof(x) for x in part)
+    return size
+
+
+class TTLCache:
+    __slots__ = ("maxsize", "maxbytes", "ttl", "nbytes", "_data", "_lock")
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0, maxbytes: int | None = None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.nbytes = 0
+        # avain → (vanhenemishetki, arvo, koko tavuina)
+        self._data: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires, value, _ = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def get_entry(self, key: Hashable) -> tuple[Any, bool] | None:
+        """(arvo, onko tuore) — vanhentunutta riviä ei poisteta, jotta sitä voi
+        käyttää varana kun lähde ei vastaa (breaker.py). None jos avainta ei ole."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return None
+            expires, value, _ = entry
+            fresh = expires >= time.monotonic()
+            if fresh:
+                self._data.move_to_end(key)
+            return value, fresh
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """ttl: tämän rivin kesto, oletuksena välimuistin oma."""
+        size = sizeof(key, value)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, size)
+            self.nbytes += size
+            while self._data and (
+                len(self._data) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes)
+            ):
+                _, (_, _, dropped) = self._data.popitem(last=False)
+                self.nbytes -= dropped
+
+    def _drop(self, key: Hashable) -> None:
+        self.nbytes -= self._data.pop(key)[2]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "bytes": self.nbytes}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
@@ -1,25 +1,33 @@
+"""DSPy-luokittelija: vapaa hakukysely → SmartSearchIntent.
+
+Tuodaan laiskasti llm.py:n kautta — DSPy ja litellm ovat raskaita.
+
+Prompti on järjestetty palveluntarjoajan kontekstivälimuistia varten: staattinen
+ohje (system-viesti) ja genrelistat ensin, kyselykohtaiset kentät viimeisenä.
+Suoratoistopalveluista lähetetään vain kyselyssä mainitut — koko maan lista
+(kymmeniä nimiä) olisi suurin osa jokaisen kutsun syötteestä.
+
+Jos optimoitu ohjelma on tallennettu (optimize.py, TMDB_CLASSIFIER_PROGRAM,
+oletus data/classifier_program.json), se ladataan nolla-shot ChainOfThoughtin tilalle.
+"""
+
 import asyncio
 import datetime
 import json
 import os
+import time
 from pathlib import Path
 
 import dspy
-from dotenv import load_dotenv
 
-from .memory import _log
+from . import deadline
+from .deadline import LatencyWindow, hedged
+from .llm import configure_lm, record_usage
+from .memory import _PROVIDER_ALIASES, _log, _norm, _norm_query, build_index
+from .memory import memory as _memory
 from .prompts import SmartSearchIntent, _postprocess
 
-load_dotenv()
-
-_EXAMPLES_FILE = Path(__file__).parent.parent / "data" / "examples.json"
-_GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-_lm = dspy.LM(
-    "gemini/gemini-2.5-flash-lite-preview-09-2025",
-    api_key=_GEMINI_API_KEY,
-)
-dspy.configure(lm=_lm)
+configure_lm()
 
 
 class QueryClassification(dspy.Signature):
@@ -87,30 +95,97 @@ trending:    "trendaa", "mitä katsotaan nyt".
 - time_window: "day" tai "week"
 """
 
-    query: str = dspy.InputField(desc="Käyttäjän hakukysely")
+    # Järjestys = järjestys promptissa: pysyvät ensin, kyselykohtaiset viimeisenä
     available_movie_genres: str = dspy.InputField(desc="Käytettävissä olevat elokuvagenret")
     available_tv_genres: str = dspy.InputField(desc="Käytettävissä olevat sarjagenret")
-    available_providers: str = dspy.InputField(desc="Suoratoistopalvelut Suomessa — käytä tarkkaa nimeä")
     today: str = dspy.InputField(desc="Tämänpäiväinen päivämäärä")
+    available_providers: str = dspy.InputField(
+        desc="Kyselyssä mainitut suoratoistopalvelut — käytä tarkkaa nimeä; '-' = ei mainittu")
+    query: str = dspy.InputField(desc="Käyttäjän hakukysely")
     result: SmartSearchIntent = dspy.OutputField()
 
 
-_classifier = dspy.ChainOfThought(QueryClassification)
-
+PROGRAM_FILE = Path(os.getenv("TMDB_CLASSIFIER_PROGRAM") or Path(__file__).parent.parent / "data" / "classifier_program.json")
+# Ohjelmatiedoston kind → moduuli
+PROGRAM_KINDS = {"chain_of_thought": dspy.ChainOfThought, "predict": dspy.Predict}
+# Nopean luokittelijan esimerkit ladatusta ohjelmasta: lyhyt prompti, mutta ei zero-shot
+FAST_DEMOS = int(os.getenv("TMDB_FAST_CLASSIFIER_DEMOS", "4"))
+
+
+def save_program(program: dspy.Module, kind: str, path: Path = PROGRAM_FILE, **meta) -> None:
+    """{"version": 1, "kind", "fields", ...meta, "state": program.dump_state()} — atominen korvaus.
+    fields: signatuurin kentät järjestyksessä — tila ladataan kenttä kerrallaan järjestyksen mukaan."""
+    fields = list(QueryClassification.fields)
+    data = {"version": 1, "kind": kind, "fields": fields, **meta, "state": program.dump_state()}
+    tmp = Path(f"{path}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_program(path: Path = PROGRAM_FILE) -> dspy.Module | None:
+    """Tallennettu ohjelma, tai None jos tiedostoa ei ole tai se on rikki."""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        _log("LUOKITTELIJAOHJELMA VIRHE", repr(e))
+        return None
+    if data.get("version") != 1 or data.get("kind") not in PROGRAM_KINDS:
+        _log("LUOKITTELIJAOHJELMA VIRHE", f"tuntematon versio/kind: {data.get('version')}/{data.get('kind')}")
+        return None
+    if data.get("fields") != list(QueryClassification.fields):
+        _log("LUOKITTELIJAOHJELMA VIRHE", "signatuuri muuttunut — aja search.optimize uudelleen")
+        return None
+    program = PROGRAM_KINDS[data["kind"]](QueryClassification)
+    program.load_state(data["state"])
+    demos = sum(len(p.demos) for p in program.predictors())
+    _log("LUOKITTELIJAOHJELMA", f"{path}: {data['kind']}, {demos} esimerkkiä")
+    return program
+
+
+def fast_program(program: dspy.Module, limit: int = FAST_DEMOS) -> dspy.Predict:
+    """Kevyt versio kun paikallinen malli on jo varma intentistä: ei päättelyketjua,
+    esimerkeistä ohjelman `limit` ensimmäistä ilman reasoning-kenttää."""
+    fast = dspy.Predict(QueryClassification)
+    demos = [demo for p in program.predictors() for demo in p.demos][:limit]
+    fast.demos = [demo.without("reasoning") if "reasoning" in demo else demo for demo in demos]
+    return fast
+
+
+_classifier = load_program() or dspy.ChainOfThought(QueryClassification)
+_fast_classifier = fast_program(_classifier)
+
+
+def mentioned_providers(query: str, memory: dict) -> list[str]:
+    """Kyselyssä mainitut palvelut virallisella nimellä: nimet ja lisänimet sanan alusta.
+    Väljempi kuin index.providers_in — ylimääräinen nimi vain pidentää listaa hieman."""
+    index = memory.get("index") or build_index(memory)
+    found = index.providers_in(query)
+    norm = f" {_norm(query)}"
+    for alias in _PROVIDER_ALIASES:
+        if f" {alias}" in norm:
+            match = index.provider("movie", alias)
+            if match is not None:
+                found.append(match["provider_name"])
+    return list(dict.fromkeys(found))
+
+
+def _inputs(query: str, memory: dict) -> dict:
+    """QueryClassification-syötteet: kysely, muistin genret ja kyselyssä mainitut palvelut."""
+    return {
+        "available_movie_genres": ", ".join(g["name"] for g in memory.get("movie_genres", [])),
+        "available_tv_genres": ", ".join(g["name"] for g in memory.get("tv_genres", [])),
+        "today": datetime.date.today().isoformat(),
+        "available_providers": ", ".join(mentioned_providers(query, memory)) or "-",
+        "query": query,
+    }
 
-def _classify_sync(query: str, memory: dict) -> SmartSearchIntent:
-    movie_genres = ", ".join(g["name"] for g in memory.get("movie_genres", []))
-    tv_genres = ", ".join(g["name"] for g in memory.get("tv_genres", []))
-    providers = ", ".join(p["provider_name"] for p in memory.get("movie_providers", []))
-    today = datetime.date.today().isoformat()
 
-    prediction = _classifier(
-        query=query,
-        available_movie_genres=movie_genres,
-        available_tv_genres=tv_genres,
-        available_providers=providers,
-        today=today,
-    )
+def _classify_sync(query: str, inputs: dict, fast: bool = False) -> SmartSearchIntent:
+    started = time.perf_counter()
+    prediction = (_fast_classifier if fast else _classifier)(**inputs)
+    record_usage("classify_fast" if fast else "classify", prediction, started)
 
     _log("DSPY REASONING", getattr(prediction, "reasoning", "—"))
     _log("DSPY RESULT (raaka)", prediction.result.model_dump_json(indent=2))
@@ -118,27 +193,30 @@ def _classify_sync(query: str, memory: dict) -> SmartSearchIntent:
     return _postprocess(prediction.result, query)
 
 
-async def classify_query(query: str, memory: dict) -> SmartSearchIntent:
-    result = await asyncio.to_thread(_classify_sync, query, memory)
-    _log("INTENT (postprocess jälkeen)", result.model_dump_json(indent=2))
-    return result
-
-
-def save_example(query: str, correct_intent: SmartSearchIntent) -> None:
-    """Tallenna oikea vastaus harjoitusesimerkkeihin."""
-    examples: list[dict] = []
-    if _EXAMPLES_FILE.exists():
-        examples = json.loads(_EXAMPLES_FILE.read_text(encoding="utf-8"))
-
-    # Korvaa jos sama kysely on jo listassa
-    examples = [e for e in examples if e.get("query") != query]
-    examples.append({
-        "query": query,
-        "correct": correct_intent.model_dump(),
-    })
-
-    _EXAMPLES_FILE.parent.mkdir(exist_ok=True)
-    _EXAMPLES_FILE.write_text(
-        json.dumps(examples, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+# Onnistuneiden luokittelujen kestot → suojauskynnys
+latencies = LatencyWindow()
+
+
+async def classify_query(query: str, memory: dict, fast: bool = False) -> SmartSearchIntent:
+    """Sama kysely tulkitaan kerran vuorokaudessa (intent_cache).
+    Palautetaan kopio — route muokkaa intentiä.
+    fast: ilman päättelyketjua (paikallinen malli oli jo varma intentistä)
+    Kutsu on suojattu ja aikarajattu (deadline.py) — ylitys nostaa TimeoutErrorin."""
+    cache = _memory["intent_cache"]
+    key = _norm_query(query)
+    cached = cache.get(key)
+    if cached is None:
+        started = time.monotonic()
+        # Syötteet kootaan tapahtumasilmukassa: säie ei lue muistia kesken päivityksen
+        inputs = _inputs(query, memory)
+        cached, was_hedged = await hedged(
+            lambda: asyncio.to_thread(_classify_sync, query, inputs, fast),
+            hedge_after=latencies.hedge_after(),
+            limit=deadline.timeout(deadline.CLASSIFY_TIMEOUT),
+        )
+        latencies.add(time.monotonic() - started)
+        if was_hedged:
+            _log("LUOKITTELU SUOJATTU", f"{time.monotonic() - started:.2f} s")
+        cache.set(key, cached)
+        _log("INTENT (postprocess jälkeen)", cached.model_dump_json(indent=2))
+    return cached.model_copy(deep=True)
@@ -0,0 +1,119 @@
+"""Aikarajat ja suojatut (hedged) kutsut kielimallille.
+
+smart_search asettaa koko kyselylle aikarajan (TMDB_SMART_DEADLINE). Raja kulkee
+contextvarina kaikkiin kyselyn aikana käynnistettyihin taskeihin ja säikeisiin,
+ja jokainen vaihe saa siitä osuutensa: timeout(cap) = min(cap, jäljellä oleva aika).
+
+Luokittelija ajetaan suojattuna: jos ensimmäinen kutsu ei ole valmis tavallisen
+viiveen (TMDB_HEDGE_PERCENTILE -persentiili viimeisimmistä) kuluttua, rinnalle
+käynnistetään toinen samanlainen kutsu ja käytetään ensin valmistunutta.
+
+Aikarajan ylittyessä kutsuja saa TimeoutErrorin ja käyttää paikallista varaa
+(llm.py: heuristinen intent, paikallinen järjestys rerankin tilalla). Jos kyselyn
+raja on jo ennen vaihetta pienempi kuin vaiheen katto (squeezed), kielimallia ei
+kutsuta lainkaan eikä katkaisijalle kirjata virhettä.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from typing import TypeVar
+
+T = TypeVar("T")
+
+SMART_DEADLINE = float(os.getenv("TMDB_SMART_DEADLINE", "25"))
+CLASSIFY_TIMEOUT = float(os.getenv("TMDB_CLASSIFY_TIMEOUT", "8"))
+RERANK_TIMEOUT = float(os.getenv("TMDB_RERANK_TIMEOUT", "8"))
+HEDGE_PERCENTILE = float(os.getenv("TMDB_HEDGE_PERCENTILE", "0.95"))
+# Ennen kuin viiveistä on tarpeeksi havaintoja
+HEDGE_DEFAULT = 3.0
+HEDGE_MIN = 0.5
+HEDGE_MIN_SAMPLES = 20
+
+# Absoluuttinen raja (time.monotonic) tai None = ei rajaa
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def within(seconds: float) -> Iterator[None]:
+    """Aseta aikaraja lohkolle. Sisäkkäinen raja ei voi pidentää ulompaa."""
+    current = _deadline.get()
+    limit = time.monotonic() + seconds
+    token = _deadline.set(limit if current is None else min(current, limit))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Jäljellä oleva aika sekunteina, tai None jos rajaa ei ole."""
+    limit = _deadline.get()
+    return None if limit is None else max(0.0, limit - time.monotonic())
+
+
+def timeout(cap: float) -> float:
+    """Vaiheen aikaraja: vaiheen oma katto tai jäljellä oleva aika, kumpi pienempi."""
+    left = remaining()
+    return cap if left is None else min(cap, left)
+
+
+def squeezed(cap: float) -> bool:
+    """Onko kyselyn aikaraja jo leikannut vaiheen oman katon? Silloin aikakatkaisu
+    kertoisi aiemmista vaiheista (TMDB), ei kielimallista — vara ilman kutsua."""
+    return timeout(cap) < cap
+
+
+class LatencyWindow:
+    """Viimeisimmät onnistuneet kestot — suojauskynnys persentiilistä."""
+
+    def __init__(self, maxlen: int = 200):
+        self._samples: deque[float] = deque(maxlen=maxlen)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def hedge_after(self, p: float = HEDGE_PERCENTILE) -> float:
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT
+        return max(HEDGE_MIN, self.percentile(p))
+
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_after: float, limit: float) -> tuple[T, bool]:
+    """Aja call(); jos ei valmis hedge_after sekunnissa, käynnistä toinen rinnalle.
+    Palauttaa (ensimmäinen onnistunut tulos, suojattiinko). Ylitys → TimeoutError.
+    Jos toinen kutsuista epäonnistuu, odotetaan toista; jos molemmat, virhe nostetaan."""
+    started = time.monotonic()
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=min(hedge_after, limit))
+        if not done and hedge_after < limit:
+            tasks.append(asyncio.ensure_future(call()))
+        error: BaseException | None = None
+        while True:
+            for task in tasks:
+                if task.done():
+                    if task.exception() is None:
+                        return task.result(), len(tasks) > 1
+                    error = task.exception()
+            pending = [t for t in tasks if not t.done()]
+            left = limit - (time.monotonic() - started)
+            if not pending:
+                raise error
+            if left <= 0:
+                raise TimeoutError(f"aikaraja {limit:.1f} s ylittyi")
+            await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
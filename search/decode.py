@@ -0,0 +1,300 @@
+"""TMDB-vastausten JSON-dekoodaus.
+
+Dekooderi valitaan kerran: msgspec > orjson > json (stdlib).
+Pakota haluttu ympäristömuuttujalla TMDB_JSON_DECODER=msgspec|orjson|json.
+
+Muodot (shape) ovat TypedDictejä joissa on vain kentät joita oikeasti käytämme.
+msgspec dekoodaa suoraan muotoon eikä koskaan rakenna turhia kenttiä —
+muilla backendeillä vastaus karsitaan samaan muotoon heti parsinnan jälkeen,
+jolloin ylimääräinen data ei jää muistiin.
+"""
+
+import json
+import os
+import types
+from typing import TypedDict, Union, get_args, get_origin, get_type_hints, is_typeddict
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover — valinnainen riippuvuus
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover — valinnainen riippuvuus
+    orjson = None
+
+
+# ─────────────────────────────────────────────────────────────
+# Muodot
+# ─────────────────────────────────────────────────────────────
+
+class Named(TypedDict, total=False):
+    id: int
+    name: str
+
+
+class KnownFor(TypedDict, total=False):
+    id: int
+    media_type: str
+    title: str
+    name: str
+    release_date: str | None
+    first_air_date: str | None
+
+
+class ResultItem(TypedDict, total=False):
+    """Yksi rivi search-, discover-, trending- tai recommendations-listasta."""
+    id: int
+    media_type: str
+    title: str
+    name: str
+    original_title: str
+    original_name: str
+    release_date: str | None
+    first_air_date: str | None
+    overview: str | None
+    genre_ids: list[int]
+    vote_average: float
+    vote_count: int
+    popularity: float
+    original_language: str
+    known_for_department: str | None
+    known_for: list[KnownFor]
+
+
+class Page(TypedDict, total=False):
+    page: int
+    results: list[ResultItem]
+    total_results: int
+    total_pages: int
+
+
+
+class Credit(TypedDict, total=False):
+    id: int
+    media_type: str
+    title: str
+    name: str
+    release_date: str | None
+    first_air_date: str | None
+    vote_count: int
+    character: str | None
+    job: str | None
+
+
+class CombinedCredits(TypedDict, total=False):
+    cast: list[Credit]
+    crew: list[Credit]
+
+
+class PersonDetails(TypedDict, total=False):
+    id: int
+    name: str
+    known_for_department: str | None
+    birthday: str | None
+    deathday: str | None
+    place_of_birth: str | None
+    biography: str | None
+    combined_credits: CombinedCredits
+
+
+class Season(TypedDict, total=False):
+    season_number: int
+    episode_count: int
+    air_date: str | None
+    vote_average: float
+
+
+class CastMember(TypedDict, total=False):
+    id: int
+    name: str
+    character: str | None
+    order: int
+
+
+class CrewMember(TypedDict, total=False):
+    id: int
+    name: str
+    job: str | None
+
+
+class Credits(TypedDict, total=False):
+    cast: list[CastMember]
+    crew: list[CrewMember]
+
+
+class ProviderOffer(TypedDict, total=False):
+    provider_id: int
+    provider_name: str
+
+
+class RegionProviders(TypedDict, total=False):
+    link: str
+    flatrate: list[ProviderOffer]
+    free: list[ProviderOffer]
+    ads: list[ProviderOffer]
+    rent: list[ProviderOffer]
+    buy: list[ProviderOffer]
+
+
+class WatchProviders(TypedDict, total=False):
+    """/watch/providers: maakoodi → tarjonta."""
+    results: dict[str, RegionProviders]
+
+
+class KeywordList(TypedDict, total=False):
+    """Elokuvilla kenttä on 'keywords', sarjoilla 'results'."""
+    id: int
+    keywords: list[Named]
+    results: list[Named]
+
+
+# get_details: append_to_response tuo nämä samaan vastaukseen.
+# "watch/providers" ei kelpaa luokan kentäksi → funktionaalinen muoto.
+DetailsExtras = TypedDict("DetailsExtras", {
+    "keywords": KeywordList,
+    "credits": Credits,
+    "watch/providers": WatchProviders,
+    "recommendations": Page,
+}, total=False)
+
+
+class MovieDetails(DetailsExtras, total=False):
+    id: int
+    title: str
+    original_title: str
+    release_date: str | None
+    tagline: str | None
+    overview: str | None
+    genres: list[Named]
+    runtime: int | None
+    status: str | None
+    budget: int
+    revenue: int
+    production_countries: list[Named]
+    vote_average: float
+    vote_count: int
+    imdb_id: str | None
+    original_language: str
+    belongs_to_collection: Named | None
+
+
+class TvDetails(DetailsExtras, total=False):
+    id: int
+    name: str
+    original_name: str
+    first_air_date: str | None
+    last_air_date: str | None
+    tagline: str | None
+    overview: str | None
+    genres: list[Named]
+    created_by: list[Named]
+    networks: list[Named]
+    status: str | None
+    in_production: bool
+    number_of_seasons: int | None
+    number_of_episodes: int | None
+    seasons: list[Season]
+    vote_average: float
+    vote_count: int
+    original_language: str
+
+
+class Collection(TypedDict, total=False):
+    id: int
+    name: str
+    parts: list[ResultItem]
+
+
+# ─────────────────────────────────────────────────────────────
+# Backend
+# ─────────────────────────────────────────────────────────────
+
+def _select_backend(name: str) -> str:
+    name = name.lower()
+    if name == "msgspec" and msgspec is not None:
+        return "msgspec"
+    if name == "orjson" and orjson is not None:
+        return "orjson"
+    if name == "json":
+        return "json"
+    if msgspec is not None:
+        return "msgspec"
+    if orjson is not None:
+        return "orjson"
+    return "json"
+
+
+BACKEND = _select_backend(os.getenv("TMDB_JSON_DECODER", "auto"))
+
+_msgspec_decoders: dict = {}
+_trim_fns: dict = {}
+
+
+def _loads(content: bytes | str, backend: str):
+    if backend == "msgspec":
+        return msgspec.json.decode(content)
+    if backend == "orjson":
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _compile(tp):
+    """TypedDict → karsintafunktio. None = pidä arvo sellaisenaan."""
+    origin = get_origin(tp)
+    if origin in (Union, types.UnionType):
+        args = [a for a in get_args(tp) if a is not type(None)]
+        return _compile(args[0]) if len(args) == 1 else None
+    if origin is list:
+        item = _compile(get_args(tp)[0])
+        if item is None:
+            return None
+        return lambda v: [item(x) for x in v] if isinstance(v, list) else v
+    if origin is dict:
+        item = _compile(get_args(tp)[1])
+        if item is None:
+            return None
+        return lambda v: {k: item(x) for k, x in v.items()} if isinstance(v, dict) else v
+    if is_typeddict(tp):
+        subs = {k: _compile(v) for k, v in get_type_hints(tp).items()}
+        plain = tuple(k for k, f in subs.items() if f is None)
+        nested = tuple((k, f) for k, f in subs.items() if f is not None)
+
+        def trim_dict(v):
+            if not isinstance(v, dict):
+                return v
+            out = {k: v[k] for k in plain if k in v}
+            for k, f in nested:
+                if k in v:
+                    out[k] = f(v[k])
+            return out
+        return trim_dict
+    return None
+
+
+def trim(data, shape):
+    """Karsi valmiiksi parsittu vastaus muotoon `shape`."""
+    fn = _trim_fns.get(shape)
+    if fn is None:
+        fn = _trim_fns[shape] = _compile(shape)
+    return fn(data)
+
+
+def decode(content: bytes | str, shape: type | None = None, backend: str | None = None) -> dict:
+    """Parsi TMDB-vastaus. Jos `shape` on annettu, palautetaan vain sen kentät."""
+    backend = backend or BACKEND
+    if shape is None:
+        return _loads(content, backend)
+
+    if backend == "msgspec":
+        decoder = _msgspec_decoders.get(shape)
+        if decoder is None:
+            decoder = _msgspec_decoders[shape] = msgspec.json.Decoder(shape)
+        try:
+            return decoder.decode(content)
+        except msgspec.ValidationError:
+            # TMDB palautti odottamattoman tyypin — parsitaan tyypittömänä ja karsitaan
+            pass
+
+    return trim(_loads(content, backend), shape)
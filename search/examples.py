@@ -0,0 +1,164 @@
+"""Luokitteluesimerkit (data/examples.jsonl) — save_example-työkalu, optimointi ja paikallinen malli.
+
+Tallennus on pelkkä lisäys: jokainen add_training_example kirjoittaa yhden rivin
+tiedoston loppuun, eikä koko tiedostoa lueta tai kirjoiteta uudelleen. Sama
+kysely voi esiintyä useasti — lukiessa viimeisin voittaa. Tiivistys kirjoittaa
+vain voimassa olevat rivit uuteen tiedostoon ja vaihtaa sen atomisesti paikalleen;
+se tehdään automaattisesti kun tiedostossa on yli puolet korvattuja rivejä.
+
+Kirjoitukset ja tiivistys tehdään tiedostolukon alla (examples.jsonl.lock), joten
+rinnakkaiset kutsut — myös eri prosesseista — eivät sotke toisiaan.
+
+Lukija muistaa mihin asti tiedosto on luettu: seuraava lataus lukee vain uudet
+rivit. Vanha data/examples.json luetaan ensimmäisenä ja siirretään tiivistyksessä.
+
+  uv run python -m search.examples stats
+  uv run python -m search.examples compact
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: vain prosessin sisäinen lukko
+    fcntl = None
+
+from .memory import _norm_query
+from .prompts import SmartSearchIntent
+
+_EXAMPLES_FILE = Path(os.getenv("TMDB_EXAMPLES_FILE") or Path(__file__).parent.parent / "data" / "examples.jsonl")
+# Tiivistetään kun rivejä on vähintään näin monta ja yli puolet niistä on korvattuja
+COMPACT_MIN_LINES = 1000
+
+# Uudelleen lukittava: compact lukee esimerkit kirjoituslukon alla
+_thread_lock = threading.RLock()
+
+
+@contextmanager
+def _locked(path: Path):
+    """Tiedostolukko (fcntl) + säielukko: yksi kirjoittaja kerrallaan."""
+    with _thread_lock:
+        path.parent.mkdir(exist_ok=True)
+        with open(f"{path}.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class _Reader:
+    """Inkrementaalinen lukija: (inode, luettu tavumäärä) → jatketaan siitä."""
+
+    __slots__ = ("inode", "offset", "lines", "examples")
+
+    def __init__(self):
+        self.inode: int | None = -1  # -1 = ei vielä luettu, None = tiedostoa ei ole
+        self.offset = 0
+        self.lines = 0
+        self.examples: dict[str, dict] = {}
+
+    def _add(self, row: dict) -> None:
+        if row.get("query") and row.get("correct"):
+            key = _norm_query(row["query"])
+            self.examples.pop(key, None)  # viimeisin voittaa ja siirtyy loppuun
+            self.examples[key] = {"query": row["query"], "correct": row["correct"]}
+            self.lines += 1
+
+    def refresh(self, path: Path, legacy: Path) -> None:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        inode = st.st_ino if st else None
+        if inode != self.inode or (st and st.st_size < self.offset):
+            # Uusi tiedosto (tiivistetty) tai ensimmäinen lataus
+            self.inode, self.offset, self.lines, self.examples = inode, 0, 0, {}
+            if legacy.exists():  # ennen JSONL-muotoa: yksi JSON-lista
+                for row in json.loads(legacy.read_text(encoding="utf-8") or "[]"):
+                    self._add(row)
+        if st is None or st.st_size == self.offset:
+            return
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        # Vain kokonaiset rivit — keskeneräinen viimeinen rivi luetaan seuraavalla kerralla
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                self._add(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # rikkinäinen rivi kaatuneelta kirjoittajalta
+        self.offset += end
+
+
+_readers: dict[Path, _Reader] = {}
+
+
+def load_examples(path: Path | None = None) -> list[dict]:
+    """Voimassa olevat esimerkit {"query", "correct"} — yksi per kysely, viimeisin voittaa."""
+    path = Path(path or _EXAMPLES_FILE)
+    with _thread_lock:
+        reader = _readers.setdefault(path, _Reader())
+        reader.refresh(path, path.with_suffix(".json"))
+        return list(reader.examples.values())
+
+
+def stats(path: Path | None = None) -> dict:
+    path = Path(path or _EXAMPLES_FILE)
+    examples = load_examples(path)
+    reader = _readers[path]
+    return {"examples": len(examples), "lines": reader.lines,
+            "bytes": path.stat().st_size if path.exists() else 0}
+
+
+def save_example(query: str, correct_intent: SmartSearchIntent, path: Path | None = None) -> None:
+    """Tallenna oikea vastaus harjoitusesimerkkeihin (yksi lisätty rivi)."""
+    path = Path(path or _EXAMPLES_FILE)
+    row = {"ts": round(time.time(), 3), "query": query, "correct": correct_intent.model_dump()}
+    line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+    with _locked(path):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    s = stats(path)
+    if s["lines"] >= COMPACT_MIN_LINES and s["lines"] > 2 * s["examples"]:
+        compact(path)
+
+
+def compact(path: Path | None = None) -> dict:
+    """Kirjoita vain voimassa olevat rivit ja vaihda tiedosto atomisesti. Vanha
+    examples.json siirretään samalla. Palauttaa {"before", "after"} rivimäärät."""
+    path = Path(path or _EXAMPLES_FILE)
+    legacy = path.with_suffix(".json")
+    with _locked(path):
+        examples = load_examples(path)
+        before = _readers[path].lines
+        tmp = Path(f"{path}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for e in examples:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        if legacy.exists():
+            legacy.unlink()
+    return {"before": before, "after": len(examples)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Luokitteluesimerkkien tallennus.")
+    parser.add_argument("command", choices=("stats", "compact"))
+    args = parser.parse_args()
+    print(stats() if args.command == "stats" else compact())
@@ -0,0 +1,225 @@
+"""Yhteinen tuloslistojen muotoilu.
+
+Kaikki listatyökalut (search_by_title, discover, search_multi, trending,
+get_recommendations, similar_to, franchise) renderöidään täällä samoilla
+valmiiksi käännetyillä pohjilla yhteen puskuriin.
+
+Vastauksen koolla on katto (TMDB_OUTPUT_BUDGET merkkiä). Kuvaukset lyhennetään
+tasapuolisesti niin että kokonaisuus mahtuu kattoon: lyhyet kuvaukset jättävät
+tilaa pidemmille, ja jos rivitkään eivät mahdu, viimeiset jätetään pois.
+
+Tilat (TMDB_OUTPUT_MODE tai render(mode=...)):
+  text     — oletus, kuvaukset mukana
+  compact  — yksi rivi per teos, ei kuvauksia
+  json     — tiivis JSON samoista kentistä
+"""
+
+import io
+import json
+import os
+from collections.abc import Callable, Mapping, Sequence
+
+from .models import Person, Title, genre_names
+
+DEFAULT_BUDGET = int(os.getenv("TMDB_OUTPUT_BUDGET", "6000"))
+DEFAULT_MODE = os.getenv("TMDB_OUTPUT_MODE", "text")
+
+# Kuvauksen enimmäispituus kun tilaa on reilusti (vähän tuloksia)
+OVERVIEW_MAX = 400
+# Tätä lyhyempi kuvaus ei enää kerro mitään — jätetään kokonaan pois
+OVERVIEW_MIN = 40
+
+_SEP = "\n\n"
+
+# Pohjat käännetään kerran: str.format-metodi sidottuna valmiiseen merkkijonoon.
+_TEMPLATES: dict[str, Callable[..., str]] = {
+    # search_by_title, discover
+    "full": "[{ref}] {name} ({year})\n  Genret: {genres}\n  Arvosana: {vote:.1f}/10 ({votes} ääntä)".format,
+    # search_multi, trending, suositukset, similar_to, franchise
+    "line": "[{ref}] {name} ({year})\n  Genret: {genres} | {vote:.1f}/10 ({votes} ääntä)".format,
+    "compact": "[{ref}] {name} ({year}) {vote:.1f}/10 · {genres}".format,
+    "person": "[{ref}] {name}{dept}\n  Tunnettu: {known}".format,
+    "person_compact": "[{ref}] {name}{dept} · {known}".format,
+}
+
+_FI_PREFIX = {"movie": "elokuva", "tv": "sarja", "person": "henkilö"}
+
+
+def ref_id(item: Title | Person) -> str:
+    """[123]"""
+    return str(item.id)
+
+
+def ref_fi(item: Title | Person) -> str:
+    """[elokuva/123], [sarja/123], [henkilö/123]"""
+    kind = "person" if isinstance(item, Person) else item.media_type
+    return f"{_FI_PREFIX.get(kind, kind)}/{item.id}"
+
+
+def ref_type(item: Title | Person) -> str:
+    """[movie/123], [tv/123], [henkilö/123]"""
+    if isinstance(item, Person):
+        return f"henkilö/{item.id}"
+    return f"{item.media_type}/{item.id}"
+
+
+def _shorten(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    cut = text[:limit - 1].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:—-") + "…"
+
+
+def _fair_cap(lengths: list[int], total: int) -> int:
+    """Suurin yhteinen katto c jolla sum(min(l, c)) <= total (vesitäyttö)."""
+    remaining = total
+    ordered = sorted(lengths)
+    for i, length in enumerate(ordered):
+        share = remaining // (len(ordered) - i)
+        if length > share:
+            return share
+        remaining -= length
+    return ordered[-1] if ordered else 0
+
+
+def _worth_showing(cap: int, overviews: list[str]) -> bool:
+    """Kuvaukset näytetään jos ne mahtuvat kokonaan tai katto on vielä järkevä."""
+    return cap >= OVERVIEW_MIN or cap >= max(map(len, overviews), default=0)
+
+
+def _head(item: Title | Person, ref: Callable, genre_map_for: Callable, template: str) -> str:
+    if isinstance(item, Person):
+        tpl = _TEMPLATES["person_compact" if template == "compact" else "person"]
+        return tpl(
+            ref=ref(item),
+            name=item.name,
+            dept=f" — {item.department}" if item.department else "",
+            known=", ".join(kf.label for kf in item.known_for) or "-",
+        )
+    return _TEMPLATES[template](
+        ref=ref(item),
+        name=item.display_name,
+        year=item.year,
+        genres=", ".join(genre_names(item, genre_map_for(item.media_type))) or "-",
+        vote=item.vote_average,
+        votes=item.vote_count,
+    )
+
+
+def to_records(items: Sequence[Title | Person], genre_map_for: Callable[[str], Mapping[int, str]]) -> list[dict]:
+    """Tulokset rakenteisena — json-tilaa ja rakenteista MCP-vastausta varten."""
+    records = []
+    for item in items:
+        if isinstance(item, Person):
+            records.append({
+                "id": item.id,
+                "media_type": "person",
+                "name": item.name,
+                "department": item.department or None,
+                "known_for": [{"id": kf.id, "title": kf.title, "year": kf.year or None} for kf in item.known_for],
+            })
+            continue
+        records.append({
+            "id": item.id,
+            "media_type": item.media_type,
+            "title": item.title,
+            "original_title": item.original_title if item.original_title != item.title else None,
+            "year": item.year or None,
+            "genre_ids": list(item.genre_ids),
+            "genres": genre_names(item, genre_map_for(item.media_type)),
+            "vote_average": round(item.vote_average, 1),
+            "vote_count": item.vote_count,
+            "overview": item.overview,
+        })
+    return records
+
+
+def render_data(
+    header: str,
+    items: Sequence[Title | Person],
+    genre_map_for: Callable[[str], Mapping[int, str]],
+    *,
+    budget: int | None = None,
+) -> dict:
+    """Rakenteinen vastaus: {"header", "results"}. Kuvaukset lyhennetään samalla kokorajalla."""
+    budget = budget or DEFAULT_BUDGET
+    records = to_records(items, genre_map_for)
+    overviews = [r["overview"] for r in records if "overview" in r]
+    fixed = len(json.dumps(records, ensure_ascii=False, separators=(",", ":"))) - sum(map(len, overviews))
+    cap = min(OVERVIEW_MAX, _fair_cap([len(o) for o in overviews], max(0, budget - fixed - len(header))))
+    keep = _worth_showing(cap, overviews)
+    for r in records:
+        if "overview" in r:
+            r["overview"] = _shorten(r["overview"], cap) if keep else ""
+    return {"header": header.strip(), "results": records}
+
+
+def message(text: str, format: str = "text") -> str | dict:
+    """Tyhjä tulos tai virheilmoitus: json-muodossa {"message", "results": []}."""
+    return {"message": text, "results": []} if format == "json" else text
+
+
+def render(
+    header: str,
+    items: Sequence[Title | Person],
+    genre_map_for: Callable[[str], Mapping[int, str]],
+    *,
+    ref: Callable[[Title | Person], str] = ref_id,
+    layout: str = "line",
+    mode: str | None = None,
+    budget: int | None = None,
+) -> str:
+    """Renderöi tuloslista.
+    genre_map_for: media_type → {genre_id: nimi}, yleensä memory["index"].genre_map
+    layout: 'full' (arvosana omalla rivillään) tai 'line'
+    """
+    mode = mode or DEFAULT_MODE
+    budget = budget or DEFAULT_BUDGET
+
+    if mode == "json":
+        data = render_data(header, items, genre_map_for, budget=budget)
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    compact = mode == "compact"
+    heads = [_head(item, ref, genre_map_for, "compact" if compact else layout) for item in items]
+
+    # Montako riviä mahtuu ylipäätään kattoon (ilman kuvauksia)
+    used = len(header)
+    n = 0
+    for h in heads:
+        if used + len(_SEP) + len(h) > budget and n > 0:
+            break
+        used += len(_SEP) + len(h)
+        n += 1
+
+    # Kuvauksille jäävä tila jaetaan tasan: "\n  " + kuvaus per teos. Tyhjille ei riviä,
+    # ja jos pelkät otsikkorivit täyttävät katon, kuvauksia ei näytetä lainkaan.
+    overviews = [] if compact else [item.overview for item in items[:n] if isinstance(item, Title) and item.overview]
+    room = max(0, budget - used - 3 * len(overviews))
+    cap = min(OVERVIEW_MAX, _fair_cap([len(o) for o in overviews], room)) if overviews else 0
+    with_overview = bool(overviews) and _worth_showing(cap, overviews)
+
+    buf = io.StringIO()
+    buf.write(header)
+    for item, head in zip(items[:n], heads):
+        buf.write(_SEP)
+        buf.write(head)
+        if with_overview and isinstance(item, Title) and item.overview:
+            buf.write("\n  ")
+            buf.write(_shorten(item.overview, cap))
+    if n < len(items):
+        buf.write(f"{_SEP}… ja {len(items) - n} muuta (vastauksen kokoraja)")
+    return buf.getvalue()
+
+
+def respond(
+    header: str,
+    items: Sequence[Title | Person],
+    genre_map_for: Callable[[str], Mapping[int, str]],
+    format: str | None = None,
+    **kwargs,
+) -> str | dict:
+    """Työkalujen format-parametri: 'json' → rakenteinen dict, muuten render()."""
+    if format == "json":
+        return render_data(header, items, genre_map_for, budget=kwargs.get("budget"))
+    return render(header, items, genre_map_for, mode=format, **kwargs)
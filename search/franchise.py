@@ -0,0 +1,190 @@
+"""Franchise-resolveri.
+
+Franchisen jäsenet kootaan kolmesta lähteestä rinnakkain:
+  1. TMDB-kokoelmat (vain elokuvat): /search/collection → /collection/{id}
+  2. franchisen oma keyword (esim. "gundam", "star wars") → discover with_keywords
+  3. nimihaku sivu kerrallaan, mukaan vain nimeen osuvat
+
+Jäsenlista tallennetaan memory["franchise_cache"]:en, joten "paras X" ja
+"uusin X" -kyselyt vastataan välimuistista paikallisella pisteytyksellä.
+Temaattiset kriteerit (synkin, romanttisin...) jäävät rerankin hoidettaviksi.
+"""
+
+import asyncio
+from dataclasses import dataclass
+
+import httpx
+
+from .memory import memory, _log, _norm
+from .decode import Collection, Page
+from .breaker import CircuitOpen
+from .tmdb import PAGE_SIZE, collect_titles, get_json
+from .models import Title, parse_titles
+
+# Enintään näin monta jäsentä per lähde
+MEMBER_LIMIT = 60
+SEARCH_MAX_PAGES = 10
+KEYWORD_MAX_PAGES = 3
+MAX_COLLECTIONS = 5
+
+# Bayes-painotetun arvosanan "ennakkoäänet": vähän ääniä saanut teos vedetään kohti keskiarvoa
+PRIOR_VOTES = 100
+
+# Katselujärjestystä kysyvät sanat → vanhin ensin
+_CHRONO_HINTS = ("järjestyk", "aikajärjesty", "kronolog", "in order", "watch order")
+
+# Lähteiden nimet lokiin, samassa järjestyksessä kuin resolve hakee ne
+_SOURCES = ("kokoelmat", "keyword", "nimihaku")
+
+
+@dataclass(slots=True)
+class Franchise:
+    name: str
+    media_type: str
+    members: tuple[Title, ...]
+    collections: tuple[str, ...] = ()
+    keywords: tuple[str, ...] = ()
+
+
+async def fetch_collection(
+    client: httpx.AsyncClient, collection_id: int, language: str = "en",
+) -> tuple[Title, ...] | None:
+    """Kokoelman osat julkaisujärjestyksessä. Välimuistissa kokoelma-id:llä ja kielellä,
+    joten saman kokoelman kaikki elokuvat käyttävät samaa hakua. Kokoelma on aina
+    lisätieto: mikä tahansa TMDB-virhe (status, verkko, katkaisija auki) → None."""
+    cache = memory["collection_cache"]
+    parts = cache.get((collection_id, language))
+    if parts is None:
+        try:
+            cd = await get_json(client, f"/collection/{collection_id}", {"language": language}, shape=Collection)
+        except (httpx.HTTPError, CircuitOpen):
+            return None
+        parts = tuple(sorted(parse_titles(cd.get("parts", []), "movie"), key=lambda p: p.year or "9999"))
+        cache.set((collection_id, language), parts)
+    return parts
+
+
+async def _from_collections(client, name: str, media_type: str) -> tuple[list[str], list[Title]]:
+    if media_type != "movie":
+        return [], []
+    data = await get_json(
+        client, "/search/collection", {"query": name, "language": "en"}, shape=Page, raise_for_status=False,
+    )
+    key = _norm(name)
+    hits = [c for c in data.get("results", []) if key in _norm(c.get("name") or "")][:MAX_COLLECTIONS]
+    parts = await asyncio.gather(*[fetch_collection(client, c["id"]) for c in hits])
+    names = [c["name"] for c, p in zip(hits, parts) if p]
+    return names, [t for p in parts if p for t in p]
+
+
+async def _from_keyword(client, name: str, media_type: str) -> tuple[list[str], list[Title]]:
+    data = await get_json(client, "/search/keyword", {"query": name}, shape=Page, raise_for_status=False)
+    key = _norm(name)
+    kws = [k for k in data.get("results", []) if _norm(k.get("name") or "") == key][:2]
+    if not kws:
+        return [], []
+    params = {
+        "with_keywords": "|".join(str(k["id"]) for k in kws),
+        "sort_by": "vote_count.desc",
+        "include_adult": False,
+        "language": "en",
+    }
+    titles, _ = await collect_titles(
+        client, f"/discover/{media_type}", params, media_type,
+        limit=MEMBER_LIMIT, max_pages=KEYWORD_MAX_PAGES, raise_for_status=False,
+    )
+    return [k["name"] for k in kws], titles
+
+
+async def _from_titles(client, name: str, media_type: str) -> list[Title]:
+    key = _norm(name)
+    params = {"query": name, "include_adult": True}
+
+    def _in_franchise(t: Title) -> bool:
+        return key in _norm(t.title) or key in _norm(t.original_title)
+
+    titles, _ = await collect_titles(
+        client, f"/search/{media_type}", params, media_type,
+        limit=MEMBER_LIMIT, keep=_in_franchise, max_pages=SEARCH_MAX_PAGES, raise_for_status=False,
+    )
+    if not titles:
+        # Nimi ei osu mihinkään (esim. vain japaninkielinen nimi) → kaksi ensimmäistä sivua sellaisenaan
+        titles, _ = await collect_titles(
+            client, f"/search/{media_type}", params, media_type, limit=2 * PAGE_SIZE, raise_for_status=False,
+        )
+    return titles
+
+
+async def resolve(client: httpx.AsyncClient, name: str, media_type: str = "movie") -> Franchise:
+    """Franchisen jäsenet kaikista lähteistä, duplikaatit pois. Tulos välimuistiin.
+
+    Kaatunut lähde lokitetaan ja ohitetaan; vasta kaikkien kaatuminen nostaa virheen.
+    Osittaista tulosta ei tallenneta välimuistiin."""
+    cache = memory["franchise_cache"]
+    key = (media_type, _norm(name))
+    cached = cache.get(key)
+    if cached is not None:
+        _log("FRANCHISE CACHE", f"{name} ({media_type}): {len(cached.members)} jäsentä")
+        return cached
+
+    results = await asyncio.gather(
+        _from_collections(client, name, media_type),
+        _from_keyword(client, name, media_type),
+        _from_titles(client, name, media_type),
+        return_exceptions=True,
+    )
+    # Kaatunut lähde ei kaada muita: jäsenet kootaan onnistuneista
+    failed = [(src, r) for src, r in zip(_SOURCES, results) if isinstance(r, BaseException)]
+    for src, exc in failed:
+        _log("FRANCHISE LÄHDE VIRHE", f"{name} ({media_type}) {src}: {exc!r}")
+    if len(failed) == len(results):
+        raise failed[0][1]
+    coll, kw, search = results
+    coll_names, coll_titles = ([], []) if isinstance(coll, BaseException) else coll
+    kw_names, kw_titles = ([], []) if isinstance(kw, BaseException) else kw
+    search_titles = [] if isinstance(search, BaseException) else search
+
+    members: dict[int, Title] = {}
+    for t in (*coll_titles, *search_titles, *kw_titles):
+        members.setdefault(t.id, t)
+
+    franchise = Franchise(
+        name=name,
+        media_type=media_type,
+        members=tuple(members.values()),
+        collections=tuple(coll_names),
+        keywords=tuple(kw_names),
+    )
+    _log(
+        "FRANCHISE RESOLVE",
+        f"{name} ({media_type}): kokoelmat={coll_names} ({len(coll_titles)}) | "
+        f"keywordit={kw_names} ({len(kw_titles)}) | nimihaku={len(search_titles)} | yhteensä={len(members)}",
+    )
+    if not failed:
+        cache.set(key, franchise)
+    return franchise
+
+
+def sort_for(query: str, sort_by: str) -> str:
+    """Intentin sort_by, paitsi katselujärjestystä kysyttäessä vanhin ensin."""
+    q = query.lower()
+    if any(h in q for h in _CHRONO_HINTS):
+        return "release_date.asc"
+    return sort_by
+
+
+def rank(members: tuple[Title, ...] | list[Title], sort_by: str = "popularity.desc") -> list[Title]:
+    """Järjestä jäsenet paikallisesti: arvosana (Bayes-painotettu), julkaisu tai suosio."""
+    if sort_by.startswith("vote_average"):
+        rated = [t for t in members if t.vote_count]
+        mean = sum(t.vote_average for t in rated) / len(rated) if rated else 0.0
+
+        def weighted(t: Title) -> float:
+            v = t.vote_count
+            return (v * t.vote_average + PRIOR_VOTES * mean) / (v + PRIOR_VOTES)
+
+        return sorted(members, key=weighted, reverse=True)
+    if sort_by.startswith("release_date"):
+        dated = sorted((t for t in members if t.year), key=lambda t: t.year, reverse=sort_by.endswith(".desc"))
+        return dated + [t for t in members if not t.year]
+    return sorted(members, key=lambda t: t.popularity, reverse=True)
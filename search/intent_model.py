@@ -0,0 +1,324 @@
+"""Paikallinen intent-luokittelija: merkki-n-grammit + lineaarinen malli, pelkkä CPU.
+
+Ennustaa SmartSearchIntentin kentät intent ja media_type millisekunneissa.
+llm.classify_query käyttää sitä ennen kielimallia:
+  - varma trending/person → LLM-kutsu jää kokonaan pois (kentät päätellään kyselystä)
+  - muu varma intent     → LLM-kutsu ilman päättelyketjua (Predict, ei ChainOfThought)
+  - epävarma tai ei mallia → kuten ennen
+
+Opetusdata:
+  data/examples.jsonl — käsin korjatut intentit (save_example), painotettu
+  query_log.jsonl     — kielimallin luokittelut (source="llm")
+
+Mallitiedosto (JSON, TMDB_INTENT_MODEL, oletus data/intent_model.json):
+  {"version": 1, "ngrams": [2, 4], "trained": <unix-aika>, "examples": n,
+   "heads": {"intent": {"labels": [...], "bias": [...], "weights": {piirre: [...]}},
+             "media_type": {...}}}
+
+  uv run python -m search.intent_model train       # opeta ja tallenna
+  uv run python -m search.intent_model eval        # tarkkuus ja viive pidätetyllä osalla
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import statistics
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import memory as _memory_module
+from .examples import _EXAMPLES_FILE, load_examples
+from .memory import _norm_query
+
+MODEL_FILE = Path(os.getenv("TMDB_INTENT_MODEL") or Path(__file__).parent.parent / "data" / "intent_model.json")
+# Tätä varmempi ennuste kelpaa LLM:n ohittamiseen tai kevennykseen
+THRESHOLD = float(os.getenv("TMDB_LOCAL_INTENT_THRESHOLD", "0.9"))
+NGRAMS = (2, 4)
+HEADS = ("intent", "media_type")
+# Käsin korjattu esimerkki painaa enemmän kuin LLM:n luokittelu
+EXAMPLE_WEIGHT = 3.0
+
+
+def featurize(text: str, ngrams: tuple[int, int] = NGRAMS) -> dict[str, float]:
+    """Merkki-n-grammit sanarajoineen + kokonaiset sanat. Arvot normalisoitu (L2)."""
+    text = " ".join(text.lower().split())
+    padded = f" {text} "
+    feats: dict[str, float] = {}
+    lo, hi = ngrams
+    for n in range(lo, hi + 1):
+        for i in range(len(padded) - n + 1):
+            g = padded[i:i + n]
+            feats[g] = feats.get(g, 0.0) + 1.0
+    for word in text.split():
+        key = f"w:{word}"
+        feats[key] = feats.get(key, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in feats.values())) or 1.0
+    return {k: v / norm for k, v in feats.items()}
+
+
+def _softmax(scores: list[float]) -> list[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class _Head:
+    """Multinomiaalinen logistinen regressio harvoilla piirteillä."""
+
+    __slots__ = ("labels", "bias", "weights")
+
+    def __init__(self, labels: list[str], bias: list[float] | None = None,
+                 weights: dict[str, list[float]] | None = None):
+        self.labels = labels
+        self.bias = bias or [0.0] * len(labels)
+        self.weights = weights or {}
+
+    def probs(self, feats: dict[str, float]) -> list[float]:
+        scores = list(self.bias)
+        for f, v in feats.items():
+            w = self.weights.get(f)
+            if w is not None:
+                for k in range(len(scores)):
+                    scores[k] += w[k] * v
+        return _softmax(scores)
+
+    def fit(self, data: list[tuple[dict[str, float], int, float]], epochs: int, lr: float, l2: float, seed: int) -> None:
+        rng = random.Random(seed)
+        k_labels = len(self.labels)
+        order = list(range(len(data)))
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = lr / (1 + epoch * 0.2)
+            for i in order:
+                feats, y, weight = data[i]
+                p = self.probs(feats)
+                for k in range(k_labels):
+                    g = (p[k] - (1.0 if k == y else 0.0)) * weight
+                    self.bias[k] -= rate * g
+                    for f, v in feats.items():
+                        w = self.weights.get(f)
+                        if w is None:
+                            w = self.weights[f] = [0.0] * k_labels
+                        w[k] -= rate * (g * v + l2 * w[k])
+
+    def prune(self, eps: float = 1e-3) -> None:
+        self.weights = {f: w for f, w in self.weights.items() if max(map(abs, w)) >= eps}
+
+    def to_json(self) -> dict:
+        return {
+            "labels": self.labels,
+            "bias": [round(b, 5) for b in self.bias],
+            "weights": {f: [round(x, 5) for x in w] for f, w in self.weights.items()},
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class Guess:
+    intent: str
+    intent_p: float
+    media_type: str
+    media_type_p: float
+
+    @property
+    def confident(self) -> bool:
+        return self.intent_p >= THRESHOLD and self.media_type_p >= THRESHOLD
+
+
+class IntentModel:
+    __slots__ = ("heads", "ngrams", "meta")
+
+    def __init__(self, heads: dict[str, _Head], ngrams: tuple[int, int] = NGRAMS, meta: dict | None = None):
+        self.heads = heads
+        self.ngrams = ngrams
+        self.meta = meta or {}
+
+    def predict(self, query: str) -> Guess:
+        """Todennäköisin luokka per pää. Pää jolla on alle kaksi luokkaa (opetusdatassa
+        esim. vain elokuvia) antaisi aina p=1 — sen todennäköisyys on 0, joten arvaus
+        ei ole koskaan varma."""
+        feats = featurize(query, self.ngrams)
+        out = {}
+        for name, head in self.heads.items():
+            if len(head.labels) < 2:
+                out[name] = (head.labels[0], 0.0)
+                continue
+            p = head.probs(feats)
+            k = max(range(len(p)), key=p.__getitem__)
+            out[name] = (head.labels[k], p[k])
+        return Guess(out["intent"][0], out["intent"][1], out["media_type"][0], out["media_type"][1])
+
+    @classmethod
+    def train(cls, rows: list[dict], epochs: int = 20, lr: float = 0.5, l2: float = 1e-4,
+              seed: int = 0) -> "IntentModel":
+        """rows: {"query", "intent", "media_type", "weight"}."""
+        feats = [featurize(r["query"]) for r in rows]
+        heads = {}
+        for name in HEADS:
+            labels = sorted({r[name] for r in rows})
+            index = {label: i for i, label in enumerate(labels)}
+            head = _Head(labels)
+            head.fit([(f, index[r[name]], r.get("weight", 1.0)) for f, r in zip(feats, rows)],
+                     epochs, lr, l2, seed)
+            head.prune()
+            heads[name] = head
+        return cls(heads, NGRAMS, {"trained": round(time.time()), "examples": len(rows)})
+
+    def save(self, path: Path = MODEL_FILE) -> None:
+        data = {
+            "version": 1,
+            "ngrams": list(self.ngrams),
+            **self.meta,
+            "heads": {name: head.to_json() for name, head in self.heads.items()},
+        }
+        tmp = Path(f"{path}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = MODEL_FILE) -> "IntentModel":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.get("version") != 1:
+            raise ValueError(f"Tuntematon mallitiedoston versio: {data.get('version')}")
+        heads = {name: _Head(h["labels"], h["bias"], h["weights"]) for name, h in data["heads"].items()}
+        meta = {k: data[k] for k in ("trained", "examples") if k in data}
+        return cls(heads, tuple(data["ngrams"]), meta)
+
+
+# Ladattu malli: (tiedoston mtime, malli) — uusi opetus otetaan käyttöön ilman uudelleenkäynnistystä
+_loaded: tuple[float, IntentModel | None] | None = None
+
+
+def guess(query: str) -> Guess | None:
+    """Paikallinen ennuste, tai None jos mallia ei ole opetettu."""
+    global _loaded
+    try:
+        mtime = MODEL_FILE.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if _loaded is None or _loaded[0] != mtime:
+        try:
+            _loaded = (mtime, IntentModel.load(MODEL_FILE))
+        except (OSError, ValueError, KeyError) as e:
+            _memory_module._log("INTENT-MALLI VIRHE", repr(e))
+            _loaded = (mtime, None)
+    model = _loaded[1]
+    return model.predict(query) if model is not None else None
+
+
+# ─────────────────────────────────────────────────────────────
+# Opetusdata, opetus ja arviointi
+# ─────────────────────────────────────────────────────────────
+
+def training_rows(examples_file: Path = _EXAMPLES_FILE, query_log: str | None = None) -> list[dict]:
+    """Esimerkit ja LLM-luokittelut yhdeksi listaksi. Sama kysely kerran:
+    käsin korjattu voittaa, muuten viimeisin luokittelu."""
+    rows: dict[str, dict] = {}
+    try:
+        with open(query_log or _memory_module.QUERY_LOG, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if r.get("source") == "llm" and r.get("query") and r.get("media_type"):
+                    rows[_norm_query(r["query"])] = {
+                        "query": r["query"], "intent": r["intent"], "media_type": r["media_type"], "weight": 1.0,
+                    }
+    except FileNotFoundError:
+        pass
+    for e in load_examples(examples_file):
+        correct = e["correct"]
+        if correct.get("intent"):
+            rows[_norm_query(e["query"])] = {
+                "query": e["query"], "intent": correct["intent"],
+                "media_type": correct.get("media_type", "movie"), "weight": EXAMPLE_WEIGHT,
+            }
+    return list(rows.values())
+
+
+def _holdout(query: str, fraction: float) -> bool:
+    """Pysyvä jako: sama kysely on aina samalla puolella."""
+    digest = hashlib.sha1(_norm_query(query).encode()).digest()
+    return digest[0] / 256 < fraction
+
+
+def evaluate(model: IntentModel, rows: Iterable[dict]) -> dict:
+    """Tarkkuus per kenttä, kattavuus ja tarkkuus varmoilla ennusteilla, viive."""
+    rows = list(rows)
+    if not rows:
+        return {"n": 0}
+    latencies = []
+    correct = {name: 0 for name in HEADS}
+    confident = confident_correct = 0
+    for r in rows:
+        t = time.perf_counter()
+        g = model.predict(r["query"])
+        latencies.append((time.perf_counter() - t) * 1000)
+        ok_intent = g.intent == r["intent"]
+        ok_media = g.media_type == r["media_type"]
+        correct["intent"] += ok_intent
+        correct["media_type"] += ok_media
+        if g.confident:
+            confident += 1
+            confident_correct += ok_intent and ok_media
+    latencies.sort()
+    return {
+        "n": len(rows),
+        "accuracy": {name: round(c / len(rows), 3) for name, c in correct.items()},
+        "coverage": round(confident / len(rows), 3),
+        "confident_accuracy": round(confident_correct / confident, 3) if confident else None,
+        "latency_ms": {
+            "p50": round(statistics.median(latencies), 3),
+            "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        },
+    }
+
+
+def _report(title: str, result: dict) -> None:
+    print(title)
+    if not result.get("n"):
+        print("  ei arviointidataa")
+        return
+    print(f"  esimerkkejä:           {result['n']}")
+    for name, acc in result["accuracy"].items():
+        print(f"  tarkkuus {name + ':':<13} {acc:.1%}")
+    conf = result["confident_accuracy"]
+    print(f"  varmoja (p≥{THRESHOLD}):     {result['coverage']:.1%}"
+          + (f", niistä oikein {conf:.1%}" if conf is not None else ""))
+    print(f"  viive p50 / p95:       {result['latency_ms']['p50']} / {result['latency_ms']['p95']} ms")
+
+
+def _main(args: argparse.Namespace) -> None:
+    rows = training_rows()
+    if len({r["intent"] for r in rows}) < 2:
+        raise SystemExit(f"Liian vähän opetusdataa ({len(rows)} kyselyä) — tarvitaan ainakin kaksi intentiä.")
+
+    train = [r for r in rows if not _holdout(r["query"], args.holdout)]
+    test = [r for r in rows if _holdout(r["query"], args.holdout)]
+
+    if args.command == "eval":
+        model = IntentModel.train(train, epochs=args.epochs)
+        _report(f"Arvio ({len(train)} opetus / {len(test)} pidätetty):", evaluate(model, test))
+        return
+
+    # train: arvioidaan pidätetyllä osalla, tallennetaan kaikella datalla opetettu
+    _report(f"Arvio ({len(train)} opetus / {len(test)} pidätetty):",
+            evaluate(IntentModel.train(train, epochs=args.epochs), test))
+    model = IntentModel.train(rows, epochs=args.epochs)
+    model.save(args.out)
+    print(f"Tallennettu {args.out} ({len(rows)} kyselyä)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paikallinen intent-luokittelija.")
+    parser.add_argument("command", choices=("train", "eval"))
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--holdout", type=float, default=0.2, help="arviointiin pidätettävä osuus")
+    parser.add_argument("--out", type=Path, default=MODEL_FILE)
+    _main(parser.parse_args())
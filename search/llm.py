@@ -0,0 +1,232 @@
+"""Kielimallipino laiskasti.
+
+DSPy tuo mukanaan litellm:n ja suuren riippuvuuspuun — tuonti kestää sekunteja.
+Suorat TMDB-työkalut eivät tarvitse sitä, joten palvelin käynnistyy ilman:
+classifier.py ja rerank.py tuodaan vasta ensimmäisellä smart_search-kutsulla
+(tai taustalla käynnistyksen jälkeen, TMDB_LLM_PRELOAD). Tuonti tehdään säikeessä,
+ettei event loop pysähdy sen ajaksi.
+
+Kutsut ovat aikarajattuja (deadline.py). Rajan ylittyessä, virheessä tai kun
+llm-katkaisija on auki (breaker.py) käytetään paikallista varaa: heuristinen intent
+luokittelijan tilalle ja esipisteytetty järjestys (shortlist.py) rerankin tilalle —
+nopea vastaus on tärkeämpi kuin paras järjestys.
+
+  uv run python bench/startup_bench.py    # käynnistysaika ennen ja jälkeen
+"""
+
+import asyncio
+import importlib
+import os
+import re
+import sys
+import threading
+import time
+from collections.abc import Callable
+from types import ModuleType
+
+from . import deadline, intent_model
+from .breaker import breaker
+from .memory import _log, _norm_query
+from .memory import memory as _memory
+from .prompts import SmartSearchIntent, _postprocess
+from .shortlist import by_criteria, by_reference
+
+LM_MODEL = "gemini/gemini-2.5-flash-lite-preview-09-2025"
+# 1 = tuo DSPy taustalla heti käynnistyksen jälkeen, 0 = vasta ensimmäisellä kutsulla
+PRELOAD = os.getenv("TMDB_LLM_PRELOAD", "1") != "0"
+# 1 = merkitse system-viesti (staattinen ohje) palveluntarjoajan kontekstivälimuistiin.
+# Gemini 2.5 tunnistaa toistuvan alun myös ilman merkintää (implicit caching).
+PROMPT_CACHE = os.getenv("TMDB_LLM_PROMPT_CACHE", "0") == "1"
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure_lm() -> None:
+    """dspy.configure kerran per prosessi. classifier.py ja rerank.py kutsuvat tuonnissa."""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        import dspy
+
+        extra = {"cache_control_injection_points": [{"location": "message", "role": "system"}]} if PROMPT_CACHE else {}
+        dspy.configure(lm=dspy.LM(LM_MODEL, api_key=os.getenv("GEMINI_API_KEY"), **extra), track_usage=True)
+        _configured = True
+
+
+# Tokenikirjanpito: kutsun nimi → kumulatiiviset summat
+_USAGE_KEYS = ("calls", "prompt_tokens", "cached_tokens", "completion_tokens", "seconds")
+_usage: dict[str, dict[str, float]] = {}
+_usage_lock = threading.Lock()
+
+
+def record_usage(name: str, prediction, started: float) -> dict:
+    """Kirjaa yhden kutsun tokenit (dspy track_usage) ja keston. Palauttaa kutsun rivin.
+    started: time.perf_counter() ennen kutsua. Välimuistiosumalla tokenit ovat nollia."""
+    row = dict.fromkeys(_USAGE_KEYS, 0)
+    row["calls"] = 1
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    get_usage = getattr(prediction, "get_lm_usage", None)
+    for usage in ((get_usage() if get_usage else None) or {}).values():
+        row["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        row["completion_tokens"] += usage.get("completion_tokens") or 0
+        row["cached_tokens"] += (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    with _usage_lock:
+        total = _usage.setdefault(name, dict.fromkeys(_USAGE_KEYS, 0))
+        for key in _USAGE_KEYS:
+            total[key] += row[key]
+    _log(f"TOKENIT {name}", " ".join(f"{k}={row[k]}" for k in _USAGE_KEYS[1:]))
+    return row
+
+
+def usage_stats() -> dict[str, dict]:
+    """Kumulatiiviset tokenit ja keskiarvot per kutsu."""
+    with _usage_lock:
+        out = {}
+        for name, total in _usage.items():
+            calls = total["calls"] or 1
+            out[name] = {
+                **{k: round(v, 3) for k, v in total.items()},
+                "avg_prompt_tokens": round(total["prompt_tokens"] / calls),
+                "avg_ms": round(total["seconds"] * 1000 / calls),
+            }
+        return out
+
+
+async def _module(name: str) -> ModuleType:
+    """search.<name> — jo tuotu palautetaan suoraan, muuten tuonti säikeessä."""
+    full = f"{__package__}.{name}"
+    module = sys.modules.get(full)
+    if module is None:
+        module = await asyncio.to_thread(importlib.import_module, full)
+    return module
+
+
+# Intentit joiden kentät saadaan kyselystä ilman kielimallia
+LOCAL_INTENTS = ("trending", "person")
+_PERSON_CUES = re.compile(r"^(kuka (on|oli)|who is|henkilö)\s+", re.IGNORECASE)
+_DAY_CUES = re.compile(r"\b(tänään|päivän|today)\b", re.IGNORECASE)
+_TRENDING_CUES = re.compile(r"trend|mitä katsotaan|suosittua nyt", re.IGNORECASE)
+_MOVIE_CUES = re.compile(r"\b(elokuv|leffa|filmi|movie)", re.IGNORECASE)
+
+
+def _local_intent(query: str, intent: str, media_type: str, source: str = "local") -> SmartSearchIntent:
+    if intent == "trending":
+        result = SmartSearchIntent(
+            intent="trending", media_type=media_type,
+            time_window="day" if _DAY_CUES.search(query) else "week",
+        )
+    elif intent == "person":
+        name = _PERSON_CUES.sub("", query.strip()).strip(" ?!.")
+        result = SmartSearchIntent(intent="person", media_type=media_type, person_name=name)
+    else:
+        result = SmartSearchIntent(intent="lookup", media_type=media_type, title=query.strip(" ?!."))
+    result = _postprocess(result, query)
+    result._source = source
+    return result
+
+
+def heuristic_intent(query: str, guess: intent_model.Guess | None = None) -> SmartSearchIntent:
+    """Vara kun kielimalli ei vastaa ajoissa: paikallisen mallin arvaus (vaikka epävarma)
+    tai kyselyn vihjesanat. Jos _postprocess löytää hakuehtoja (genre, kieli, tyylisanat)
+    → discover, muuten kysely nimihakuna (lookup)."""
+    if guess is not None and guess.intent in LOCAL_INTENTS:
+        return _local_intent(query, guess.intent, guess.media_type, "heuristic")
+    media_type = guess.media_type if guess is not None else ("movie" if _MOVIE_CUES.search(query) else "tv")
+    if _TRENDING_CUES.search(query):
+        return _local_intent(query, "trending", media_type, "heuristic")
+    if _PERSON_CUES.match(query.strip()):
+        return _local_intent(query, "person", media_type, "heuristic")
+    criteria = _postprocess(SmartSearchIntent(intent="discover", media_type=media_type), query)
+    if criteria.genres or criteria.keywords or criteria.language:
+        criteria._source = "heuristic"
+        return criteria
+    return _local_intent(query, "lookup", media_type, "heuristic")
+
+
+async def classify_query(query: str, memory: dict) -> SmartSearchIntent:
+    """Paikallinen malli ensin (intent_model.py), sitten intent_cache, kielimalli vain
+    tarvittaessa. Aikarajan ylittyessä heuristinen intent.
+    Välimuistiosuma ei ole kielimallikutsu: se palautetaan myös katkaisijan ollessa
+    auki, eikä sitä kirjata katkaisijalle onnistumiseksi."""
+    guess = intent_model.guess(query)
+    if guess is not None and guess.confident and guess.intent in LOCAL_INTENTS:
+        _log("INTENT PAIKALLISESTI", f"{guess}")
+        return _local_intent(query, guess.intent, guess.media_type)
+    cached = _memory["intent_cache"].get(_norm_query(query))
+    if cached is not None:
+        return cached.model_copy(deep=True)
+    fast = guess is not None and guess.confident
+    circuit = breaker("llm")
+    if deadline.squeezed(deadline.CLASSIFY_TIMEOUT):
+        reason = "kyselyn aikaraja kulunut"
+    elif circuit.allow():
+        try:
+            async with asyncio.timeout(deadline.timeout(deadline.CLASSIFY_TIMEOUT)):
+                classifier = await _module("classifier")
+                intent = await classifier.classify_query(query, memory, fast=fast)
+        except Exception as e:
+            circuit.record(False)
+            reason = "aikakatkaisu" if isinstance(e, TimeoutError) else repr(e)
+        else:
+            circuit.record(True)
+            return intent
+    else:
+        reason = "katkaisija auki"
+    intent = heuristic_intent(query, guess)
+    _log("LUOKITTELU VARA", f"{reason} → heuristinen intent: {intent.intent}/{intent.media_type}")
+    return intent
+
+
+# Rerankin tulos on enintään näin monta ID:tä (kuten signatuurissa)
+RERANK_RESULTS = 12
+
+
+async def _rerank_or_local(name: str, local: Callable[[], list], call: str, *args) -> list[int]:
+    circuit = breaker("llm")
+    if deadline.squeezed(deadline.RERANK_TIMEOUT):
+        reason = "kyselyn aikaraja kulunut"
+    elif circuit.allow():
+        try:
+            async with asyncio.timeout(deadline.timeout(deadline.RERANK_TIMEOUT)):
+                ids = await getattr(await _module("rerank"), call)(*args)
+        except Exception as e:
+            circuit.record(False)
+            reason = "aikakatkaisu" if isinstance(e, TimeoutError) else repr(e)
+        else:
+            circuit.record(True)
+            return ids
+    else:
+        reason = "katkaisija auki"
+    ranked = local()
+    _log(f"{name} VARA", f"{reason} → paikallinen järjestys ({len(ranked)} kandidaattia)")
+    return [c.id for c in ranked[:RERANK_RESULTS]]
+
+
+async def rerank_candidates(ref_items: list[dict], user_keywords: list[str] | None, candidates: list) -> list[int]:
+    """rerank.rerank_candidates — aikarajan ylittyessä esipisteytetty järjestys."""
+    return await _rerank_or_local(
+        "RERANK", lambda: by_reference(ref_items, user_keywords, candidates),
+        "rerank_candidates", ref_items, user_keywords, candidates,
+    )
+
+
+async def rerank_by_criteria(user_query: str, candidates: list) -> list[int]:
+    """rerank.rerank_by_criteria — aikarajan ylittyessä esipisteytetty järjestys."""
+    return await _rerank_or_local(
+        "CRITERIA RERANK", lambda: by_criteria(user_query, candidates),
+        "rerank_by_criteria", user_query, candidates,
+    )
+
+
+async def _preload() -> None:
+    await _module("classifier")
+    await _module("rerank")
+
+
+def preload(enabled: bool = PRELOAD) -> asyncio.Task | None:
+    """Tuo kielimallipino taustalla (server.py:n lifespan)."""
+    if not enabled:
+        return None
+    return asyncio.create_task(_preload())
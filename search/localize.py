@@ -0,0 +1,78 @@
+"""Tulosten kieli (locale) ja varakieliketju.
+
+TMDB palauttaa nimen ja kuvauksen pyydetyllä kielellä. Käännetty nimi on lähes
+aina olemassa, mutta kuvaus puuttuu usein (tyhjä merkkijono) — silloin käytetään
+ketjun seuraavaa kieltä: fi → en.
+
+Varakielen kuvaukset haetaan ensin välimuistista (text_cache: jokainen nähty
+listatulos kirjataan kielensä alle). Vain jos listalta puuttuu vielä kuvauksia,
+sama lista haetaan kerran varakielellä — ja sekin kulkee tmdb.get_json:n
+vastausvälimuistin kautta, joten toistuva haku ei maksa uutta kutsua.
+"""
+
+import os
+import re
+from collections.abc import Awaitable, Callable, Iterable
+
+from .memory import memory
+from .models import Person, Title
+
+DEFAULT_LANGUAGE = os.getenv("TMDB_LANGUAGE", "en")
+FALLBACK_LANGUAGE = "en"
+
+
+def normalize_language(language: str | None) -> str:
+    """'FI' → 'fi', 'pt-br' → 'pt-BR', None → DEFAULT_LANGUAGE. Muu muoto → ValueError."""
+    if not language:
+        return DEFAULT_LANGUAGE
+    m = re.fullmatch(r"([a-zA-Z]{2})(?:-([a-zA-Z]{2}))?", language.strip())
+    if m is None:
+        raise ValueError(f"Tuntematon kieli: '{language}' (esim. fi, en, sv)")
+    lang, country = m.groups()
+    return f"{lang.lower()}-{country.upper()}" if country else lang.lower()
+
+
+def chain(language: str) -> tuple[str, ...]:
+    """Pyydetty kieli ja sen varakielet järjestyksessä."""
+    return (language,) if language == FALLBACK_LANGUAGE else (language, FALLBACK_LANGUAGE)
+
+
+def remember(items: Iterable[Title | Person], language: str) -> None:
+    """Kirjaa kuvaukset text_cacheen: (media_type, id, kieli) → kuvaus."""
+    cache = memory["text_cache"]
+    for t in items:
+        if isinstance(t, Title) and t.overview:
+            cache.set((t.media_type, t.id, language), t.overview)
+
+
+def _fill(titles: list[Title], language: str) -> list[Title]:
+    """Täytä tyhjät kuvaukset välimuistista. Palauttaa yhä puuttuvat."""
+    cache = memory["text_cache"]
+    missing = []
+    for t in titles:
+        if t.overview:
+            continue
+        text = cache.get((t.media_type, t.id, language))
+        if text:
+            t.overview = text
+        else:
+            missing.append(t)
+    return missing
+
+
+async def apply_fallback(
+    items: list[Title | Person],
+    language: str,
+    refetch: Callable[[str], Awaitable[Iterable[Title | Person]]] | None = None,
+) -> None:
+    """Täydennä puuttuvat kuvaukset varakielillä paikallaan.
+    refetch(kieli): sama lista toisella kielellä — kutsutaan vain jos välimuisti ei riitä."""
+    remember(items, language)
+    missing = [t for t in items if isinstance(t, Title) and not t.overview]
+    for fallback in chain(language)[1:]:
+        if not missing:
+            return
+        missing = _fill(missing, fallback)
+        if missing and refetch is not None:
+            remember(await refetch(fallback), fallback)
+            missing = _fill(missing, fallback)
@@ -0,0 +1,60 @@
+"""Aho-Corasick-haku: kaikki tunnetut nimet vapaasta tekstistä yhdellä läpikäynnillä."""
+
+from collections import deque
+
+
+class KeywordMatcher:
+    """Rakennetaan kerran, haetaan monta kertaa. Hakuaika ei riipu nimien määrästä.
+
+    patterns: {hakusana: arvo} — hakusanat annetaan valmiiksi normalisoituina.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, patterns: dict[str, object]):
+        goto: list[dict[str, int]] = [{}]
+        out: list[list[tuple[int, object]]] = [[]]
+
+        for word, value in patterns.items():
+            if not word:
+                continue
+            node = 0
+            for ch in word:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append((len(word), value))
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch, 0) != nxt else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def find(self, text: str) -> list[tuple[int, int, object]]:
+        """Palauttaa osumat (alku, loppu, arvo) tekstijärjestyksessä."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        hits = []
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in out[node]:
+                hits.append((i + 1 - length, i + 1, value))
+        hits.sort(key=lambda h: (h[0], -h[1]))
+        return hits
@@ -1,12 +1,34 @@
+import asyncio
+import json
 import os
+import re as _re
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+
 import httpx
 from dotenv import load_dotenv
 
+from .cache import TTLCache
+from .decode import decode
+from .matcher import KeywordMatcher
+
 load_dotenv()
 
 TMDB_API_KEY = os.getenv("TMDB_API_KEY_V3")
 TMDB_BASE = "https://api.themoviedb.org/3"
 
+# Oletusmaa ikärajoille ja katselupalveluille. Muut maat ladataan ensimmäisellä
+# pyynnöllä (reference_for) ja päivitetään kukin omassa tahdissaan.
+DEFAULT_REGION = os.getenv("TMDB_REGION", "FI").upper()
+REGION_TTL = 24 * 3600
+
+# Keyword-nimi → id (tools.keyword_ids, similar_to). Id:t eivät muutu, joten raja on
+# koossa eikä kestossa: harvinaisimmat (pisimpään käyttämättömät) putoavat pois.
+KEYWORD_CACHE_SIZE = int(os.getenv("TMDB_KEYWORD_CACHE_SIZE", "20000"))
+KEYWORD_CACHE_BYTES = int(float(os.getenv("TMDB_KEYWORD_CACHE_MB", "4")) * 2**20)
+
 _LOG_FILE = os.path.join(os.path.dirname(__file__), "..", "debug.log")
 
 
@@ -17,6 +39,112 @@ def _log(section: str, text: str) -> None:
         f.write(entry)
 
 
+# Rakenteinen kyselyloki: yksi JSON-rivi per smart_search-kysely (warmup.py lukee)
+QUERY_LOG = os.getenv("TMDB_QUERY_LOG") or os.path.join(os.path.dirname(__file__), "..", "query_log.jsonl")
+
+
+def log_query(
+    query: str, intent: str, title: str | None = None, media_type: str | None = None, source: str | None = None,
+) -> None:
+    """title: lookup-/similar_to-/franchise-haun teoksen nimi jos sellainen tulkittiin.
+    source: "llm" tai "local" — intent_model.py opettaa vain LLM:n luokitteluilla."""
+    row = {
+        "ts": round(time.time()), "query": query, "intent": intent, "media_type": media_type,
+        "title": title, "source": source,
+    }
+    with open(QUERY_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+# Palveluiden lisänimet tarkkaan hakuun (discover, similar_to).
+# Vapaan tekstin haussa käytetään vain virallisia nimiä — "max" osuisi "Mad Maxiin".
+_PROVIDER_ALIASES: dict[str, str] = {
+    "areena": "Yle Areena",
+    "yle": "Yle Areena",
+    "prime": "Amazon Prime Video",
+    "prime video": "Amazon Prime Video",
+    "amazon prime": "Amazon Prime Video",
+    "disney": "Disney Plus",
+    "hbo": "HBO Max",
+    "max": "HBO Max",
+    "apple tv": "Apple TV Plus",
+    "skyshowtime": "SkyShowtime",
+}
+
+
+def _norm(name: str) -> str:
+    """'Disney+' ja 'disney plus' → 'disney plus'."""
+    name = name.casefold().replace("+", " plus ")
+    return " ".join(_re.sub(r"[^\w]+", " ", name).split())
+
+
+def _norm_query(query: str) -> str:
+    """Kyselyn avain: sama kysely isoista kirjaimista ja välilyönneistä riippumatta.
+    Yhteinen intent_cachelle, esimerkeille ja paikalliselle mallille."""
+    return " ".join(query.lower().split())
+
+
+@dataclass(frozen=True)
+class ReferenceIndex:
+    """Valmiiksi lasketut hakurakenteet genreille ja palveluille.
+    Rakennetaan kerran per muistin lataus ja vaihdetaan kokonaisena."""
+
+    genre_names: Mapping[str, Mapping[int, str]]        # type → id → nimi
+    genre_ids: Mapping[str, Mapping[str, int]]          # type → casefold-nimi → id
+    providers: Mapping[str, Mapping[str, dict]]         # type → normalisoitu nimi/alias → provider
+    provider_matcher: KeywordMatcher                    # vapaa teksti → virallinen nimi
+
+    def genre_map(self, type: str) -> Mapping[int, str]:
+        return self.genre_names.get(type, _EMPTY)
+
+    def genre_id(self, type: str, name: str) -> int | None:
+        return self.genre_ids.get(type, _EMPTY).get(name.casefold())
+
+    def provider(self, type: str, name: str) -> dict | None:
+        return self.providers.get(type, _EMPTY).get(_norm(name))
+
+    def providers_in(self, text: str) -> list[str]:
+        """Tekstissä mainitut palvelut esiintymisjärjestyksessä.
+        Osuman pitää alkaa sanan alusta — taivutuspääte saa jatkua ("Netflixistä")."""
+        norm = _norm(text)
+        found = []
+        for start, _end, name in self.provider_matcher.find(norm):
+            if start == 0 or norm[start - 1] == " ":
+                found.append(name)
+        return list(dict.fromkeys(found))
+
+
+_EMPTY: Mapping = MappingProxyType({})
+
+
+def build_index(data: Mapping) -> ReferenceIndex:
+    genre_names = {}
+    genre_ids = {}
+    for type, key in (("movie", "movie_genres"), ("tv", "tv_genres")):
+        genres = data.get(key, [])
+        genre_names[type] = MappingProxyType({g["id"]: g["name"] for g in genres})
+        genre_ids[type] = MappingProxyType({g["name"].casefold(): g["id"] for g in genres})
+
+    providers = {}
+    patterns: dict[str, str] = {}
+    for type, key in (("movie", "movie_providers"), ("tv", "tv_providers")):
+        by_name = {_norm(p["provider_name"]): p for p in data.get(key, [])}
+        for alias, target in _PROVIDER_ALIASES.items():
+            match = by_name.get(_norm(target))
+            if match is not None:
+                by_name.setdefault(_norm(alias), match)
+        providers[type] = MappingProxyType(by_name)
+        for p in data.get(key, []):
+            patterns.setdefault(_norm(p["provider_name"]), p["provider_name"])
+
+    return ReferenceIndex(
+        genre_names=MappingProxyType(genre_names),
+        genre_ids=MappingProxyType(genre_ids),
+        providers=MappingProxyType(providers),
+        provider_matcher=KeywordMatcher(patterns),
+    )
+
+
 memory: dict = {
     "movie_genres": [],
     "tv_genres": [],
@@ -24,51 +152,172 @@ memory: dict = {
     "tv_certifications": [],
     "movie_providers": [],
     "tv_providers": [],
-    "keyword_cache": {},
+    # Kaikkien maiden ikärajat (yksi kutsu per tyyppi): type → maa → lista
+    "certifications": {"movie": {}, "tv": {}},
+    # reference_for: maa → saman muotoinen dict kuin memory (ikärajat, palvelut, index)
+    "region_cache": TTLCache(maxsize=64, ttl=REGION_TTL),
+    "keyword_cache": TTLCache(maxsize=KEYWORD_CACHE_SIZE, ttl=30 * 24 * 3600, maxbytes=KEYWORD_CACHE_BYTES),
+    # franchise.py: (media_type, nimi) → Franchise, ja kokoelma-id → osat
+    "franchise_cache": TTLCache(maxsize=256, ttl=24 * 3600),
+    "collection_cache": TTLCache(maxsize=1024, ttl=24 * 3600),
+    # tools._fetch_details: (type, id) → tiedot
+    "details_cache": TTLCache(maxsize=512, ttl=6 * 3600),
+    # tmdb.get_json: (polku, parametrit) → vastauksen tavut — kesto polun mukaan (tmdb.CACHE_TTL)
+    "response_cache": TTLCache(maxsize=4096, ttl=3600),
+    # localize.py: (media_type, id, kieli) → kuvaus — varakielen kuvaukset ilman uutta hakua
+    "text_cache": TTLCache(maxsize=20000, ttl=24 * 3600),
+    # classifier.classify_query: normalisoitu kysely → SmartSearchIntent
+    "intent_cache": TTLCache(maxsize=2048, ttl=24 * 3600),
 }
 
+# Referenssidata: ladataan käynnistyksessä ja vaihdetaan kokonaisena (publish)
+REFERENCE_KEYS = (
+    "movie_genres", "tv_genres", "movie_certifications", "tv_certifications",
+    "movie_providers", "tv_providers", "certifications", "index",
+)
+
+
+def _freeze(value):
+    """Listat tupleiksi ja dictit vain luku -näkymiksi — julkaistua dataa ei muokata."""
+    if isinstance(value, list):
+        return tuple(value)
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    return value
+
+
+def publish(data: Mapping) -> None:
+    """Vaihda referenssidata yhdellä kertaa: arvot jäädytetään ja indeksi rakennetaan
+    ennen vaihtoa, ja kaikki avaimet päivitetään samalla memory.update-kutsulla.
+    Lukija näkee joko vanhan tai uuden tilan, ei sekoitusta."""
+    fresh = {k: _freeze(v) for k, v in data.items() if k != "index"}
+    fresh["index"] = build_index(fresh)
+    memory.update(fresh)
+
+
+def snapshot() -> Mapping:
+    """Oletusmaan referenssidata vain luku -näkymänä. Pysyy samana vaikka muisti
+    ladattaisiin uudelleen — pyyntö joka odottaa välissä näkee yhtenäisen tilan."""
+    return MappingProxyType({"region": DEFAULT_REGION, **{k: memory[k] for k in REFERENCE_KEYS}})
+
+
+publish({k: memory[k] for k in REFERENCE_KEYS if k != "index"})
+
+
+def normalize_region(region: str | None) -> str:
+    """'fi' → 'FI', None → DEFAULT_REGION. Muu kuin kaksikirjaiminen maakoodi → ValueError."""
+    if not region:
+        return DEFAULT_REGION
+    code = region.strip().upper()
+    if not _re.fullmatch(r"[A-Z]{2}", code):
+        raise ValueError(f"Tuntematon maakoodi: '{region}' (esim. FI, SE, NO, DK)")
+    return code
+
+
+def _provider_list(content: bytes) -> list[dict]:
+    return [
+        {"provider_id": p["provider_id"], "provider_name": p["provider_name"]}
+        for p in decode(content).get("results", [])
+    ]
+
+
+async def _fetch_providers(client: httpx.AsyncClient, region: str) -> dict:
+    """Maan elokuva- ja sarjapalvelut rinnakkain."""
+    params = {"api_key": TMDB_API_KEY, "watch_region": region}
+    movie, tv = await asyncio.gather(
+        client.get(f"{TMDB_BASE}/watch/providers/movie", params=params),
+        client.get(f"{TMDB_BASE}/watch/providers/tv", params=params),
+    )
+    movie.raise_for_status()
+    tv.raise_for_status()
+    return {"movie_providers": _provider_list(movie.content), "tv_providers": _provider_list(tv.content)}
+
+
+def _region_reference(region: str, providers: dict) -> dict:
+    """Maan referenssidata samoilla avaimilla kuin memory. Genret ovat kielen, eivät maan,
+    joten ne otetaan muistista sellaisinaan."""
+    ref = {
+        "region": region,
+        "movie_genres": memory["movie_genres"],
+        "tv_genres": memory["tv_genres"],
+        "movie_certifications": memory["certifications"]["movie"].get(region, []),
+        "tv_certifications": memory["certifications"]["tv"].get(region, []),
+        **providers,
+    }
+    ref["index"] = build_index(ref)
+    return MappingProxyType(ref)
+
+
+# Kesken olevat lataukset: samanaikaiset pyynnöt samasta maasta odottavat samaa hakua
+_region_loads: dict[str, asyncio.Future] = {}
+
+
+async def reference_for(region: str | None = None) -> Mapping:
+    """Maan ikärajat, palvelut ja hakuindeksi (vain luku). Oletusmaa on muistissa
+    käynnistyksestä asti; muut haetaan ensimmäisellä käytöllä ja pidetään region_cachessa."""
+    region = normalize_region(region)
+    if region == DEFAULT_REGION:
+        return snapshot()
+    cached = memory["region_cache"].get(region)
+    if cached is not None:
+        return cached
+
+    pending = _region_loads.get(region)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _region_loads[region] = future
+    try:
+        async with httpx.AsyncClient() as client:
+            ref = _region_reference(region, await _fetch_providers(client, region))
+        memory["region_cache"].set(region, ref)
+        future.set_result(ref)
+        return ref
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # odottajia ei välttämättä ole — ei "never retrieved" -varoitusta
+        raise
+    finally:
+        del _region_loads[region]
+
 
 async def load_memory():
     params = {"api_key": TMDB_API_KEY}
+    fresh: dict = {}
     try:
         async with httpx.AsyncClient() as client:
             r = await client.get(f"{TMDB_BASE}/genre/movie/list", params={**params, "language": "fi"})
             r.raise_for_status()
-            memory["movie_genres"] = r.json()["genres"]
+            fresh["movie_genres"] = decode(r.content)["genres"]
 
             r = await client.get(f"{TMDB_BASE}/genre/tv/list", params={**params, "language": "fi"})
             r.raise_for_status()
-            memory["tv_genres"] = r.json()["genres"]
+            fresh["tv_genres"] = decode(r.content)["genres"]
 
-            r = await client.get(f"{TMDB_BASE}/certification/movie/list", params=params)
-            r.raise_for_status()
-            memory["movie_certifications"] = r.json()["certifications"].get("FI", [])
+            # Ikärajat tulevat kaikille maille samassa vastauksessa — muut maat eivät maksa lisäkutsua
+            certifications = {}
+            for type in ("movie", "tv"):
+                r = await client.get(f"{TMDB_BASE}/certification/{type}/list", params=params)
+                r.raise_for_status()
+                certifications[type] = decode(r.content)["certifications"]
+            fresh["certifications"] = certifications
+            fresh["movie_certifications"] = certifications["movie"].get(DEFAULT_REGION, [])
+            fresh["tv_certifications"] = certifications["tv"].get(DEFAULT_REGION, [])
 
-            r = await client.get(f"{TMDB_BASE}/certification/tv/list", params=params)
-            r.raise_for_status()
-            memory["tv_certifications"] = r.json()["certifications"].get("FI", [])
+            fresh.update(await _fetch_providers(client, DEFAULT_REGION))
 
-            r = await client.get(f"{TMDB_BASE}/watch/providers/movie", params={**params, "watch_region": "FI"})
-            r.raise_for_status()
-            memory["movie_providers"] = [
-                {"provider_id": p["provider_id"], "provider_name": p["provider_name"]}
-                for p in r.json().get("results", [])
-            ]
-
-            r = await client.get(f"{TMDB_BASE}/watch/providers/tv", params={**params, "watch_region": "FI"})
-            r.raise_for_status()
-            memory["tv_providers"] = [
-                {"provider_id": p["provider_id"], "provider_name": p["provider_name"]}
-                for p in r.json().get("results", [])
-            ]
+        # Listat ja indeksi vaihdetaan yhdellä kertaa — lukija ei näe puoliksi ladattua tilaa
+        publish(fresh)
+        memory["region_cache"].clear()
 
         print(
             f"Muisti ladattu: {len(memory['movie_genres'])} elokuvagenreä, "
             f"{len(memory['tv_genres'])} sarjagenreä, "
-            f"{len(memory['movie_certifications'])} elokuvasertifikaattia (FI), "
-            f"{len(memory['tv_certifications'])} sarjasertifikaattia (FI), "
-            f"{len(memory['movie_providers'])} elokuvapalvelua (FI), "
-            f"{len(memory['tv_providers'])} sarjapalvelua (FI)"
+            f"{len(memory['movie_certifications'])} elokuvasertifikaattia ({DEFAULT_REGION}), "
+            f"{len(memory['tv_certifications'])} sarjasertifikaattia ({DEFAULT_REGION}), "
+            f"{len(memory['movie_providers'])} elokuvapalvelua ({DEFAULT_REGION}), "
+            f"{len(memory['tv_providers'])} sarjapalvelua ({DEFAULT_REGION})"
         )
     except Exception as e:
         print(f"VIRHE: Muistin lataus epäonnistui: {e}")
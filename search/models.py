@@ -0,0 +1,121 @@
+"""Kevyet tulosrakenteet.
+
+TMDB-vastaukset muunnetaan näiksi heti dekoodauksen jälkeen, jolloin
+näyttönimi, vuosi ja tyyppi lasketaan kerran — eikä jokainen formatteri,
+rerank-prompti ja duplikaattitarkistus kaiva niitä dictistä uudelleen.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class Title:
+    """Elokuva tai sarja listatuloksesta (search, discover, trending, suositukset)."""
+    id: int
+    media_type: str
+    title: str
+    original_title: str = ""
+    year: str = ""
+    overview: str = ""
+    genre_ids: tuple[int, ...] = ()
+    vote_average: float = 0.0
+    vote_count: int = 0
+    popularity: float = 0.0
+    original_language: str = ""
+    display_name: str = field(init=False)
+
+    def __post_init__(self):
+        if self.original_title and self.original_title != self.title:
+            self.display_name = f"{self.title} ({self.original_title})"
+        else:
+            self.display_name = self.title
+
+    @classmethod
+    def from_tmdb(cls, item: dict, media_type: str = "movie") -> "Title":
+        """media_type: käytetään jos rivillä ei ole omaa media_type-kenttää."""
+        return cls(
+            id=item["id"],
+            media_type=item.get("media_type") or media_type,
+            title=item.get("title") or item.get("name") or "?",
+            original_title=item.get("original_title") or item.get("original_name") or "",
+            year=(item.get("release_date") or item.get("first_air_date") or "")[:4],
+            overview=item.get("overview") or "",
+            genre_ids=tuple(item.get("genre_ids") or ()),
+            vote_average=item.get("vote_average") or 0.0,
+            vote_count=item.get("vote_count") or 0,
+            popularity=item.get("popularity") or 0.0,
+            original_language=item.get("original_language") or "",
+        )
+
+    @property
+    def label(self) -> str:
+        """Lyhyt muoto: 'Nimi (vuosi)' tai pelkkä nimi."""
+        return f"{self.title} ({self.year})" if self.year else self.title
+
+
+@dataclass(slots=True)
+class Person:
+    id: int
+    name: str
+    department: str = ""
+    known_for: tuple[Title, ...] = ()
+
+    @classmethod
+    def from_tmdb(cls, item: dict) -> "Person":
+        return cls(
+            id=item["id"],
+            name=item.get("name") or "?",
+            department=item.get("known_for_department") or "",
+            known_for=tuple(Title.from_tmdb(kf) for kf in (item.get("known_for") or [])[:3]),
+        )
+
+
+@dataclass(slots=True)
+class Credit:
+    """Rooli tai työtehtävä henkilön combined_credits-listasta."""
+    id: int
+    media_type: str
+    title: str
+    year: str = ""
+    vote_count: int = 0
+    character: str = ""
+    job: str = ""
+
+    @classmethod
+    def from_tmdb(cls, item: dict) -> "Credit":
+        return cls(
+            id=item["id"],
+            media_type=item.get("media_type") or "movie",
+            title=item.get("title") or item.get("name") or "?",
+            year=(item.get("release_date") or item.get("first_air_date") or "")[:4],
+            vote_count=item.get("vote_count") or 0,
+            character=item.get("character") or "",
+            job=item.get("job") or "",
+        )
+
+
+# Rerankerin kandidaatti on tavallinen listatulos
+Candidate = Title
+
+
+def parse_results(results: list[dict], media_type: str = "movie") -> list[Title | Person]:
+    """Muunna tuloslista rakenteiksi. Henkilöt (search/multi, trending) → Person."""
+    return [
+        Person.from_tmdb(item) if item.get("media_type") == "person" else Title.from_tmdb(item, media_type)
+        for item in results
+        if "id" in item
+    ]
+
+
+def parse_titles(results: list[dict], media_type: str = "movie") -> list[Title]:
+    """Kuten parse_results, mutta vain elokuvat ja sarjat."""
+    return [
+        Title.from_tmdb(item, media_type)
+        for item in results
+        if "id" in item and item.get("media_type") != "person"
+    ]
+
+
+def genre_names(title: Title, genre_map: Mapping[int, str]) -> list[str]:
+    return [genre_map.get(gid, str(gid)) for gid in title.genre_ids]
@@ -0,0 +1,186 @@
+"""Luokittelijan offline-optimointi: data/examples.jsonl → tallennettu DSPy-ohjelma.
+
+Ehdokkaat arvioidaan samoilla pidätetyillä esimerkeillä:
+  baseline          — nykyinen ohjelma (nolla-shot ChainOfThought tai aiempi optimointi)
+  chain_of_thought  — ChainOfThought + BootstrapFewShot-esimerkit
+  predict           — Predict (ei päättelyketjua) + samat esimerkit
+
+Predict valitaan jos sen tarkkuus pysyy baselinen tasolla (--tolerance):
+päättelyketju on suurin osa vastauksen tokeneista ja viiveestä. Muuten
+ChainOfThought jos se on vähintään baselinen tasolla, ja jos kumpikaan ei ole,
+tiedostoa ei kirjoiteta. Esimerkeistä jätetään pois genre- ja palvelulistat —
+ne ovat jo itse kyselyssä, eikä niitä kannata toistaa jokaisessa esimerkissä.
+
+Tallennettu ohjelma (classifier.PROGRAM_FILE) ladataan classifier.py:n tuonnissa.
+
+  uv run python -m search.optimize                  # optimoi, raportoi, tallenna
+  uv run python -m search.optimize --dry-run        # pelkkä raportti
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from pathlib import Path
+
+import dspy
+
+from . import classifier
+from .examples import _EXAMPLES_FILE, load_examples
+from .memory import load_memory, memory
+from .prompts import SmartSearchIntent
+
+# Listasyötteet jotka poistetaan few-shot-esimerkeistä
+_BULKY_INPUTS = ("available_movie_genres", "available_tv_genres", "available_providers")
+
+# Intentin pääkenttä: tämän pitää osua, muut kentät ovat hakuehtoja
+_KEY_FIELD = {
+    "lookup": "title",
+    "person": "person_name",
+    "franchise": "franchise_query",
+    "similar_to": "reference_titles",
+    "discover": None,
+    "trending": "time_window",
+}
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, list) or isinstance(b, list):
+        return {str(x).lower() for x in a or []} == {str(x).lower() for x in b or []}
+    if isinstance(a, str) and isinstance(b, str):
+        return a.strip().lower() == b.strip().lower()
+    return a == b
+
+
+def metric(example: dspy.Example, prediction, trace=None) -> float | bool:
+    """Osuus kolmesta: intent, media_type ja intentin pääkenttä.
+    Bootstrapissa (trace annettu) kelpaa vain täysin oikea."""
+    want: SmartSearchIntent = example.result
+    got = getattr(prediction, "result", None)
+    if not isinstance(got, SmartSearchIntent):
+        return False if trace is not None else 0.0
+    field = _KEY_FIELD.get(want.intent)
+    checks = [
+        got.intent == want.intent,
+        got.media_type == want.media_type,
+        field is None or _same(getattr(got, field), getattr(want, field)),
+    ]
+    score = sum(checks) / len(checks)
+    return score == 1.0 if trace is not None else score
+
+
+def trainset(examples_file: Path = _EXAMPLES_FILE, mem: dict | None = None) -> list[dspy.Example]:
+    """Esimerkit → dspy.Example:t. Syötteet kuten oikeassa kutsussa (classifier._inputs)."""
+    out = []
+    for e in load_examples(examples_file):
+        inputs = classifier._inputs(e["query"], memory if mem is None else mem)
+        out.append(dspy.Example(**inputs, result=SmartSearchIntent(**e["correct"])).with_inputs(*inputs))
+    return out
+
+
+def slim_demos(program: dspy.Module) -> dspy.Module:
+    """Poista genre- ja palvelulistat esimerkeistä (ne ovat jo varsinaisessa kyselyssä)."""
+    for predictor in program.predictors():
+        predictor.demos = [
+            dspy.Example({k: v for k, v in d.items() if k not in _BULKY_INPUTS})
+            for d in predictor.demos
+        ]
+    return program
+
+
+def split(examples: list[dspy.Example], holdout: float, seed: int = 0) -> tuple[list, list]:
+    """Satunnainen mutta toistettava jako. Alle 10 esimerkillä arvioidaan koko joukolla."""
+    if len(examples) < 10:
+        return examples, examples
+    shuffled = examples[:]
+    random.Random(seed).shuffle(shuffled)
+    n = max(1, int(len(shuffled) * holdout))
+    return shuffled[n:], shuffled[:n]
+
+
+def evaluate(program: dspy.Module, devset: list[dspy.Example], lm: dspy.LM) -> dict:
+    """Tarkkuus (metric), prompt-tokenit (LM:n usage) ja viive per kutsu."""
+    scores, tokens, latencies = [], [], []
+    with dspy.context(lm=lm):
+        for example in devset:
+            before = len(lm.history)
+            t = time.perf_counter()
+            try:
+                prediction = program(**example.inputs())
+            except Exception:
+                prediction = None  # jäsennysvirhe lasketaan vääräksi
+            latencies.append((time.perf_counter() - t) * 1000)
+            scores.append(metric(example, prediction))
+            usage = (lm.history[-1].get("usage") or {}) if len(lm.history) > before else {}
+            if usage.get("prompt_tokens"):
+                tokens.append(usage["prompt_tokens"])
+    return {
+        "n": len(devset),
+        "accuracy": round(statistics.fmean(scores), 3) if scores else None,
+        "prompt_tokens": round(statistics.fmean(tokens)) if tokens else None,
+        "latency_ms": round(statistics.median(latencies)) if latencies else None,
+    }
+
+
+def choose(report: dict[str, dict], tolerance: float = 0.0) -> str | None:
+    """Valitse tallennettava ehdokas raportista, tai None (baseline jää voimaan)."""
+    base = report["baseline"]["accuracy"] or 0.0
+    for kind in ("predict", "chain_of_thought"):
+        acc = report.get(kind, {}).get("accuracy")
+        if acc is not None and acc >= base - (tolerance if kind == "predict" else 0.0):
+            return kind
+    return None
+
+
+def _print_report(report: dict[str, dict]) -> None:
+    print(f"{'ohjelma':<18} {'tarkkuus':>9} {'prompt-tok':>11} {'viive ms':>9}")
+    for name, r in report.items():
+        acc = f"{r['accuracy']:.1%}" if r["accuracy"] is not None else "-"
+        print(f"{name:<18} {acc:>9} {r['prompt_tokens'] or '-':>11} {r['latency_ms'] or '-':>9}")
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await load_memory()
+    examples = trainset()
+    if len(examples) < 2:
+        raise SystemExit(f"Liian vähän esimerkkejä ({len(examples)}) — lisää add_training_example-työkalulla.")
+    train, dev = split(examples, args.holdout)
+
+    # Ilman välimuistia: muuten viive ja tokenit mitattaisiin välimuistista
+    lm = dspy.settings.lm.copy(cache=False)
+    optimizer = dspy.BootstrapFewShot(metric=metric, max_bootstrapped_demos=args.demos,
+                                      max_labeled_demos=args.demos)
+    candidates = {"baseline": classifier._classifier}
+    for kind in ("chain_of_thought", "predict"):
+        student = classifier.PROGRAM_KINDS[kind](classifier.QueryClassification)
+        compiled = await asyncio.to_thread(optimizer.compile, student, trainset=train)
+        candidates[kind] = slim_demos(compiled)
+
+    report = {}
+    for name, program in candidates.items():
+        report[name] = await asyncio.to_thread(evaluate, program, dev, lm)
+    print(f"Esimerkkejä {len(train)} opetus / {len(dev)} arviointi")
+    _print_report(report)
+
+    kind = choose(report, args.tolerance)
+    if kind is None:
+        print("Kumpikaan optimoitu ohjelma ei yllä baselinen tarkkuuteen — ei tallennettu.")
+        return
+    if args.dry_run:
+        print(f"Valittaisiin: {kind}")
+        return
+    classifier.save_program(candidates[kind], kind, args.out,
+                            compiled=round(time.time()), examples=len(examples), report=report)
+    print(f"Tallennettu {args.out} ({kind})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimoi luokittelija data/examples.jsonl:n perusteella.")
+    parser.add_argument("--demos", type=int, default=4, help="few-shot-esimerkkejä enintään")
+    parser.add_argument("--holdout", type=float, default=0.3, help="arviointiin pidätettävä osuus")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="kuinka paljon Predict saa hävitä tarkkuudessa baselinelle")
+    parser.add_argument("--out", type=Path, default=classifier.PROGRAM_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="raportti ilman tallennusta")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,9 +1,11 @@
-import asyncio
-from typing import Literal
-from pydantic import BaseModel
-import dspy
+"""SmartSearchIntent ja sen jälkikäsittely — ei riippuvuutta DSPy:hin.
+
+Luokittelija (classifier.py) ja rerankerit (rerank.py) tuovat DSPy:n; tämä moduuli
+tuodaan jo palvelimen käynnistyksessä, joten se pidetään kevyenä.
+"""
 
-from .memory import _log
+from typing import Literal
+from pydantic import BaseModel, PrivateAttr
 
 
 class SmartSearchIntent(BaseModel):
@@ -43,6 +45,13 @@ class SmartSearchIntent(BaseModel):
     # --- franchise ---
     franchise_query: str | None = None
 
+    # Kuka luokitteli: "llm" tai "local" (intent_model.py). Ei osa LLM:n skeemaa.
+    _source: str = PrivateAttr(default="llm")
+
+    @property
+    def source(self) -> str:
+        return self._source
+
 
 
 import re as _re
@@ -149,92 +158,3 @@ def _postprocess(intent: SmartSearchIntent, query: str = "") -> SmartSearchInten
                 break
 
     return SmartSearchIntent(**data)
-
-
-class _RerankedIds(BaseModel):
-    ids: list[int]
-
-
-class _RerankByReference(dspy.Signature):
-    """Olet elokuvasuositin. Valitse kandidaateista temaattisesti parhaiten
-    sopivat referenssiteosten perusteella. Palauta enintään 12 ID:tä
-    parhaimmasta huonoimpaan."""
-
-    references: str = dspy.InputField(desc="Referenssiteokset: nimi, kuvaus ja teemat")
-    user_emphasis: str = dspy.InputField(desc="Käyttäjän painottamat teemat, tai tyhjä")
-    candidates: str = dspy.InputField(desc="Kandidaatit muodossa [ID] Nimi (vuosi) - kuvaus")
-    result: _RerankedIds = dspy.OutputField(desc="ID-lista parhaimmasta huonoimpaan, max 12")
-
-
-class _RerankByCriteria(dspy.Signature):
-    """Olet elokuva- ja sarjasuositin. Järjestä kandidaatit niin että parhaiten
-    käyttäjän hakua vastaavat ovat ensin. Palauta enintään 12 ID:tä
-    parhaimmasta huonoimpaan. Sisällytä vain relevantit teokset."""
-
-    user_query: str = dspy.InputField(desc="Käyttäjän hakukysely")
-    candidates: str = dspy.InputField(desc="Kandidaatit muodossa [ID] Nimi (vuosi) - kuvaus")
-    result: _RerankedIds = dspy.OutputField(desc="ID-lista parhaimmasta huonoimpaan, max 12")
-
-
-_reranker = dspy.ChainOfThought(_RerankByReference)
-_criteria_reranker = dspy.ChainOfThought(_RerankByCriteria)
-
-
-async def rerank_candidates(
-    ref_items: list[dict],        # [{name, overview, kw_names}] — yksi per referenssi
-    user_keywords: list[str] | None,
-    candidates: list[dict],
-) -> list[int]:
-    """Valitse temaattisesti parhaiten sopivat kandidaatit DSPy:n avulla."""
-    if not candidates:
-        return []
-
-    ref_lines = "\n".join(
-        f"{i+1}. {item['name']} — {item['overview'][:300]} — teemat: {', '.join(item['kw_names']) or '-'}"
-        for i, item in enumerate(ref_items)
-    )
-    user_kw_str = ", ".join(user_keywords) if user_keywords else ""
-    cand_lines = "\n".join(
-        f"[{c['id']}] {c.get('name') or c.get('title','?')} "
-        f"({(c.get('first_air_date') or c.get('release_date',''))[:4]}) "
-        f"- {c.get('overview','')[:150]}"
-        for c in candidates
-    )
-
-    _log("DSPY RERANK INPUT", f"refs={ref_lines[:300]}\nkw={user_kw_str}\ncands={cand_lines[:300]}")
-
-    prediction = await asyncio.to_thread(
-        _reranker,
-        references=ref_lines,
-        user_emphasis=user_kw_str,
-        candidates=cand_lines,
-    )
-
-    _log("DSPY RERANK TULOS", str(prediction.result.ids))
-    return prediction.result.ids
-
-
-async def rerank_by_criteria(user_query: str, candidates: list[dict]) -> list[int]:
-    """Järjestä kandidaatit käyttäjän kriteerien mukaan (ei referenssiteosta)."""
-    if not candidates:
-        return []
-
-    cand_lines = "\n".join(
-        f"[{c['id']}] {c.get('name') or c.get('title', '?')} "
-        f"({(c.get('first_air_date') or c.get('release_date', ''))[:4]}) "
-        f"- {c.get('overview', '')[:150]}"
-        for c in candidates
-    )
-
-    _log("DSPY CRITERIA RERANK INPUT", f"query={user_query}\ncands={cand_lines[:300]}")
-
-    prediction = await asyncio.to_thread(
-        _criteria_reranker,
-        user_query=user_query,
-        candidates=cand_lines,
-    )
-
-    _log("DSPY CRITERIA RERANK TULOS", str(prediction.result.ids))
-    return prediction.result.ids
-
-
@@ -0,0 +1,112 @@
+"""DSPy-rerankerit: kandidaattien järjestys referenssien tai kriteerien mukaan.
+
+Tuodaan laiskasti llm.py:n kautta — DSPy ja litellm ovat raskaita.
+Prompti rakennetaan shortlist.py:llä: karsitut kandidaatit, tokenibudjetti.
+Jokaisen kutsun tokenit ja kesto kirjataan (llm.record_usage).
+"""
+
+import asyncio
+import os
+import time
+
+import dspy
+from pydantic import BaseModel
+
+from .llm import configure_lm, record_usage
+from .memory import _log
+from .models import Candidate
+from .shortlist import budgets, by_criteria, by_reference, candidate_lines, estimate_tokens, reference_lines
+
+configure_lm()
+
+
+class _RerankedIds(BaseModel):
+    ids: list[int]
+
+
+class _RerankByReference(dspy.Signature):
+    """Olet elokuvasuositin. Valitse kandidaateista temaattisesti parhaiten
+    sopivat referenssiteosten perusteella. Palauta enintään 12 ID:tä
+    parhaimmasta huonoimpaan."""
+
+    references: str = dspy.InputField(desc="Referenssiteokset: nimi, kuvaus ja teemat")
+    user_emphasis: str = dspy.InputField(desc="Käyttäjän painottamat teemat, tai tyhjä")
+    candidates: str = dspy.InputField(desc="Kandidaatit muodossa [ID] Nimi (vuosi) - kuvaus")
+    result: _RerankedIds = dspy.OutputField(desc="ID-lista parhaimmasta huonoimpaan, max 12")
+
+
+class _RerankByCriteria(dspy.Signature):
+    """Olet elokuva- ja sarjasuositin. Järjestä kandidaatit niin että parhaiten
+    käyttäjän hakua vastaavat ovat ensin. Palauta enintään 12 ID:tä
+    parhaimmasta huonoimpaan. Sisällytä vain relevantit teokset."""
+
+    user_query: str = dspy.InputField(desc="Käyttäjän hakukysely")
+    candidates: str = dspy.InputField(desc="Kandidaatit muodossa [ID] Nimi (vuosi) - kuvaus")
+    result: _RerankedIds = dspy.OutputField(desc="ID-lista parhaimmasta huonoimpaan, max 12")
+
+
+# predict = ilman päättelyketjua (nopein), cot = ChainOfThought
+RERANK_MODE = os.getenv("TMDB_RERANK_MODE", "predict")
+_Module = dspy.ChainOfThought if RERANK_MODE == "cot" else dspy.Predict
+
+_reranker = _Module(_RerankByReference)
+_criteria_reranker = _Module(_RerankByCriteria)
+
+
+async def rerank_candidates(
+    ref_items: list[dict],        # [{name, overview, kw_names, genre_ids}] — yksi per referenssi
+    user_keywords: list[str] | None,
+    candidates: list[Candidate],
+) -> list[int]:
+    """Valitse temaattisesti parhaiten sopivat kandidaatit DSPy:n avulla.
+    Kandidaatit karsitaan ja kuvaukset lyhennetään ensin (shortlist.py)."""
+    if not candidates:
+        return []
+
+    user_kw_str = ", ".join(user_keywords) if user_keywords else ""
+    kept = by_reference(ref_items, user_keywords, candidates)
+    ref_budget, cand_budget = budgets()
+    ref_lines = reference_lines(ref_items, ref_budget)
+    cand_lines = candidate_lines(kept, cand_budget)
+
+    _log("DSPY RERANK INPUT", (
+        f"kandidaatteja {len(candidates)} → {len(kept)}, arvio {estimate_tokens(ref_lines, cand_lines)} tokenia\n"
+        f"refs={ref_lines[:300]}\nkw={user_kw_str}\ncands={cand_lines[:300]}"
+    ))
+
+    started = time.perf_counter()
+    prediction = await asyncio.to_thread(
+        _reranker,
+        references=ref_lines,
+        user_emphasis=user_kw_str,
+        candidates=cand_lines,
+    )
+    record_usage("rerank_reference", prediction, started)
+
+    _log("DSPY RERANK TULOS", str(prediction.result.ids))
+    return prediction.result.ids
+
+
+async def rerank_by_criteria(user_query: str, candidates: list[Candidate]) -> list[int]:
+    """Järjestä kandidaatit käyttäjän kriteerien mukaan (ei referenssiteosta)."""
+    if not candidates:
+        return []
+
+    kept = by_criteria(user_query, candidates)
+    cand_lines = candidate_lines(kept, budgets(with_references=False)[1])
+
+    _log("DSPY CRITERIA RERANK INPUT", (
+        f"kandidaatteja {len(candidates)} → {len(kept)}, arvio {estimate_tokens(cand_lines)} tokenia\n"
+        f"query={user_query}\ncands={cand_lines[:300]}"
+    ))
+
+    started = time.perf_counter()
+    prediction = await asyncio.to_thread(
+        _criteria_reranker,
+        user_query=user_query,
+        candidates=cand_lines,
+    )
+    record_usage("rerank_criteria", prediction, started)
+
+    _log("DSPY CRITERIA RERANK TULOS", str(prediction.result.ids))
+    return prediction.result.ids
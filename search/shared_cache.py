@@ -0,0 +1,315 @@
+"""Prosessien yhteinen välimuistitaso (SQLite).
+
+Usealla HTTP-workerilla (server.py --workers N) jokaisella prosessilla on oma
+muistinsa, ja sama TMDB-vastaus, keyword-id tai kyselyn luokittelu haettaisiin
+jokaisessa erikseen. Jaettu taso on yksi SQLite-tiedosto prosessien välillä:
+prosessin oma TTLCache ensin, sitten tiedosto, vasta sitten TMDB tai kielimalli.
+
+  response_cache  — TMDB-vastausten tavut (tmdb.get_json)
+  keyword_cache   — keyword-nimi → id
+  intent_cache    — normalisoitu kysely → SmartSearchIntent (JSON)
+
+WAL-tilassa lukijat eivät odota kirjoittajaa, eikä jokaista commitia fsyncata
+(synchronous=NORMAL): kaatuminen voi hävittää viimeisimmät rivit, mikä
+välimuistille riittää. Kirjoitukset tehdään taustasäikeessä, joten toisen
+workerin kirjoituslukko ei pysäytä tapahtumasilmukkaa. Vanhentuneet rivit
+säilyvät STALE_GRACE sekuntia — tmdb.py käyttää niitä varana kun TMDB ei vastaa —
+ja siivotaan kirjoitusten lomassa.
+
+Taustatyöt (trendien päivitys, lämmitys, DSPy-esilataus) tekee vain yksi worker:
+se joka saa johtajalukon (<tiedosto>.leader, flock). Muut käyttävät sen tuloksia
+jaetun tason kautta. Kaatuneen johtajan lukko vapautuu, ja uusi worker saa sen.
+
+Päälle: TMDB_SHARED_CACHE=polku (server.py --workers N > 1 asettaa oletuspolun).
+Ajat ovat seinäkelloaikaa (time.time), koska prosessien monotonic-kellot eivät vertaudu.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Hashable
+from pathlib import Path
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows: ei johtajalukkoa, jokainen prosessi tekee taustatyöt
+    fcntl = None
+
+from .cache import TTLCache
+from .prompts import SmartSearchIntent
+
+DEFAULT_PATH = Path(__file__).parent.parent / "data" / "shared_cache.sqlite"
+# Enimmäisrivimäärä tiedostossa — siivous poistaa pian vanhenevat ensin
+MAX_ROWS = int(os.getenv("TMDB_SHARED_CACHE_ROWS", "200000"))
+STALE_GRACE = 24 * 3600
+# Siivotaan joka n:nnellä kirjoituksella
+PRUNE_EVERY = 500
+# Taustakirjoittaja: jonon koko, rivejä per transaktio ja kirjoituslukon odotus
+QUEUE_MAX = 10000
+WRITE_BATCH = 200
+WRITE_TIMEOUT = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+"""
+
+
+class SharedStore:
+    """Yksi SQLite-tiedosto, avaimet nimiavaruuksittain (ns).
+
+    Lukeminen tapahtuu kutsujan säikeessä (yleensä tapahtumasilmukassa) omalla
+    yhteydellä ilman odotusta: WAL-lukija ei odota kirjoittajaa, ja jos tiedosto on
+    silti lukittu (checkpoint), rivi lasketaan ohitukseksi. Kirjoitukset ja siivous
+    menevät jonoon ja tehdään taustasäikeessä erissä — kutsuja ei koskaan odota
+    toisen workerin kirjoituslukkoa. Täysi jono pudottaa rivin (välimuisti)."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        writer = sqlite3.connect(self.path, timeout=WRITE_TIMEOUT, isolation_level=None, check_same_thread=False)
+        writer.execute("PRAGMA journal_mode=WAL")
+        writer.execute("PRAGMA synchronous=NORMAL")
+        writer.executescript(_SCHEMA)
+        self._writer = writer
+        # timeout=0: lukittu tiedosto → heti OperationalError → ohitus
+        self._reader = sqlite3.connect(self.path, timeout=0, isolation_level=None, check_same_thread=False)
+        self._read_lock = threading.Lock()
+        self._queue: queue.Queue[tuple | None] = queue.Queue(maxsize=QUEUE_MAX)
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._write_loop, name="shared-cache-writer", daemon=True)
+        self._thread.start()
+
+    def get(self, ns: str, key: str) -> tuple[bytes, float] | None:
+        """(arvo, vanhenemishetki) tai None. Ei odota lukkoja."""
+        try:
+            with self._read_lock:
+                row = self._reader.execute(
+                    "SELECT value, expires FROM entries WHERE ns = ? AND key = ?", (ns, key),
+                ).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], row[1]
+
+    def set(self, ns: str, key: str, value: bytes, ttl: float) -> None:
+        """Jonoon taustakirjoittajalle — palaa heti."""
+        try:
+            self._queue.put_nowait((ns, key, value, time.time() + ttl))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while item is not None and len(batch) < WRITE_BATCH:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    self._write(rows)
+            except sqlite3.Error:
+                self.dropped += len(rows)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(rows) < len(batch):  # None = sulje
+                return
+
+    def _write(self, rows: list[tuple]) -> None:
+        with self._writer:
+            self._writer.execute("BEGIN IMMEDIATE")
+            self._writer.executemany(
+                "INSERT OR REPLACE INTO entries (ns, key, value, expires) VALUES (?, ?, ?, ?)", rows,
+            )
+            before, self._writes = self._writes, self._writes + len(rows)
+            if before // PRUNE_EVERY != self._writes // PRUNE_EVERY:
+                self._prune()
+
+    def _prune(self) -> None:
+        self._writer.execute("DELETE FROM entries WHERE expires < ?", (time.time() - STALE_GRACE,))
+        self._writer.execute(
+            "DELETE FROM entries WHERE rowid IN "
+            "(SELECT rowid FROM entries ORDER BY expires LIMIT max(0, (SELECT count(*) FROM entries) - ?))",
+            (MAX_ROWS,),
+        )
+
+    def flush(self) -> None:
+        """Odota että jonossa olevat kirjoitukset on tehty (testit, sammutus)."""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        try:
+            with self._read_lock:
+                rows = self._reader.execute("SELECT count(*) FROM entries").fetchone()[0]
+        except sqlite3.OperationalError:
+            rows = None
+        return {"rows": rows, "bytes": self.path.stat().st_size if self.path.exists() else 0,
+                "hits": self.hits, "misses": self.misses, "queued": self._queue.qsize(),
+                "dropped": self.dropped}
+
+    def close(self) -> None:
+        """Kirjoita jono loppuun ja sulje yhteydet."""
+        self._queue.put(None)
+        self._thread.join()
+        self._writer.close()
+        with self._read_lock:
+            self._reader.close()
+
+
+class TieredCache:
+    """TTLCache:n rajapinta: prosessin oma välimuisti ensin, sitten jaettu tiedosto.
+    Jaetusta tasosta löytynyt tuore rivi kopioidaan omaan välimuistiin jäljellä
+    olevalla kestolla."""
+
+    __slots__ = ("local", "store", "ns", "_dumps", "_loads")
+
+    def __init__(self, local: TTLCache, store: SharedStore, ns: str,
+                 dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+        self.local = local
+        self.store = store
+        self.ns = ns
+        self._dumps = dumps
+        self._loads = loads
+
+    @property
+    def ttl(self) -> float:
+        return self.local.ttl
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return key if isinstance(key, str) else json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+
+    def _shared(self, key: Hashable) -> tuple[Any, float] | None:
+        """(arvo, jäljellä oleva kesto) jaetusta tasosta. Rikkinäinen rivi = ei riviä."""
+        row = self.store.get(self.ns, self._key(key))
+        if row is None:
+            return None
+        try:
+            return self._loads(row[0]), row[1] - time.time()
+        except Exception:
+            return None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None and entry[1] else default
+
+    def get_entry(self, key: Hashable) -> tuple[Any, bool] | None:
+        local = self.local.get_entry(key)
+        if local is not None and local[1]:
+            return local
+        shared = self._shared(key)
+        if shared is not None and shared[1] > 0:
+            value, left = shared
+            self.local.set(key, value, left)
+            return value, True
+        if local is not None:
+            return local
+        return (shared[0], False) if shared is not None else None
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.local.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl)
+        self.store.set(self.ns, self._key(key), self._dumps(value), ttl)
+
+    def stats(self) -> dict:
+        return self.local.stats()
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self.get_entry(key)
+        return entry is not None and entry[1]
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def clear(self) -> None:
+        """Vain prosessin oma taso — jaettua tiedostoa käyttävät muutkin."""
+        self.local.clear()
+
+
+def _text(value: str) -> bytes:
+    return value.encode("utf-8")
+
+
+# Nimiavaruus → (tallennusmuoto, luku)
+CODECS: dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "response_cache": (bytes, bytes),
+    "keyword_cache": (_text, lambda b: b.decode("utf-8")),
+    "intent_cache": (lambda i: _text(i.model_dump_json()), SmartSearchIntent.model_validate_json),
+}
+
+_store: SharedStore | None = None
+# Johtajalukon tiedosto — auki niin kauan kuin prosessi on johtaja
+_leader_lock = None
+
+
+def attach(memory: dict, path: str | Path | None = None) -> SharedStore | None:
+    """Kytke jaettu taso muistin välimuisteihin (CODECS). path tai TMDB_SHARED_CACHE;
+    ilman kumpaakaan ei tehdä mitään. Uudelleenkutsu ei kääri kahdesti."""
+    global _store
+    path = path or os.getenv("TMDB_SHARED_CACHE")
+    if not path:
+        return None
+    if _store is None:
+        _store = SharedStore(path)
+    for ns, (dumps, loads) in CODECS.items():
+        cache = memory[ns]
+        if not isinstance(cache, TieredCache):
+            memory[ns] = TieredCache(cache, _store, ns, dumps, loads)
+    return _store
+
+
+def is_leader() -> bool:
+    """Tekeekö tämä prosessi taustatyöt. Ilman jaettua tasoa (yksi prosessi) aina.
+    Lukko pidetään prosessin loppuun (detach) — kaatuessa käyttöjärjestelmä vapauttaa sen."""
+    global _leader_lock
+    if _store is None or fcntl is None or _leader_lock is not None:
+        return True
+    lock = open(f"{_store.path}.leader", "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return False
+    _leader_lock = lock
+    return True
+
+
+def detach(memory: dict) -> None:
+    """Palauta prosessin omat välimuistit, vapauta johtajalukko ja sulje tiedosto."""
+    global _store, _leader_lock
+    if _leader_lock is not None:
+        _leader_lock.close()
+        _leader_lock = None
+    for ns in CODECS:
+        cache = memory[ns]
+        if isinstance(cache, TieredCache):
+            memory[ns] = cache.local
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+def stats() -> dict | None:
+    return _store.stats() if _store is not None else None
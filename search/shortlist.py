@@ -0,0 +1,130 @@
+"""Rerank-promptin kandidaatit: karsinta ja tiivistys ennen kielimallia.
+
+Rerank on similar_to- ja franchise-hakujen toiseksi hitain vaihe, ja sen kesto
+kasvaa promptin mukana. Ennen kutsua:
+
+  1. duplikaatit pois (sama id, tai sama nimi + vuosi eri id:llä)
+  2. paikallinen esipisteytys — genreosumat referensseihin, teemasanojen osumat
+     kuvauksessa, äänimäärä ja hakujärjestys — ja vain RERANK_TOP_K parasta mukaan
+  3. kuvaukset lyhennetään tasapuolisesti niin että kandidaatit ja referenssit
+     mahtuvat tokenibudjettiin (TMDB_RERANK_TOKENS, arvio 4 merkkiä / token)
+
+Ei DSPy:tä — rerank.py käyttää näitä, ja testit ajavat ne ilman kielimallia.
+"""
+
+import math
+import os
+import re
+from collections.abc import Iterable, Sequence
+
+from .format import _fair_cap, _shorten
+from .models import Title
+
+RERANK_TOP_K = int(os.getenv("TMDB_RERANK_TOP_K", "20"))
+RERANK_TOKENS = int(os.getenv("TMDB_RERANK_TOKENS", "1500"))
+CHARS_PER_TOKEN = 4
+# Referensseille varattu osuus budjetista — loput kandidaateille
+REFERENCE_SHARE = 0.25
+
+CANDIDATE_OVERVIEW_MAX = 150
+REFERENCE_OVERVIEW_MAX = 300
+# Tätä lyhyempi kuvaus ei auta rerankkausta — pelkkä nimi ja vuosi
+OVERVIEW_MIN = 40
+
+# Sanan alku riittää taivutusmuotojen ja johdosten vertailuun (dark/darker, romance/romantic)
+_STEM = 5
+_WORD = re.compile(r"\w{4,}")
+
+
+def stems(text: str) -> set[str]:
+    return {w[:_STEM] for w in _WORD.findall(text.casefold())}
+
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(t) for t in texts) // CHARS_PER_TOKEN
+
+
+def dedupe(candidates: Iterable[Title]) -> list[Title]:
+    seen_ids: set[int] = set()
+    seen_names: set[tuple[str, str]] = set()
+    out = []
+    for c in candidates:
+        name = (c.title.casefold(), c.year)
+        if c.id in seen_ids or name in seen_names:
+            continue
+        seen_ids.add(c.id)
+        seen_names.add(name)
+        out.append(c)
+    return out
+
+
+def prescore(c: Title, position: int, ref_genres: set[int], cue_stems: set[str]) -> float:
+    """Karkea relevanssi: genrepeitto + teemasanat + laatu + hakujärjestys (kukin ~0–1)."""
+    genre = len(ref_genres.intersection(c.genre_ids)) / len(ref_genres) if ref_genres else 0.0
+    cues = len(cue_stems & stems(f"{c.title} {c.overview}")) / math.sqrt(len(cue_stems)) if cue_stems else 0.0
+    quality = min(1.0, math.log1p(c.vote_count) / 8)
+    order = 1 / (1 + 0.1 * position)
+    return genre + cues + 0.5 * quality + order
+
+
+def shortlist(
+    candidates: Sequence[Title],
+    ref_genres: Iterable[int] = (),
+    cues: str = "",
+    k: int = RERANK_TOP_K,
+) -> list[Title]:
+    """Duplikaatit pois ja k parasta esipisteytyksen mukaan, parhaasta alkaen."""
+    unique = dedupe(candidates)
+    genres = set(ref_genres)
+    cue_stems = stems(cues)
+    scored = sorted(
+        range(len(unique)),
+        key=lambda i: prescore(unique[i], i, genres, cue_stems),
+        reverse=True,
+    )
+    return [unique[i] for i in scored[:k]]
+
+
+def by_reference(ref_items: Sequence[dict], user_keywords: Sequence[str] | None,
+                 candidates: Sequence[Title], k: int = RERANK_TOP_K) -> list[Title]:
+    """similar_to: referenssien genret sekä teemat ja käyttäjän painotukset vihjeinä."""
+    cues = " ".join([*(kw for item in ref_items for kw in item["kw_names"]), *(user_keywords or ())])
+    genres = (g for item in ref_items for g in item.get("genre_ids", ()))
+    return shortlist(candidates, genres, cues, k)
+
+
+def by_criteria(user_query: str, candidates: Sequence[Title], k: int = RERANK_TOP_K) -> list[Title]:
+    """franchise: kyselyn sanat vihjeinä, valmis järjestys säilyy tasapelissä."""
+    return shortlist(candidates, cues=user_query, k=k)
+
+
+def _with_overviews(heads: list[str], overviews: list[str], budget: int, cap_max: int) -> list[str]:
+    """Rivi = pää + ' - ' + kuvaus, kuvaukset lyhennettynä samaan kattoon (vesitäyttö)."""
+    room = budget - sum(len(h) + 1 for h in heads) - 3 * sum(1 for o in overviews if o)
+    cap = min(cap_max, _fair_cap([len(o) for o in overviews], max(0, room)))
+    if cap < OVERVIEW_MIN and cap < max(map(len, overviews), default=0):
+        return heads
+    return [f"{h} - {_shorten(o, cap)}" if o else h for h, o in zip(heads, overviews)]
+
+
+def candidate_lines(candidates: Sequence[Title], budget_chars: int) -> str:
+    """[ID] Nimi (vuosi) - kuvaus — rivit mahtuvat budjettiin kuvauksia lyhentämällä."""
+    heads = [f"[{c.id}] {c.title} ({c.year})" for c in candidates]
+    return "\n".join(_with_overviews(heads, [c.overview for c in candidates], budget_chars, CANDIDATE_OVERVIEW_MAX))
+
+
+def reference_lines(ref_items: Sequence[dict], budget_chars: int) -> str:
+    """1. Nimi — teemat: a, b - kuvaus"""
+    heads = [
+        f"{i + 1}. {item['name']} — teemat: {', '.join(item['kw_names']) or '-'}"
+        for i, item in enumerate(ref_items)
+    ]
+    overviews = [item.get("overview") or "" for item in ref_items]
+    return "\n".join(_with_overviews(heads, overviews, budget_chars, REFERENCE_OVERVIEW_MAX))
+
+
+def budgets(tokens: int = RERANK_TOKENS, with_references: bool = True) -> tuple[int, int]:
+    """(referenssien, kandidaattien) merkkibudjetti."""
+    total = tokens * CHARS_PER_TOKEN
+    refs = int(total * REFERENCE_SHARE) if with_references else 0
+    return refs, total - refs
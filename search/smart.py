@@ -2,14 +2,25 @@ import asyncio
 import datetime
 import httpx
 
-from .memory import memory, TMDB_API_KEY, TMDB_BASE, _log
-from .prompts import rerank_candidates, rerank_by_criteria, SmartSearchIntent
-from .classifier import classify_query
-from .tools import discover, trending, search_by_title, search_person
-
-
-async def _similar_to(intent: SmartSearchIntent) -> str:
-    """Hae teoksia jotka ovat samankaltaisia kuin referenssiteokset (1–n kpl)."""
+from .memory import memory, _log, log_query, normalize_region, reference_for
+from .decode import KeywordList, Page
+from .tmdb import get_json
+from .franchise import rank, resolve, sort_for
+from .availability import availability_for
+from .models import Title, parse_titles
+from .format import message, respond
+from .prompts import SmartSearchIntent
+from . import deadline
+from .llm import classify_query, rerank_candidates, rerank_by_criteria
+from .tools import discover, keyword_ids, remember_keywords, trending, search_by_title, search_person
+
+# Franchise-haku: montako jäsentä enintään rerankataan temaattisella kriteerillä
+FRANCHISE_RERANK_MAX = 40
+
+
+async def _similar_to(intent: SmartSearchIntent, format: str | None = None, region: str | None = None) -> str | dict:
+    """Hae teoksia jotka ovat samankaltaisia kuin referenssiteokset (1–n kpl).
+    region: maa jonka palveluista intent.watch_providers haetaan (oletus FI)"""
     ref_type = intent.media_type
 
     _SKIP_KW = {
@@ -24,28 +35,20 @@ async def _similar_to(intent: SmartSearchIntent) -> str:
         Strategia: strict (AND top-2) ensin, OR-fallback täydentää jos tuloksia < 10.
         Palauttaa (disc_results, ref_kw_names)."""
         kw_field = "results" if ref_type == "tv" else "keywords"
-        kw_r = await client.get(
-            f"{TMDB_BASE}/{ref_type}/{ref_id}/keywords",
-            params={"api_key": TMDB_API_KEY},
-        )
-        ref_kws = kw_r.json().get(kw_field, [])
+        kw_data = await get_json(client, f"/{ref_type}/{ref_id}/keywords", shape=KeywordList, raise_for_status=False)
+        ref_kws = kw_data.get(kw_field, [])
 
         filtered = [kw for kw in ref_kws if kw.get("name", "").lower() not in _SKIP_KW][:8]
         ref_kw_ids = [str(kw["id"]) for kw in filtered]
         ref_kw_names = [kw["name"] for kw in filtered]
 
-        for kw in ref_kws:
-            name = kw.get("name", "").lower()
-            kw_id = str(kw.get("id", ""))
-            if name and kw_id:
-                memory["keyword_cache"][name] = kw_id
+        remember_keywords(ref_kws)
 
         all_kw_ids = list(dict.fromkeys(user_kw_ids + ref_kw_ids))
         if not all_kw_ids:
             return [], ref_kw_names
 
         base_params = {
-            "api_key": TMDB_API_KEY,
             "language": "en",
             "with_original_language": ref_lang or "",
             "with_genres": str(primary_genre_id) if primary_genre_id else "",
@@ -57,44 +60,46 @@ async def _similar_to(intent: SmartSearchIntent) -> str:
             base_params.update(extra_params)
 
         seen: set[int] = set()
-        results: list[dict] = []
+        results: list[Title] = []
 
         if len(all_kw_ids) >= 2:
-            r = await client.get(
-                f"{TMDB_BASE}/discover/{ref_type}",
-                params={**base_params, "with_keywords": ",".join(all_kw_ids[:2])},
+            data = await get_json(
+                client, f"/discover/{ref_type}",
+                {**base_params, "with_keywords": ",".join(all_kw_ids[:2])},
+                shape=Page, raise_for_status=False,
             )
-            for item in r.json().get("results", []):
-                if item["id"] not in seen:
-                    seen.add(item["id"])
-                    results.append(item)
+            for t in parse_titles(data.get("results", []), ref_type):
+                if t.id not in seen:
+                    seen.add(t.id)
+                    results.append(t)
 
         if len(results) < 10:
-            r = await client.get(
-                f"{TMDB_BASE}/discover/{ref_type}",
-                params={**base_params, "with_keywords": "|".join(all_kw_ids)},
+            data = await get_json(
+                client, f"/discover/{ref_type}",
+                {**base_params, "with_keywords": "|".join(all_kw_ids)},
+                shape=Page, raise_for_status=False,
             )
-            for item in r.json().get("results", []):
-                if item["id"] not in seen:
-                    seen.add(item["id"])
-                    results.append(item)
+            for t in parse_titles(data.get("results", []), ref_type):
+                if t.id not in seen:
+                    seen.add(t.id)
+                    results.append(t)
 
         return results, ref_kw_names
 
     async with httpx.AsyncClient() as client:
         ref_titles = intent.reference_titles or []
         if not ref_titles:
-            return "Ei referenssiteosta annettu."
+            return message("Ei referenssiteosta annettu.", format)
 
         async def _search_one(title):
-            r = await client.get(
-                f"{TMDB_BASE}/search/{ref_type}",
-                params={"api_key": TMDB_API_KEY, "query": title, "include_adult": True},
+            data = await get_json(
+                client, f"/search/{ref_type}", {"query": title, "include_adult": True},
+                shape=Page, raise_for_status=False,
             )
-            results = r.json().get("results", [])
+            results = parse_titles(data.get("results", []), ref_type)
             if not results:
                 return None
-            return max(results[:5], key=lambda x: x.get("vote_count", 0))
+            return max(results[:5], key=lambda x: x.vote_count)
 
         ref_results = await asyncio.gather(*[_search_one(t) for t in ref_titles])
         refs = [r for r in ref_results if r is not None]
@@ -102,65 +107,52 @@ async def _similar_to(intent: SmartSearchIntent) -> str:
         if not_found:
             _log("SIMILAR_TO", f"Referenssejä ei löydy: {not_found}")
         if not refs:
-            return f"Ei löydy referenssiteoksia: {', '.join(repr(t) for t in ref_titles)}"
+            return message(f"Ei löydy referenssiteoksia: {', '.join(repr(t) for t in ref_titles)}", format)
 
         primary_ref = refs[0]
-        ref_lang = primary_ref.get("original_language")
-        primary_genre_id = (primary_ref.get("genre_ids") or [None])[0]
-
-        user_kw_ids = []
-        if intent.keywords:
-            for kw in intent.keywords:
-                kw_lower = kw.lower()
-                if kw_lower in memory["keyword_cache"]:
-                    user_kw_ids.append(memory["keyword_cache"][kw_lower])
-                else:
-                    r_kw = await client.get(
-                        f"{TMDB_BASE}/search/keyword",
-                        params={"api_key": TMDB_API_KEY, "query": kw},
-                    )
-                    results_kw = r_kw.json().get("results", [])
-                    if results_kw:
-                        kw_id = str(results_kw[0]["id"])
-                        memory["keyword_cache"][kw_lower] = kw_id
-                        user_kw_ids.append(kw_id)
-
-        provider_list = memory["movie_providers"] if ref_type == "movie" else memory["tv_providers"]
-        provider_extras = []
-        for wp in (intent.watch_providers or []):
-            prov_match = next(
-                (p for p in provider_list if p["provider_name"].lower() == wp.lower()),
-                None,
-            )
-            if prov_match:
-                provider_extras.append({"with_watch_providers": prov_match["provider_id"], "watch_region": "FI"})
+        ref_lang = primary_ref.original_language
+        primary_genre_id = (primary_ref.genre_ids or (None,))[0]
 
-        if provider_extras:
-            gather_tasks = [
-                _fetch_keyword_discover(client, ref["id"], ref_lang, primary_genre_id, user_kw_ids, extra_params=pe)
+        user_kw_ids = await keyword_ids(client, intent.keywords) if intent.keywords else []
+
+        provider_ids = []
+        provider_names = []
+        index = (await reference_for(region))["index"] if intent.watch_providers else None
+        for wp in (intent.watch_providers or []):
+            prov_match = index.provider(ref_type, wp)
+            if prov_match and prov_match["provider_name"] not in provider_names:
+                provider_ids.append(str(prov_match["provider_id"]))
+                provider_names.append(prov_match["provider_name"])
+
+        if provider_ids:
+            # Kaikki palvelut yhdellä OR-haulla per referenssi (ei referenssi × palvelu)
+            provider_extra = {"with_watch_providers": "|".join(provider_ids), "watch_region": normalize_region(region)}
+            raw = await asyncio.gather(*[
+                _fetch_keyword_discover(client, ref.id, ref_lang, primary_genre_id, user_kw_ids, extra_params=provider_extra)
                 for ref in refs
-                for pe in provider_extras
-            ]
-            raw = await asyncio.gather(*gather_tasks)
-            n_pe = len(provider_extras)
-            refs_kw_names = [raw[i * n_pe][1] for i in range(len(refs))]
+            ])
+            refs_kw_names = [names for _, names in raw]
             seen_disc: set[int] = set()
             disc = []
             for d, _ in raw:
-                for item in d:
-                    if item["id"] not in seen_disc:
-                        seen_disc.add(item["id"])
-                        disc.append(item)
+                for t in d:
+                    if t.id not in seen_disc:
+                        seen_disc.add(t.id)
+                        disc.append(t)
+            # Yhden palvelun haku kertoo samalla saatavuuden → indeksiin
+            if len(provider_names) == 1:
+                availability_for(normalize_region(region)).add(ref_type, (t.id for t in disc), provider_names[0])
             recs = []
         else:
             disc_tasks = [
-                _fetch_keyword_discover(client, ref["id"], ref_lang, primary_genre_id, user_kw_ids)
+                _fetch_keyword_discover(client, ref.id, ref_lang, primary_genre_id, user_kw_ids)
                 for ref in refs
             ]
             rec_tasks = [
-                client.get(
-                    f"{TMDB_BASE}/{ref_type}/{ref['id']}/recommendations",
-                    params={"api_key": TMDB_API_KEY, "language": "en", "include_adult": True},
+                get_json(
+                    client, f"/{ref_type}/{ref.id}/recommendations",
+                    {"language": "en", "include_adult": True},
+                    shape=Page, raise_for_status=False,
                 )
                 for ref in refs
             ]
@@ -173,136 +165,116 @@ async def _similar_to(intent: SmartSearchIntent) -> str:
             seen_disc: set[int] = set()
             disc = []
             for d, _ in disc_raw:
-                for item in d:
-                    if item["id"] not in seen_disc:
-                        seen_disc.add(item["id"])
-                        disc.append(item)
+                for t in d:
+                    if t.id not in seen_disc:
+                        seen_disc.add(t.id)
+                        disc.append(t)
 
             seen_recs: set[int] = set()
             recs = []
             for resp in rec_responses:
-                for item in resp.json().get("results", []):
-                    if item["id"] not in seen_recs and item.get("original_language") == ref_lang:
-                        seen_recs.add(item["id"])
-                        recs.append(item)
+                for t in parse_titles(resp.get("results", []), ref_type):
+                    if t.id not in seen_recs and t.original_language == ref_lang:
+                        seen_recs.add(t.id)
+                        recs.append(t)
 
-    excluded = {ref["id"] for ref in refs}
+    excluded = {ref.id for ref in refs}
     order = (disc + recs) if disc else (recs + disc)
     seen = set(excluded)
-    candidates = []
-    for item in order:
-        item_id = item.get("id")
-        if item_id and item_id not in seen:
-            seen.add(item_id)
-            candidates.append(item)
-
-    ref_names = [ref.get("name") or ref.get("title", "?") for ref in refs]
+    candidates: list[Title] = []
+    for t in order:
+        if t.id and t.id not in seen:
+            seen.add(t.id)
+            candidates.append(t)
+
+    ref_names = [ref.title for ref in refs]
     if not candidates:
-        return f"Ei löydy samankaltaisia teoksia: {' & '.join(repr(n) for n in ref_names)}"
+        return message(f"Ei löydy samankaltaisia teoksia: {' & '.join(repr(n) for n in ref_names)}", format)
 
     ref_items = [
         {
-            "name": ref.get("name") or ref.get("title", "?"),
-            "overview": ref.get("overview", ""),
+            "name": ref.title,
+            "overview": ref.overview,
             "kw_names": kw_names,
+            "genre_ids": ref.genre_ids,
         }
         for ref, kw_names in zip(refs, refs_kw_names)
     ]
     ranked_ids = await rerank_candidates(
         ref_items=ref_items,
         user_keywords=intent.keywords,
-        candidates=candidates[:30],
+        candidates=candidates,
     )
 
-    id_to_item = {item["id"]: item for item in candidates}
+    id_to_item = {t.id: t for t in candidates}
     top = [id_to_item[rid] for rid in ranked_ids if rid in id_to_item]
 
     if not top:
         top = candidates[:12]
 
-    genre_list = memory["tv_genres"] if ref_type == "tv" else memory["movie_genres"]
-    genre_map = {g["id"]: g["name"] for g in genre_list}
-
     ref_label = " & ".join(f"'{n}'" for n in ref_names)
-    lines = [f"Samankaltaisia kuin {ref_label}:\n"]
-    for item in top:
-        title = item.get("name") or item.get("title", "?")
-        original = item.get("original_name") or item.get("original_title", "")
-        date = (item.get("first_air_date") or item.get("release_date", ""))[:4]
-        name_str = title if title == original or not original else f"{title} ({original})"
-        genre_names = [genre_map.get(gid, str(gid)) for gid in item.get("genre_ids", [])]
-        vote = item.get("vote_average", 0)
-        votes = item.get("vote_count", 0)
-        overview = item.get("overview", "")[:150]
-        lines.append(
-            f"[{item.get('id')}] {name_str} ({date})\n"
-            f"  Genret: {', '.join(genre_names) or '-'} | {vote:.1f}/10 ({votes} ääntä)\n"
-            f"  {overview}"
-        )
-
-    return "\n\n".join(lines)
-
-
-async def _franchise_search(intent: SmartSearchIntent, query: str) -> str:
+    return respond(f"Samankaltaisia kuin {ref_label}:\n", top, memory["index"].genre_map, format)
+
+
+async def _franchise_search(intent: SmartSearchIntent, query: str, format: str | None = None) -> str | dict:
     """Hae kaikki tietyn franchisen teokset ja järjestä käyttäjän kriteerien mukaan."""
     franchise = intent.franchise_query or query
-    ref_type = intent.media_type
 
-    search_params = {"api_key": TMDB_API_KEY, "query": franchise, "include_adult": True}
     async with httpx.AsyncClient() as client:
-        p1, p2 = await asyncio.gather(
-            client.get(f"{TMDB_BASE}/search/{ref_type}", params={**search_params, "page": 1}),
-            client.get(f"{TMDB_BASE}/search/{ref_type}", params={**search_params, "page": 2}),
-        )
-    results = p1.json().get("results", []) + p2.json().get("results", [])
-
-    if not results:
-        return f"Ei löydy franchisea: '{franchise}'"
-
-    franchise_lower = franchise.lower()
-    filtered = [
-        item for item in results
-        if franchise_lower in (item.get("name") or item.get("title", "")).lower()
-        or franchise_lower in (item.get("original_name") or item.get("original_title", "")).lower()
-    ]
-    if not filtered:
-        filtered = results
-
-    ranked_ids = await rerank_by_criteria(query, filtered[:30])
+        fr = await resolve(client, franchise, intent.media_type)
+
+    if not fr.members:
+        return message(f"Ei löydy franchisea: '{franchise}'", format)
+
+    ranked = rank(fr.members, sort_for(query, intent.sort_by))
+    top = ranked[:12]
+
+    # Temaattinen kriteeri (synkin, romanttisin...) ei ratkea paikallisesti → rerank
+    if intent.keywords:
+        ranked_ids = await rerank_by_criteria(query, ranked[:FRANCHISE_RERANK_MAX])
+        id_to_item = {t.id: t for t in ranked}
+        top = [id_to_item[rid] for rid in ranked_ids if rid in id_to_item] or top
+
+    header = f"Franchise-haku '{franchise}' ({len(fr.members)} teosta):\n"
+    return respond(header, top, memory["index"].genre_map, format)
+
+
+async def route(
+    query: str, format: str | None = None, region: str | None = None, locale: str | None = None,
+    *, record: bool = True,
+) -> str | dict:
+    """Tulkitsee kyselyn ja reitittää oikeaan hakuun.
+    format: välitetään hakutyökaluille ('text', 'compact' tai 'json')
+    region: katselupalvelujen maa (discover, similar_to) — oletus FI
+    locale: tulosten kieli (lookup, discover, trending). similar_to ja franchise
+            pysyvät englanniksi: niiden rerank tehdään englanninkielisillä kuvauksilla.
+    record: kirjataanko kysely kyselylokiin — warmup.py:n toistot eivät kirjaa itseään
+
+    Koko kyselyllä on aikaraja (deadline.SMART_DEADLINE); kielimallivaiheet
+    käyttävät paikallista varaa jos niiden osuus ylittyy.
+    """
+    try:
+        normalize_region(region)
+    except ValueError as e:
+        return message(str(e), format)
+    with deadline.within(deadline.SMART_DEADLINE):
+        return await _route(query, format, region, locale, record)
 
-    genre_list = memory["tv_genres"] if ref_type == "tv" else memory["movie_genres"]
-    genre_map = {g["id"]: g["name"] for g in genre_list}
 
-    id_to_item = {item["id"]: item for item in filtered}
-    top = [id_to_item[rid] for rid in ranked_ids if rid in id_to_item]
-    if not top:
-        top = filtered[:12]
-
-    lines = [f"Franchise-haku '{franchise}':\n"]
-    for item in top:
-        title = item.get("name") or item.get("title", "?")
-        original = item.get("original_name") or item.get("original_title", "")
-        date = (item.get("first_air_date") or item.get("release_date", ""))[:4]
-        name_str = title if title == original or not original else f"{title} ({original})"
-        genre_names = [genre_map.get(gid, str(gid)) for gid in item.get("genre_ids", [])]
-        vote = item.get("vote_average", 0)
-        votes = item.get("vote_count", 0)
-        overview = item.get("overview", "")[:150]
-        lines.append(
-            f"[{item['id']}] {name_str} ({date})\n"
-            f"  Genret: {', '.join(genre_names) or '-'} | {vote:.1f}/10 ({votes} ääntä)\n"
-            f"  {overview}"
-        )
-
-    return "\n\n".join(lines)
-
-
-async def route(query: str) -> str:
-    """Tulkitsee kyselyn ja reitittää oikeaan hakuun."""
+async def _route(query: str, format: str | None, region: str | None, locale: str | None, record: bool) -> str | dict:
     try:
         intent = await classify_query(query, memory)
     except Exception as e:
-        return f"Virhe kyselyn tulkinnassa: {e}"
+        return message(f"Virhe kyselyn tulkinnassa: {e}", format)
+
+    if record:
+        title = intent.title or intent.franchise_query or next(iter(intent.reference_titles or []), None)
+        log_query(query, intent.intent, title, intent.media_type, intent.source)
+
+    # Työkaluille välitetään format vain jos se on annettu
+    fmt = {"format": format} if format else {}
+    reg = {"region": region} if region else {}
+    loc = {"locale": locale} if locale else {}
 
     _log(
         "SMART_SEARCH REITITYS",
@@ -315,34 +287,28 @@ async def route(query: str) -> str:
 
     match intent.intent:
         case "franchise":
-            return await _franchise_search(intent, query)
+            return await _franchise_search(intent, query, **fmt)
         case "trending":
-            return await trending(type=intent.media_type, time_window=intent.time_window)
+            return await trending(type=intent.media_type, time_window=intent.time_window, **fmt, **loc)
         case "person":
-            return await search_person(intent.person_name or query)
+            return await search_person(intent.person_name or query, **fmt, **loc)
         case "lookup":
-            return await search_by_title(intent.title or query, intent.media_type)
+            return await search_by_title(intent.title or query, intent.media_type, **fmt, **loc)
         case "similar_to":
             if not intent.watch_providers:
-                all_providers = memory["movie_providers"] + memory["tv_providers"]
-                query_lower = query.lower()
-                found = [
-                    p["provider_name"] for p in all_providers
-                    if p["provider_name"].lower() in query_lower
-                ]
+                found = (await reference_for(region))["index"].providers_in(query)
                 if found:
-                    intent.watch_providers = list(dict.fromkeys(found))
+                    intent.watch_providers = found
                     _log("WATCH_PROVIDERS FALLBACK", f"Poimittu kyselystä: {intent.watch_providers}")
-            return await _similar_to(intent)
+            return await _similar_to(intent, **fmt, **reg)
         case _:  # discover (+ both_types + airing_now)
             with_cast_id = None
             if intent.actor_name:
                 async with httpx.AsyncClient() as _pc:
-                    _pr = await _pc.get(
-                        f"{TMDB_BASE}/search/person",
-                        params={"api_key": TMDB_API_KEY, "query": intent.actor_name},
+                    _pr = await get_json(
+                        _pc, "/search/person", {"query": intent.actor_name}, shape=Page, raise_for_status=False,
                     )
-                    _persons = _pr.json().get("results", [])
+                    _persons = _pr.get("results", [])
                     if _persons:
                         with_cast_id = _persons[0]["id"]
                         _log("ACTOR RESOLVAUS", f"{intent.actor_name} → id={with_cast_id} ({_persons[0].get('name')})")
@@ -362,37 +328,27 @@ async def route(query: str) -> str:
                     date_gte, date_lte = f"{y}-10-01", f"{y}-12-31"
                 intent.min_votes = min(intent.min_votes, 10)
 
-            providers = intent.watch_providers or [None]
+            # Useampi palvelu → discover tekee yhden OR-haun ja ryhmittelee itse
+            providers = intent.watch_providers or []
+            watch_provider = providers[0] if len(providers) == 1 else (providers or None)
 
             if intent.both_types:
                 movie_res, tv_res = await asyncio.gather(
                     discover(type="movie", genres=intent.genres, keywords=intent.keywords,
                              year=intent.year, min_rating=intent.min_rating, min_votes=intent.min_votes,
                              sort_by=intent.sort_by, language=intent.language,
-                             watch_provider=providers[0], with_cast=with_cast_id,
-                             year_from=intent.year_from, year_to=intent.year_to),
+                             watch_provider=watch_provider, with_cast=with_cast_id,
+                             year_from=intent.year_from, year_to=intent.year_to, **fmt, **reg, **loc),
                     discover(type="tv", genres=intent.genres, keywords=intent.keywords,
                              year=intent.year, min_rating=intent.min_rating, min_votes=intent.min_votes,
                              sort_by=intent.sort_by, language=intent.language,
-                             watch_provider=providers[0], with_cast=with_cast_id,
-                             year_from=intent.year_from, year_to=intent.year_to),
+                             watch_provider=watch_provider, with_cast=with_cast_id,
+                             year_from=intent.year_from, year_to=intent.year_to, **fmt, **reg, **loc),
                 )
+                if format == "json":
+                    return {"movie": movie_res, "tv": tv_res}
                 return f"## Elokuvat\n\n{movie_res}\n\n## Sarjat\n\n{tv_res}"
 
-            if len(providers) > 1:
-                results = await asyncio.gather(*[
-                    discover(
-                        type=intent.media_type, genres=intent.genres, keywords=intent.keywords,
-                        year=intent.year, min_rating=intent.min_rating, min_votes=intent.min_votes,
-                        sort_by=intent.sort_by, language=intent.language,
-                        watch_provider=wp, with_cast=with_cast_id,
-                        year_from=intent.year_from, year_to=intent.year_to,
-                        date_gte=date_gte, date_lte=date_lte,
-                    )
-                    for wp in providers
-                ])
-                return "\n\n".join(f"## {wp}\n\n{res}" for wp, res in zip(providers, results))
-
             return await discover(
                 type=intent.media_type,
                 genres=intent.genres,
@@ -402,10 +358,13 @@ async def route(query: str) -> str:
                 min_votes=intent.min_votes,
                 sort_by=intent.sort_by,
                 language=intent.language,
-                watch_provider=providers[0],
+                watch_provider=watch_provider,
                 with_cast=with_cast_id,
                 year_from=intent.year_from,
                 year_to=intent.year_to,
                 date_gte=date_gte,
                 date_lte=date_lte,
+                **fmt,
+                **reg,
+                **loc,
             )
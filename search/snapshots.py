@@ -0,0 +1,129 @@
+"""Trendaavien taustapäivitys.
+
+trending() on eniten kutsuttu työkalu, mutta TMDB:n trendilistat vaihtuvat
+vain muutaman kerran päivässä. Taustatehtävä hakee kaikki type × time_window
+-yhdistelmät TMDB_TRENDING_REFRESH sekunnin välein, ja trending() vastaa
+muistissa olevasta tilannekuvasta ilman TMDB-kutsua.
+
+Kun jokin lista muuttuu, kutsutaan rekisteröidyt kuuntelijat — server.py
+lähettää niistä resources/updated-ilmoituksen resurssin tilaajille.
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+import httpx
+
+from .memory import _log
+from .decode import Page
+from .tmdb import get_json
+from .models import Person, Title, parse_results
+from .localize import FALLBACK_LANGUAGE, remember
+
+TYPES = ("all", "movie", "tv")
+WINDOWS = ("day", "week")
+# Päivitysväli sekunteina; 0 = ei taustapäivitystä (jokainen kutsu hakee TMDB:stä)
+REFRESH_INTERVAL = int(os.getenv("TMDB_TRENDING_REFRESH", "3600"))
+
+
+@dataclass(slots=True, frozen=True)
+class Snapshot:
+    type: str
+    time_window: str
+    results: tuple[Title | Person, ...]
+    fetched_at: float
+
+    @property
+    def uri(self) -> str:
+        return trending_uri(self.type, self.time_window)
+
+
+def trending_uri(type: str, time_window: str) -> str:
+    return f"tmdb://trending/{type}/{time_window}"
+
+
+class TrendingSnapshots:
+    def __init__(self, interval: int = REFRESH_INTERVAL):
+        self.interval = interval
+        self._snaps: dict[tuple[str, str], Snapshot] = {}
+        self._listeners: list[Callable[[Snapshot], Awaitable[None]]] = []
+        self._task: asyncio.Task | None = None
+
+    def on_change(self, listener: Callable[[Snapshot], Awaitable[None]]) -> None:
+        self._listeners.append(listener)
+
+    def fresh(self, type: str, time_window: str) -> Snapshot | None:
+        """Tilannekuva jos se on tuore. Kaksi väliä sallitaan, ettei yksi epäonnistunut päivitys pakota live-hakuun."""
+        snap = self._snaps.get((type, time_window))
+        if snap is None or not self.interval:
+            return None
+        if time.monotonic() - snap.fetched_at > 2 * self.interval:
+            return None
+        return snap
+
+    async def fetch(self, client: httpx.AsyncClient, type: str, time_window: str) -> tuple[Snapshot, bool]:
+        """Hae lista TMDB:stä ja tallenna. Palauttaa (tilannekuva, muuttuiko)."""
+        data = await get_json(client, f"/trending/{type}/{time_window}", {"language": FALLBACK_LANGUAGE}, shape=Page)
+        snap = Snapshot(type, time_window, tuple(parse_results(data.get("results", []), type)), time.monotonic())
+        # Muun kielen trendilistat täydentävät puuttuvat kuvaukset tästä (localize.py)
+        remember(snap.results, FALLBACK_LANGUAGE)
+        old = self._snaps.get((type, time_window))
+        self._snaps[(type, time_window)] = snap
+        changed = old is None or [r.id for r in old.results] != [r.id for r in snap.results]
+        return snap, changed
+
+    async def get(self, type: str, time_window: str) -> Snapshot:
+        """Tuore tilannekuva muistista, muuten live-haku."""
+        snap = self.fresh(type, time_window)
+        if snap is not None:
+            return snap
+        async with httpx.AsyncClient() as client:
+            snap, _ = await self.fetch(client, type, time_window)
+        return snap
+
+    async def refresh_all(self) -> list[Snapshot]:
+        """Päivitä kaikki yhdistelmät rinnakkain. Palauttaa muuttuneet."""
+        async with httpx.AsyncClient() as client:
+            results = await asyncio.gather(
+                *[self.fetch(client, t, w) for t in TYPES for w in WINDOWS], return_exceptions=True,
+            )
+        changed = []
+        for r in results:
+            if isinstance(r, BaseException):
+                _log("TRENDING PÄIVITYS VIRHE", repr(r))
+            elif r[1]:
+                changed.append(r[0])
+        for snap in changed:
+            for listener in self._listeners:
+                try:
+                    await listener(snap)
+                except Exception as e:
+                    _log("TRENDING ILMOITUS VIRHE", f"{snap.uri}: {e!r}")
+        return changed
+
+    async def _run(self) -> None:
+        while True:
+            changed = await self.refresh_all()
+            _log("TRENDING PÄIVITYS", f"muuttuneet: {[s.uri for s in changed]}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> asyncio.Task | None:
+        """Käynnistä taustapäivitys (server.py:n lifespan). interval=0 → ei käynnistetä."""
+        if self.interval and self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+trending_snapshots = TrendingSnapshots()
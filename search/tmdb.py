@@ -0,0 +1,194 @@
+import asyncio
+import math
+import os
+import weakref
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from contextlib import aclosing
+
+import httpx
+
+from .breaker import CircuitOpen, breaker, tmdb_family
+from .memory import TMDB_API_KEY, TMDB_BASE, _log, memory
+from .decode import Page, decode
+from .models import Title, parse_titles
+
+# TMDB palauttaa 20 tulosta sivulla eikä anna sivua 500 pidemmälle
+PAGE_SIZE = 20
+TMDB_MAX_PAGE = 500
+# Montako seuraavaa sivua haetaan etukäteen samaan aikaan kun edellistä käsitellään
+PREFETCH_WINDOW = int(os.getenv("TMDB_PREFETCH_WINDOW", "3"))
+# Kaikkien samanaikaisten TMDB-kutsujen yläraja koko prosessissa (TMDB: ~50 pyyntöä/s per IP)
+MAX_CONCURRENCY = int(os.getenv("TMDB_MAX_CONCURRENCY", "20"))
+
+# Vastausvälimuisti polun alun mukaan (sekunteja). Listaamattomia polkuja ei tallenneta:
+# englanninkieliset trendaavat päivittyvät snapshots.py:ssä, referenssidata memory.py:ssä.
+CACHE_TTL: dict[str, int] = {
+    "/search/": 3600,
+    "/discover/": 3600,
+    "/movie/": 6 * 3600,
+    "/tv/": 6 * 3600,
+    "/person/": 6 * 3600,
+    "/collection/": 24 * 3600,
+}
+# Muun kielen trendilistoilla ei ole tilannekuvaa — lyhyt kesto, jotta lista pysyy ajan tasalla
+TRENDING_LOCALE_TTL = int(os.getenv("TMDB_TRENDING_LOCALE_TTL", "600"))
+
+
+def _cache_ttl(path: str, params: dict) -> int | None:
+    if path.startswith("/trending/"):
+        return TRENDING_LOCALE_TTL if params.get("language", "en") != "en" else None
+    for prefix, ttl in CACHE_TTL.items():
+        if path.startswith(prefix):
+            return ttl
+    return None
+
+
+# Semafori per event loop: testit ja CLI-ajot voivat luoda useita looppeja
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _limiter() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _limiters.get(loop)
+    if sem is None:
+        sem = _limiters[loop] = asyncio.Semaphore(MAX_CONCURRENCY)
+    return sem
+
+
+async def get_json(
+    client: httpx.AsyncClient,
+    path: str,
+    params: dict | None = None,
+    shape: type | None = None,
+    raise_for_status: bool = True,
+) -> dict:
+    """GET TMDB:stä: lisää api_keyn, tarkistaa statuksen ja dekoodaa vastauksen.
+    shape: decode.py:n muoto — palautetaan vain sen kentät.
+    Kaikki kutsut kulkevat yhteisen rajoittimen läpi (TMDB_MAX_CONCURRENCY).
+    Onnistuneet vastaukset tallennetaan tavuina (CACHE_TTL) — jokainen osuma
+    dekoodataan erikseen, joten kutsuja saa aina oman dictinsä.
+
+    Polun alulla on oma katkaisija (breaker.py). Kun se on auki tai kutsu
+    epäonnistuu (verkkovirhe, 429, 5xx), palautetaan vanhentunut välimuistirivi
+    jos sellainen on. Muuten CircuitOpen / virhe — tai raise_for_status=False
+    -kutsujille tyhjä vastaus, kuten muillekin epäonnistuneille hauille."""
+    params = params or {}
+    ttl = _cache_ttl(path, params)
+    cache = memory["response_cache"]
+    key = (path, tuple(sorted((k, str(v)) for k, v in params.items())))
+    stale = None
+    if ttl is not None:
+        entry = cache.get_entry(key)
+        if entry is not None:
+            if entry[1]:
+                return decode(entry[0], shape)
+            stale = entry[0]
+
+    circuit = breaker(tmdb_family(path))
+    if not circuit.allow():
+        return _degraded(path, stale, shape, raise_for_status, CircuitOpen(circuit.name))
+
+    try:
+        async with _limiter():
+            r = await client.get(f"{TMDB_BASE}{path}", params={"api_key": TMDB_API_KEY, **params})
+    except httpx.TransportError as e:
+        circuit.record(False)
+        return _degraded(path, stale, shape, raise_for_status, e)
+    upstream_failure = r.status_code == 429 or r.status_code >= 500
+    circuit.record(not upstream_failure)
+    if upstream_failure and stale is not None:
+        return _degraded(path, stale, shape, raise_for_status, None)
+    if raise_for_status:
+        r.raise_for_status()
+    if ttl is not None and r.is_success:
+        cache.set(key, r.content, ttl)
+    return decode(r.content, shape)
+
+
+def _degraded(path: str, stale: bytes | None, shape: type | None, raise_error: bool, error: Exception | None) -> dict:
+    """Vara kun TMDB ei vastaa: vanhentunut rivi, tyhjä vastaus tai virhe."""
+    if stale is not None:
+        _log("TMDB VANHENTUNUT VASTAUS", path)
+        return decode(stale, shape)
+    if raise_error and error is not None:
+        raise error
+    return decode(b"{}", shape)
+
+
+async def iter_pages(
+    client: httpx.AsyncClient,
+    path: str,
+    params: dict | None = None,
+    *,
+    max_pages: int = TMDB_MAX_PAGE,
+    window: int = PREFETCH_WINDOW,
+    shape: type = Page,
+    raise_for_status: bool = True,
+) -> AsyncIterator[dict]:
+    """Sivutettu haku (search, discover) sivu kerrallaan järjestyksessä.
+
+    Sivu 1 haetaan ensin (siitä selviää total_pages), sen jälkeen enintään
+    `window` seuraavaa sivua on haussa rinnakkain. Kun kuluttaja lopettaa
+    (break + aclosing), keskeneräiset haut perutaan ja niiden loppumista odotetaan,
+    jotta asiakasta ei suljeta perumisen ollessa vielä kesken.
+    """
+    params = params or {}
+    first = await get_json(client, path, {**params, "page": 1}, shape=shape, raise_for_status=raise_for_status)
+    yield first
+
+    last = min(first.get("total_pages") or 1, max_pages, TMDB_MAX_PAGE)
+    pending: deque[asyncio.Task] = deque()
+    next_page = 2
+    try:
+        while next_page <= last or pending:
+            while next_page <= last and len(pending) < max(window, 1):
+                pending.append(asyncio.create_task(get_json(
+                    client, path, {**params, "page": next_page}, shape=shape, raise_for_status=raise_for_status,
+                )))
+                next_page += 1
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def collect_titles(
+    client: httpx.AsyncClient,
+    path: str,
+    params: dict | None = None,
+    media_type: str = "movie",
+    *,
+    limit: int = PAGE_SIZE,
+    keep: Callable[[Title], bool] | None = None,
+    max_pages: int | None = None,
+    window: int = PREFETCH_WINDOW,
+    raise_for_status: bool = True,
+) -> tuple[list[Title], int]:
+    """Kerää enintään `limit` teosta sivu kerrallaan, duplikaatit pois.
+    keep: asiakaspään suodatin — sivuja haetaan kunnes tarpeeksi läpäisee.
+    Ilman suodatinta haetaan vain limitin vaatimat sivut.
+    Palauttaa (teokset, total_results)."""
+    if max_pages is None:
+        max_pages = math.ceil(limit / PAGE_SIZE) if keep is None else TMDB_MAX_PAGE
+    if keep is None:
+        window = min(window, max_pages - 1)
+
+    titles: list[Title] = []
+    seen: set[int] = set()
+    total = 0
+    pages = iter_pages(
+        client, path, params, max_pages=max_pages, window=window, raise_for_status=raise_for_status,
+    )
+    async with aclosing(pages):
+        async for page in pages:
+            total = total or page.get("total_results", 0)
+            for t in parse_titles(page.get("results", []), media_type):
+                if t.id in seen or (keep and not keep(t)):
+                    continue
+                seen.add(t.id)
+                titles.append(t)
+                if len(titles) >= limit:
+                    return titles, total
+    return titles, total
@@ -1,113 +1,318 @@
+import asyncio
+from typing import Any
+
 import httpx
 
-from .memory import memory, TMDB_API_KEY, TMDB_BASE, _log
+from .memory import memory, _log, normalize_region, reference_for
+from .decode import KeywordList, MovieDetails, Page, PersonDetails, TvDetails
+from .tmdb import PAGE_SIZE, collect_titles, get_json
+from .franchise import fetch_collection
+from .availability import WATCH_REGION, availability_for, fetch_availability, partition, streaming_names
+from .models import Credit, Person, parse_results, parse_titles
+from .snapshots import trending_snapshots
+from .localize import DEFAULT_LANGUAGE, FALLBACK_LANGUAGE, apply_fallback, normalize_language
+from .format import DEFAULT_BUDGET, message, ref_fi, ref_type, respond
+
+# discover: montako tulosta enintään (10 sivua)
+DISCOVER_MAX_LIMIT = 200
+# get_details: nämä tulevat samassa vastauksessa (yksi kutsu neljän sijaan)
+DETAILS_APPEND = "keywords,credits,watch/providers,recommendations"
+# get_details_many: id:itä enintään yhdessä kutsussa
+DETAILS_MANY_MAX = 50
+
+
+def _refetch_page(client: httpx.AsyncClient, endpoint: str, params: dict, media_type: str = "movie"):
+    """apply_fallbackille: sama sivu toisella kielellä (vastausvälimuistin kautta)."""
+    async def fetch(language: str) -> list:
+        data = await get_json(client, endpoint, {**params, "language": language}, shape=Page)
+        return parse_results(data.get("results", []), media_type)
+    return fetch
+
+
+def remember_keywords(keywords: list[dict]) -> None:
+    """Teoksen keywordit keyword_cacheen (nimi → id) — discover ei hae niitä enää uudelleen."""
+    cache = memory["keyword_cache"]
+    for kw in keywords:
+        name = kw.get("name", "").lower()
+        kw_id = str(kw.get("id", ""))
+        if name and kw_id:
+            cache.set(name, kw_id)
 
 
-async def list_genres(type: str = "movie") -> str:
+async def keyword_ids(client: httpx.AsyncClient, keywords: list[str]) -> list[str]:
+    """Keyword-nimet → TMDB-id:t: keyword_cache ensin, muuten /search/keyword (paras osuma).
+    Tuntemattomat nimet jätetään pois."""
+    cache = memory["keyword_cache"]
+    ids = []
+    for kw in keywords:
+        kw_lower = kw.lower()
+        kw_id = cache.get(kw_lower)
+        if kw_id is None:
+            data_kw = await get_json(client, "/search/keyword", {"query": kw}, shape=Page, raise_for_status=False)
+            results_kw = data_kw.get("results", [])
+            if not results_kw:
+                continue
+            kw_id = str(results_kw[0]["id"])
+            cache.set(kw_lower, kw_id)
+        ids.append(kw_id)
+    return ids
+
+
+async def list_genres(type: str = "movie", format: str | None = None) -> str | dict[str, Any]:
     """
     Listaa käytettävissä olevat genret.
     type: 'movie' tai 'tv'
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
     genres = memory["movie_genres"] if type == "movie" else memory["tv_genres"]
     if not genres:
-        return "Genrejä ei ladattu — onko palvelin käynnistetty oikein?"
+        return message("Genrejä ei ladattu — onko palvelin käynnistetty oikein?", format)
+    if format == "json":
+        return {"genres": list(genres)}
     return "\n".join(f"{g['id']}: {g['name']}" for g in genres)
 
 
-async def list_certifications(type: str = "movie") -> str:
+async def list_certifications(
+    type: str = "movie", region: str | None = None, format: str | None = None,
+) -> str | dict[str, Any]:
     """
-    Listaa Suomen ikärajat.
+    Listaa maan ikärajat.
     type: 'movie' tai 'tv'
+    region: maakoodi, esim. 'SE' (oletus FI)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
-    certs = memory["movie_certifications"] if type == "movie" else memory["tv_certifications"]
+    try:
+        ref = await reference_for(region)
+    except Exception as e:
+        return message(f"Ikärajoja ei saatu: {e}", format)
+    certs = ref["movie_certifications"] if type == "movie" else ref["tv_certifications"]
     if not certs:
-        return "Sertifikaatteja ei ladattu."
+        return message("Sertifikaatteja ei ladattu.", format)
     sorted_certs = sorted(certs, key=lambda c: c["order"])
+    if format == "json":
+        return {"certifications": sorted_certs}
     return "\n".join(f"{c['certification']}: {c['meaning']}" for c in sorted_certs)
 
 
-async def search_by_title(query: str, type: str = "movie") -> str:
+async def search_by_title(
+    query: str, type: str = "movie", locale: str | None = None, format: str | None = None,
+) -> str | dict[str, Any]:
     """
     Hae elokuvia tai sarjoja nimellä.
     query: hakusana
     type: 'movie' tai 'tv'
+    locale: nimien ja kuvausten kieli, esim. 'fi' tai 'en' (puuttuva kuvaus englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
+    try:
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
     params = {
-        "api_key": TMDB_API_KEY,
         "query": query,
-        "language": "en",
+        "language": lang,
         "include_adult": False,
         "page": 1,
     }
     endpoint = "/search/movie" if type == "movie" else "/search/tv"
-    genre_map = {g["id"]: g["name"] for g in memory["movie_genres" if type == "movie" else "tv_genres"]}
 
     async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}{endpoint}", params=params)
-        r.raise_for_status()
-        data = r.json()
-
-    results = data.get("results", [])
+        data = await get_json(client, endpoint, params, shape=Page)
+        results = parse_titles(data.get("results", []), type)
+        await apply_fallback(results, lang, _refetch_page(client, endpoint, params, type))
     total = data.get("total_results", 0)
 
     if not results:
-        return f"Ei tuloksia haulle '{query}'."
-
-    lines = [f"Hakutulos: {total} osumaa (näytetään {len(results)})\n"]
-    for item in results:
-        if type == "movie":
-            title = item.get("title", "?")
-            original = item.get("original_title", "")
-            date = item.get("release_date", "")[:4]
-        else:
-            title = item.get("name", "?")
-            original = item.get("original_name", "")
-            date = item.get("first_air_date", "")[:4]
+        return message(f"Ei tuloksia haulle '{query}'.", format)
+
+    header = f"Hakutulos: {total} osumaa (näytetään {len(results)})\n"
+    return respond(header, results, memory["index"].genre_map, format, layout="full")
+
+
+async def _fetch_details(
+    client: httpx.AsyncClient, id: int, type: str, region: str = WATCH_REGION, lang: str = DEFAULT_LANGUAGE,
+) -> dict:
+    """Teoksen tiedot, append_to_response-osat ja kokoelma yhtenä dictinä.
+    Välimuistissa (type, id, kieli) → sama tulos get_detailsille ja get_details_manylle.
+    watch/providers sisältää kaikki maat, joten välimuistiin jää koko vastaus ja
+    maan palvelut poimitaan jokaiselle kutsulle erikseen."""
+    cache = memory["details_cache"]
+    key = (type, id, lang)
+    d = cache.get(key)
+    if d is None:
+        d = await _fetch_details_all(client, id, type, lang)
+        cache.set(key, d)
+
+    by_region = d["watch_providers_by_region"]
+    view = {k: v for k, v in d.items() if k != "watch_providers_by_region"}
+    view["watch_region"] = region
+    view["watch_providers"] = by_region.get(region, {})
+    availability_for(region).set(type, id, streaming_names(view["watch_providers"]))
+    return view
+
+
+async def _fallback_overview(client: httpx.AsyncClient, id: int, type: str) -> str:
+    """Varakielen kuvaus: tietojen tai listojen välimuistista, viimeisenä yksi kevyt haku."""
+    cached = memory["details_cache"].get((type, id, FALLBACK_LANGUAGE))
+    if cached is not None:
+        return cached.get("overview") or ""
+    text = memory["text_cache"].get((type, id, FALLBACK_LANGUAGE))
+    if text:
+        return text
+    d = await get_json(client, f"/{type}/{id}", {"language": FALLBACK_LANGUAGE},
+                       shape=MovieDetails if type == "movie" else TvDetails)
+    return d.get("overview") or ""
+
+
+async def _fetch_details_all(client: httpx.AsyncClient, id: int, type: str, lang: str) -> dict:
+    """Teoksen tiedot kaikille maille yhdellä kutsulla (append_to_response) ja kokoelman
+    osat rinnakkain. details_cacheen tallennettava muoto; maa valitaan _fetch_detailsissa."""
+    params = {"language": lang, "append_to_response": DETAILS_APPEND}
+    endpoint = f"/movie/{id}" if type == "movie" else f"/tv/{id}"
+    d = await get_json(client, endpoint, params, shape=MovieDetails if type == "movie" else TvDetails)
+
+    # Kokoelma haetaan heti kun sen id tiedetään, muun käsittelyn (myös varakielen) rinnalla
+    coll = d.get("belongs_to_collection") if type == "movie" else None
+    coll_task = asyncio.create_task(fetch_collection(client, coll["id"], lang)) if coll and coll.get("id") else None
+    try:
+        if not d.get("overview") and lang != FALLBACK_LANGUAGE:
+            d["overview"] = await _fallback_overview(client, id, type)
+
+        keywords = d.pop("keywords", {}).get("keywords" if type == "movie" else "results", [])
+        remember_keywords(keywords)
+        d["keywords"] = keywords
+        d["credits"] = d.pop("credits", {})
+        d["watch_providers_by_region"] = d.pop("watch/providers", {}).get("results", {})
+        d["recommendations"] = parse_titles(d.pop("recommendations", {}).get("results", []), type)
+        await apply_fallback(d["recommendations"], lang)
+
+        parts = await coll_task if coll_task else None
+    finally:
+        if coll_task is not None and not coll_task.done():
+            coll_task.cancel()
+    d["collection"] = (coll["name"], parts) if parts else None
+    return d
+
+
+# Suositukset ja keywordit: sama määrä kuin tekstimuodossa
+DETAILS_RECOMMENDATIONS = 5
+DETAILS_KEYWORDS = 10
+# Listakentät joista rakenteiseen muotoon jää vain nimi
+_NAMED_FIELDS = ("genres", "production_countries", "created_by", "networks")
+
+
+def _details_summary(d: dict) -> dict[str, list[str]]:
+    """Tekijät, palvelut ja keywordit nimilistoina — sama poiminta tekstille ja json:lle."""
+    credits = d["credits"]
+    providers = d["watch_providers"]
+    cast = sorted(credits.get("cast", []), key=lambda c: c.get("order", 999))[:5]
+    return {
+        "directors": [c["name"] for c in credits.get("crew", []) if c.get("job") == "Director"],
+        "cast": [c["name"] for c in cast],
+        "streaming": [p["provider_name"] for p in providers.get("flatrate", []) + providers.get("free", [])],
+        "rent_or_buy": list(dict.fromkeys(
+            p["provider_name"] for p in providers.get("rent", []) + providers.get("buy", [])
+        )),
+        "keywords": [kw["name"] for kw in d["keywords"][:DETAILS_KEYWORDS]],
+    }
 
-        item_id = item.get("id")
-        overview = item.get("overview", "")[:200]
-        genre_names = [genre_map.get(gid, str(gid)) for gid in item.get("genre_ids", [])]
-        vote = item.get("vote_average", 0)
-        votes = item.get("vote_count", 0)
 
-        name_str = title if title == original or not original else f"{title} ({original})"
-        lines.append(
-            f"[{item_id}] {name_str} ({date})\n"
-            f"  Genret: {', '.join(genre_names) or '-'}\n"
-            f"  Arvosana: {vote:.1f}/10 ({votes} ääntä)\n"
-            f"  {overview}"
-        )
+def _details_data(d: dict, type: str) -> dict:
+    """Rakenteinen (json) muoto _fetch_detailsin tuloksesta: samat tiedot kuin tekstissä,
+    ei koko TMDB-vastausta (kaikki roolit, keywordit ja maiden palvelut)."""
+    data = {
+        k: v for k, v in d.items()
+        if k not in ("keywords", "credits", "watch_providers", "recommendations", "collection",
+                     "belongs_to_collection")
+    }
+    for field in _NAMED_FIELDS:
+        if field in data:
+            data[field] = [item["name"] for item in data[field]]
+    data.update(_details_summary(d))
+    data["media_type"] = type
+    data["recommendations"] = [
+        {"id": r.id, "title": r.title, "year": r.year or None}
+        for r in d["recommendations"][:DETAILS_RECOMMENDATIONS]
+    ]
+    data["collection"] = None
+    if d["collection"]:
+        coll_name, parts = d["collection"]
+        data["collection"] = {
+            "name": coll_name,
+            "parts": [{"id": p.id, "title": p.title, "year": p.year or None,
+                       "vote_average": round(p.vote_average, 1)} for p in parts],
+        }
+    return data
+
+
+async def get_details(
+    id: int, type: str = "movie", region: str | None = None, locale: str | None = None,
+    format: str | None = None,
+) -> str | dict[str, Any]:
+    """
+    Hae elokuvan tai sarjan tarkemmat tiedot TMDB-id:llä.
+    id: TMDB-id (saadaan search_by_title-hausta)
+    type: 'movie' tai 'tv'
+    region: maa jonka katselupalvelut näytetään, esim. 'SE' (oletus FI)
+    locale: nimen ja kuvauksen kieli, esim. 'fi' tai 'en' (puuttuva kuvaus englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
+    """
+    try:
+        region = normalize_region(region)
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
+    async with httpx.AsyncClient() as client:
+        d = await _fetch_details(client, id, type, region, lang)
 
-    return "\n\n".join(lines)
+    if format == "json":
+        return _details_data(d, type)
+    return _details_text(d, id, type)
 
 
-async def get_details(id: int, type: str = "movie") -> str:
+async def get_details_many(
+    ids: list[int], type: str = "movie", region: str | None = None, locale: str | None = None,
+    format: str | None = None,
+) -> str | dict[str, Any]:
     """
-    Hae elokuvan tai sarjan tarkemmat tiedot TMDB-id:llä.
-    id: TMDB-id (saadaan search_by_title-hausta)
+    Hae usean elokuvan tai sarjan tiedot yhdellä kutsulla (esim. koko hakutuloslista).
+    ids: lista TMDB-id:itä (enintään 50, duplikaatit ohitetaan)
     type: 'movie' tai 'tv'
+    region: maa jonka katselupalvelut näytetään, esim. 'SE' (oletus FI)
+    locale: nimien ja kuvausten kieli, esim. 'fi' tai 'en' (puuttuva kuvaus englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
-    params = {"api_key": TMDB_API_KEY, "language": "en"}
-    endpoint = f"/movie/{id}" if type == "movie" else f"/tv/{id}"
+    unique = list(dict.fromkeys(ids))[:DETAILS_MANY_MAX]
+    if not unique:
+        return message("Ei id:itä.", format)
+    try:
+        region = normalize_region(region)
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
 
     async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}{endpoint}", params=params)
-        r.raise_for_status()
-        d = r.json()
+        results = await asyncio.gather(
+            *[_fetch_details(client, id, type, region, lang) for id in unique], return_exceptions=True,
+        )
 
-        collection_parts = []
-        if type == "movie":
-            coll = d.get("belongs_to_collection")
-            if coll and coll.get("id"):
-                cr = await client.get(
-                    f"{TMDB_BASE}/collection/{coll['id']}",
-                    params={"api_key": TMDB_API_KEY, "language": "en"},
-                )
-                if cr.status_code == 200:
-                    parts = cr.json().get("parts", [])
-                    parts.sort(key=lambda p: p.get("release_date") or "")
-                    collection_parts = [(coll["name"], parts)]
+    found = [(id, d) for id, d in zip(unique, results) if not isinstance(d, BaseException)]
+    missing = [id for id, d in zip(unique, results) if isinstance(d, BaseException)]
+    if missing:
+        _log("GET_DETAILS_MANY", f"Ei saatu: {missing}")
 
+    if format == "json":
+        return {"results": [_details_data(d, type) for _, d in found], "missing": missing}
+
+    sections = [f"[{id}] {_details_text(d, id, type)}" for id, d in found]
+    if missing:
+        sections.append("Ei löytynyt: " + ", ".join(str(id) for id in missing))
+    return "\n\n---\n\n".join(sections)
+
+
+def _details_text(d: dict, id: int, type: str) -> str:
+    summary = _details_summary(d)
+    recommendations = d["recommendations"]
     genres = ", ".join(g["name"] for g in d.get("genres", []))
 
     if type == "movie":
@@ -162,28 +367,47 @@ async def get_details(id: int, type: str = "movie") -> str:
         if season_lines:
             lines += ["", "Kaudet:"] + season_lines
 
-    if collection_parts:
-        coll_name, parts = collection_parts[0]
+    lines += [
+        "",
+        f"Ohjaus: {', '.join(summary['directors'])}" if summary["directors"] else None,
+        f"Pääosissa: {', '.join(summary['cast'])}" if summary["cast"] else None,
+        f"Katsottavissa ({d['watch_region']}): {', '.join(summary['streaming'])}" if summary["streaming"] else None,
+        f"Vuokraus/osto ({d['watch_region']}): {', '.join(summary['rent_or_buy'])}" if summary["rent_or_buy"] else None,
+        f"Keywordit: {', '.join(summary['keywords'])}" if summary["keywords"] else None,
+    ]
+    if recommendations:
+        lines += ["", "Suosituksia:"]
+        lines += [f"  [{r.id}] {r.label}" for r in recommendations[:DETAILS_RECOMMENDATIONS]]
+
+    if d["collection"]:
+        coll_name, parts = d["collection"]
         lines += ["", f"Osa kokoelmaa: {coll_name}"]
         for p in parts:
-            year = (p.get("release_date") or "")[:4]
-            vote = p.get("vote_average", 0)
-            marker = " ◄ tämä" if p.get("id") == id else ""
-            pname = p.get("title") or p.get("name", "?")
-            lines.append(f"  {pname} ({year}) — {vote:.1f}/10{marker}")
+            marker = " ◄ tämä" if p.id == id else ""
+            lines.append(f"  {p.title} ({p.year}) — {p.vote_average:.1f}/10{marker}")
 
     return "\n".join(line for line in lines if line is not None)
 
 
-async def list_watch_providers(type: str = "movie") -> str:
+async def list_watch_providers(
+    type: str = "movie", region: str | None = None, format: str | None = None,
+) -> str | dict[str, Any]:
     """
-    Listaa Suomessa saatavilla olevat suoratoistopalvelut.
+    Listaa maassa saatavilla olevat suoratoistopalvelut.
     type: 'movie' tai 'tv'
+    region: maakoodi, esim. 'SE' (oletus FI)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
-    providers = memory["movie_providers"] if type == "movie" else memory["tv_providers"]
+    try:
+        ref = await reference_for(region)
+    except Exception as e:
+        return message(f"Palveluja ei saatu: {e}", format)
+    providers = ref["movie_providers"] if type == "movie" else ref["tv_providers"]
     if not providers:
-        return "Palveluja ei ladattu."
+        return message("Palveluja ei ladattu.", format)
     sorted_providers = sorted(providers, key=lambda p: p["provider_name"])
+    if format == "json":
+        return {"providers": sorted_providers}
     return "\n".join(f"{p['provider_id']}: {p['provider_name']}" for p in sorted_providers)
 
 
@@ -197,13 +421,17 @@ async def discover(
     sort_by: str = "popularity.desc",
     max_runtime: int | None = None,
     language: str | None = None,
-    watch_provider: str | None = None,
+    watch_provider: str | list[str] | None = None,
     with_cast: int | None = None,
     year_from: int | None = None,
     year_to: int | None = None,
     date_gte: str | None = None,
     date_lte: str | None = None,
-) -> str:
+    limit: int = PAGE_SIZE,
+    region: str | None = None,
+    locale: str | None = None,
+    format: str | None = None,
+) -> str | dict[str, Any]:
     """
     Hae elokuvia tai sarjoja filtterien avulla.
     type: 'movie' tai 'tv'
@@ -215,27 +443,40 @@ async def discover(
     sort_by: järjestys, esim. popularity.desc, vote_average.desc, release_date.desc
     max_runtime: enimmäiskesto minuutteina (vain elokuvat)
     language: alkuperäiskieli, esim. "fi", "en", "ko"
-    watch_provider: suoratoistopalvelun nimi, esim. "Netflix", "Disney Plus"
+    watch_provider: suoratoistopalvelun nimi, esim. "Netflix", tai lista ["Netflix", "Yle Areena"]
+                    (yksi haku kaikista, tulokset ryhmitellään palveluittain)
     with_cast: näyttelijän/ohjaajan TMDB-id filtteriksi
     year_from: aikavälin alku (primary_release_date.gte)
     year_to: aikavälin loppu (primary_release_date.lte)
     date_gte: ilmestymispäivä alkaen "YYYY-MM-DD" (tv: air_date.gte — episodeja ilmestynyt tällä aikavälillä)
     date_lte: ilmestymispäivä päättyen "YYYY-MM-DD" (tv: air_date.lte)
+    limit: tulosten enimmäismäärä (oletus 20, enintään 200 — haetaan tarvittaessa useampi sivu).
+           Usealla watch_providerilla raja on palvelua kohden: haetaan limit × palvelut
+           (enintään 200) ja jokainen palveluosio katkaistaan limit-määrään
+    region: maa jonka palveluista watch_provider haetaan, esim. 'SE' (oletus FI)
+    locale: nimien ja kuvausten kieli, esim. 'fi' tai 'en' (puuttuva kuvaus englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
-    genre_list = memory["movie_genres"] if type == "movie" else memory["tv_genres"]
-    genre_map = {g["name"].lower(): g["id"] for g in genre_list}
+    try:
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
+    try:
+        ref = await reference_for(region)
+    except Exception as e:
+        return message(f"Maan tietoja ei saatu: {e}", format)
+    index = ref["index"]
+    region = normalize_region(region)
 
     params: dict = {
-        "api_key": TMDB_API_KEY,
-        "language": "en",
+        "language": lang,
         "sort_by": sort_by,
         "vote_count.gte": min_votes,
         "include_adult": False,
-        "page": 1,
     }
 
     if genres:
-        ids = [str(gid) for name in genres if (gid := genre_map.get(name.lower()))]
+        ids = [str(gid) for name in genres if (gid := index.genre_id(type, name))]
         if ids:
             params["with_genres"] = "|".join(ids)
 
@@ -266,34 +507,26 @@ async def discover(
 
     if keywords:
         async with httpx.AsyncClient() as client:
-            kw_ids = []
-            for kw in keywords:
-                kw_lower = kw.lower()
-                if kw_lower in memory["keyword_cache"]:
-                    kw_ids.append(memory["keyword_cache"][kw_lower])
-                else:
-                    r = await client.get(
-                        f"{TMDB_BASE}/search/keyword",
-                        params={"api_key": TMDB_API_KEY, "query": kw},
-                    )
-                    results_kw = r.json().get("results", [])
-                    if results_kw:
-                        kw_id = str(results_kw[0]["id"])
-                        memory["keyword_cache"][kw_lower] = kw_id
-                        kw_ids.append(kw_id)
+            kw_ids = await keyword_ids(client, keywords)
             if kw_ids:
                 params["with_keywords"] = "|".join(kw_ids)
 
-    if watch_provider:
-        provider_list = memory["movie_providers"] if type == "movie" else memory["tv_providers"]
-        match = next(
-            (p for p in provider_list if p["provider_name"].lower() == watch_provider.lower()),
-            None,
-        )
+    wanted = [watch_provider] if isinstance(watch_provider, str) else list(watch_provider or [])
+    matches = []
+    for wp in wanted:
+        match = index.provider(type, wp)
         if match is None:
-            return f"Tuntematon suoratoistopalvelu: '{watch_provider}'. Käytä list_watch_providers-työkalua nähdäksesi saatavilla olevat palvelut."
-        params["with_watch_providers"] = match["provider_id"]
-        params["watch_region"] = "FI"
+            return message(
+                f"Tuntematon suoratoistopalvelu: '{wp}'. "
+                "Käytä list_watch_providers-työkalua nähdäksesi saatavilla olevat palvelut.",
+                format,
+            )
+        if match not in matches:
+            matches.append(match)
+    if matches:
+        # Useampi palvelu → yksi OR-haku, ryhmittely palveluittain tehdään paikallisesti
+        params["with_watch_providers"] = "|".join(str(m["provider_id"]) for m in matches)
+        params["watch_region"] = region
 
     if with_cast is not None:
         params["with_cast"] = with_cast
@@ -301,181 +534,205 @@ async def discover(
     endpoint = "/discover/movie" if type == "movie" else "/discover/tv"
     _log("TMDB DISCOVER KUTSU", f"endpoint={endpoint}\nparams={params}")
 
+    limit = max(1, min(limit, DISCOVER_MAX_LIMIT))
+    # Palvelut jakavat yhden OR-haun → haetaan jokaiselle osiolle oma limit
+    fetch_limit = min(limit * max(len(matches), 1), DISCOVER_MAX_LIMIT)
     async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}{endpoint}", params=params)
-        r.raise_for_status()
-        data = r.json()
+        results, total = await collect_titles(client, endpoint, params, type, limit=fetch_limit)
 
-    results = data.get("results", [])
-    total = data.get("total_results", 0)
+        async def _refetch(language: str) -> list:
+            titles, _ = await collect_titles(client, endpoint, {**params, "language": language}, type, limit=fetch_limit)
+            return titles
 
-    if not results:
-        return "Ei tuloksia annetuilla hakuehdoilla."
+        await apply_fallback(results, lang, _refetch)
 
-    id_to_genre = {g["id"]: g["name"] for g in genre_list}
+    if len(matches) == 1:
+        availability_for(region).add(type, (t.id for t in results), matches[0]["provider_name"])
 
-    lines = [f"Hakutulos: {total} osumaa (näytetään {len(results)})\n"]
-    for item in results:
-        if type == "movie":
-            title = item.get("title", "?")
-            original = item.get("original_title", "")
-            date = item.get("release_date", "")[:4]
-        else:
-            title = item.get("name", "?")
-            original = item.get("original_name", "")
-            date = item.get("first_air_date", "")[:4]
+    if not results:
+        return message("Ei tuloksia annetuilla hakuehdoilla.", format)
+
+    header = f"Hakutulos: {total} osumaa (näytetään {len(results)})\n"
+    if len(matches) <= 1:
+        return respond(header, results, index.genre_map, format, layout="full")
+    return _provider_sections(results, [m["provider_name"] for m in matches], type, region, format, limit)
+
+
+def _provider_sections(
+    results: list, names: list[str], type: str, region: str, format: str | None, limit: int,
+) -> str | dict:
+    """Monen palvelun discover: osio per palvelu + osio teoksille joiden palvelua ei vielä tiedetä.
+    Jokaisessa osiossa enintään limit teosta."""
+    sections, unknown = partition(availability_for(region), type, results, names)
+    groups = [(name, items[:limit]) for name, items in sections.items() if items]
+    if unknown:
+        groups.append((" tai ".join(names), unknown[:limit]))
+    budget = DEFAULT_BUDGET // len(groups)
+
+    rendered = [
+        (name, respond(f"{len(items)} teosta\n", items, memory["index"].genre_map, format,
+                       layout="full", budget=budget))
+        for name, items in groups
+    ]
+    if format == "json":
+        return {"sections": [{"watch_provider": name, **res} for name, res in rendered]}
+    return "\n\n".join(f"## {name}\n\n{res}" for name, res in rendered)
 
-        item_id = item.get("id")
-        overview = item.get("overview", "")[:200]
-        genre_names = [id_to_genre.get(gid, str(gid)) for gid in item.get("genre_ids", [])]
-        vote = item.get("vote_average", 0)
-        votes = item.get("vote_count", 0)
 
-        name_str = title if title == original or not original else f"{title} ({original})"
-        lines.append(
-            f"[{item_id}] {name_str} ({date})\n"
-            f"  Genret: {', '.join(genre_names) or '-'}\n"
-            f"  Arvosana: {vote:.1f}/10 ({votes} ääntä)\n"
-            f"  {overview}"
-        )
+async def filter_by_provider(
+    ids: list[int],
+    type: str = "movie",
+    providers: list[str] | None = None,
+    region: str | None = None,
+    format: str | None = None,
+) -> str | dict[str, Any]:
+    """
+    Tarkista missä maan suoratoistopalveluissa teokset ovat — koko lista kerralla.
+    ids: lista TMDB-id:itä (esim. hakutuloksesta, enintään 50)
+    type: 'movie' tai 'tv'
+    providers: suodata näihin palveluihin, esim. ["Netflix", "Yle Areena"]. Tyhjä = näytä kaikki palvelut.
+    region: maakoodi, esim. 'SE' (oletus FI)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
+    """
+    unique = list(dict.fromkeys(ids))[:DETAILS_MANY_MAX]
+    if not unique:
+        return message("Ei id:itä.", format)
+    try:
+        ref = await reference_for(region)
+    except Exception as e:
+        return message(f"Maan tietoja ei saatu: {e}", format)
+    region = normalize_region(region)
+
+    wanted = None
+    if providers:
+        names = []
+        for wp in providers:
+            match = ref["index"].provider(type, wp)
+            if match is None:
+                return message(
+                    f"Tuntematon suoratoistopalvelu: '{wp}'. "
+                    "Käytä list_watch_providers-työkalua nähdäksesi saatavilla olevat palvelut.",
+                    format,
+                )
+            names.append(match["provider_name"])
+        wanted = frozenset(names)
 
-    return "\n\n".join(lines)
+    async with httpx.AsyncClient() as client:
+        found = await fetch_availability(client, availability_for(region), unique, type, wanted, region)
 
+    unknown = [id for id in unique if id not in found]
+    if wanted is None:
+        hits = [(id, sorted(found[id])) for id in unique if id in found]
+        misses = []
+    else:
+        hits = [(id, sorted(found[id] & wanted)) for id in unique if id in found and found[id] & wanted]
+        misses = [id for id in unique if id in found and not found[id] & wanted]
+
+    if format == "json":
+        return {
+            "region": region,
+            "providers": sorted(wanted) if wanted else None,
+            "results": [{"id": id, "providers": p} for id, p in hits],
+            "not_available": misses,
+            "unknown": unknown,
+        }
+
+    if wanted is None:
+        lines = [f"Saatavuus suoratoistona ({region}):"]
+    else:
+        lines = [f"Saatavilla palveluissa {', '.join(sorted(wanted))} ({region}): {len(hits)}/{len(unique)} teosta"]
+    lines += [f"  [{id}] {', '.join(p) or 'ei suoratoistossa'}" for id, p in hits]
+    if misses:
+        lines.append(f"Ei näissä palveluissa: {', '.join(map(str, misses))}")
+    if unknown:
+        lines.append(f"Ei tietoa: {', '.join(map(str, unknown))}")
+    return "\n".join(lines)
 
-async def search_multi(query: str) -> str:
+
+async def search_multi(query: str, locale: str | None = None, format: str | None = None) -> str | dict[str, Any]:
     """
     Hae elokuvia, sarjoja ja henkilöitä yhdellä haulla.
     query: hakusana
+    locale: nimien ja kuvausten kieli, esim. 'fi' tai 'en' (puuttuva kuvaus englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
+    try:
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
     params = {
-        "api_key": TMDB_API_KEY,
         "query": query,
-        "language": "en",
+        "language": lang,
         "include_adult": False,
         "page": 1,
     }
 
     async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}/search/multi", params=params)
-        r.raise_for_status()
-        data = r.json()
+        data = await get_json(client, "/search/multi", params, shape=Page)
+        raw = data.get("results", [])
+        results = [r for r in parse_results(raw) if isinstance(r, Person) or r.media_type in ("movie", "tv")]
+        await apply_fallback(results, lang, _refetch_page(client, "/search/multi", params))
 
-    results = data.get("results", [])
     total = data.get("total_results", 0)
 
-    if not results:
-        return f"Ei tuloksia haulle '{query}'."
-
-    movie_genre_map = {g["id"]: g["name"] for g in memory["movie_genres"]}
-    tv_genre_map = {g["id"]: g["name"] for g in memory["tv_genres"]}
-
-    lines = [f"Hakutulos: {total} osumaa (näytetään {len(results)})\n"]
-    for item in results:
-        media_type = item.get("media_type")
-
-        if media_type == "movie":
-            title = item.get("title", "?")
-            original = item.get("original_title", "")
-            name_str = title if title == original or not original else f"{title} ({original})"
-            date = item.get("release_date", "")[:4]
-            genre_names = [movie_genre_map.get(gid, str(gid)) for gid in item.get("genre_ids", [])]
-            vote = item.get("vote_average", 0)
-            votes = item.get("vote_count", 0)
-            overview = item.get("overview", "")[:150]
-            lines.append(
-                f"[elokuva/{item.get('id')}] {name_str} ({date})\n"
-                f"  Genret: {', '.join(genre_names) or '-'} | {vote:.1f}/10 ({votes} ääntä)\n"
-                f"  {overview}"
-            )
-        elif media_type == "tv":
-            name = item.get("name", "?")
-            original = item.get("original_name", "")
-            name_str = name if name == original or not original else f"{name} ({original})"
-            date = item.get("first_air_date", "")[:4]
-            genre_names = [tv_genre_map.get(gid, str(gid)) for gid in item.get("genre_ids", [])]
-            vote = item.get("vote_average", 0)
-            votes = item.get("vote_count", 0)
-            overview = item.get("overview", "")[:150]
-            lines.append(
-                f"[sarja/{item.get('id')}] {name_str} ({date})\n"
-                f"  Genret: {', '.join(genre_names) or '-'} | {vote:.1f}/10 ({votes} ääntä)\n"
-                f"  {overview}"
-            )
-        elif media_type == "person":
-            pid = item.get("id")
-            pname = item.get("name", "?")
-            dept = item.get("known_for_department", "")
-            known_for = item.get("known_for", [])
-            known_titles = []
-            for kf in known_for[:3]:
-                t = kf.get("title") or kf.get("name") or "?"
-                y = (kf.get("release_date") or kf.get("first_air_date") or "")[:4]
-                known_titles.append(f"{t} ({y})" if y else t)
-            lines.append(
-                f"[henkilö/{pid}] {pname}" + (f" — {dept}" if dept else "") + "\n"
-                f"  Tunnettu: {', '.join(known_titles) or '-'}"
-            )
+    if not raw:
+        return message(f"Ei tuloksia haulle '{query}'.", format)
 
-    return "\n\n".join(lines)
+    header = f"Hakutulos: {total} osumaa (näytetään {len(raw)})\n"
+    return respond(header, results, memory["index"].genre_map, format, ref=ref_fi)
 
 
-async def search_person(query: str) -> str:
+async def search_person(query: str, locale: str | None = None, format: str | None = None) -> str | dict[str, Any]:
     """
     Hae henkilöä nimellä (näyttelijä, ohjaaja, käsikirjoittaja...).
     query: hakusana
+    locale: tunnettujen teosten nimien kieli, esim. 'fi' tai 'en'
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
+    try:
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
     params = {
-        "api_key": TMDB_API_KEY,
         "query": query,
-        "language": "en",
+        "language": lang,
         "include_adult": False,
         "page": 1,
     }
 
     async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}/search/person", params=params)
-        r.raise_for_status()
-        data = r.json()
+        data = await get_json(client, "/search/person", params, shape=Page)
 
-    results = data.get("results", [])
+    results = [Person.from_tmdb(p) for p in data.get("results", [])]
+    await apply_fallback([t for p in results for t in p.known_for], lang)
     total = data.get("total_results", 0)
 
     if not results:
-        return f"Ei tuloksia haulle '{query}'."
-
-    lines = [f"Hakutulos: {total} osumaa (näytetään {len(results)})\n"]
-    for person in results:
-        pid = person.get("id")
-        name = person.get("name", "?")
-        dept = person.get("known_for_department", "")
-        known_for = person.get("known_for", [])
-
-        known_titles = []
-        for item in known_for[:3]:
-            title = item.get("title") or item.get("name") or "?"
-            year = (item.get("release_date") or item.get("first_air_date") or "")[:4]
-            known_titles.append(f"{title} ({year})" if year else title)
-
-        lines.append(
-            f"[{pid}] {name}" + (f" — {dept}" if dept else "") + "\n"
-            f"  Tunnettu: {', '.join(known_titles) or '-'}"
-        )
+        return message(f"Ei tuloksia haulle '{query}'.", format)
 
-    return "\n\n".join(lines)
+    header = f"Hakutulos: {total} osumaa (näytetään {len(results)})\n"
+    return respond(header, results, memory["index"].genre_map, format)
 
 
-async def get_person(id: int) -> str:
+async def get_person(id: int, locale: str | None = None, format: str | None = None) -> str | dict[str, Any]:
     """
     Hae henkilön tiedot ja tärkeimmät roolit TMDB-id:llä.
     id: TMDB-id (saadaan search_person-hausta)
+    locale: elämäkerran ja teosten nimien kieli, esim. 'fi' tai 'en' (puuttuva elämäkerta englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
-    params = {"api_key": TMDB_API_KEY, "language": "en", "append_to_response": "combined_credits"}
+    try:
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
+    params = {"language": lang, "append_to_response": "combined_credits"}
 
     async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}/person/{id}", params=params)
-        r.raise_for_status()
-
-    d = r.json()
+        d = await get_json(client, f"/person/{id}", params, shape=PersonDetails)
+        if not d.get("biography") and lang != FALLBACK_LANGUAGE:
+            # Elämäkerta puuttuu usein muilla kielillä — varakieli ilman rooleja
+            en = await get_json(client, f"/person/{id}", {"language": FALLBACK_LANGUAGE}, shape=PersonDetails)
+            d["biography"] = en.get("biography") or ""
     credits = d.get("combined_credits", {})
 
     name = d.get("name", "?")
@@ -497,164 +754,123 @@ async def get_person(id: int) -> str:
         bio if bio else None,
     ]
 
-    cast = credits.get("cast", [])
+    cast = [Credit.from_tmdb(c) for c in credits.get("cast", [])]
     seen_ids = set()
     cast_filtered = []
-    for item in sorted(cast, key=lambda x: x.get("vote_count", 0), reverse=True):
-        character = item.get("character") or ""
-        if character.lower().startswith("self"):
+    for c in sorted(cast, key=lambda x: x.vote_count, reverse=True):
+        if c.character.lower().startswith("self"):
             continue
-        item_id = item.get("id")
-        if item_id in seen_ids:
+        if c.id in seen_ids:
             continue
-        seen_ids.add(item_id)
-        cast_filtered.append(item)
+        seen_ids.add(c.id)
+        cast_filtered.append(c)
         if len(cast_filtered) == 10:
             break
 
     if cast_filtered:
         lines += ["", "Tunnetuimmat roolit:"]
-        for item in cast_filtered:
-            title = item.get("title") or item.get("name") or "?"
-            year = (item.get("release_date") or item.get("first_air_date") or "")[:4]
-            character = item.get("character") or ""
-            media = "elokuva" if item.get("media_type") == "movie" else "sarja"
-            item_id = item.get("id")
-            line = f"  [{item_id}] {title}" + (f" ({year})" if year else "") + f" — {media}"
-            if character:
-                line += f", rooli: {character}"
+        for c in cast_filtered:
+            media = "elokuva" if c.media_type == "movie" else "sarja"
+            line = f"  [{c.id}] {c.title}" + (f" ({c.year})" if c.year else "") + f" — {media}"
+            if c.character:
+                line += f", rooli: {c.character}"
             lines.append(line)
 
-    crew = credits.get("crew", [])
-    directing = [c for c in crew if c.get("job") == "Director"]
-    directing_sorted = sorted(directing, key=lambda x: x.get("vote_count", 0), reverse=True)[:5]
+    directing = [Credit.from_tmdb(c) for c in credits.get("crew", []) if c.get("job") == "Director"]
+    directing_sorted = sorted(directing, key=lambda x: x.vote_count, reverse=True)[:5]
     if directing_sorted:
         lines += ["", "Ohjaustöitä:"]
-        for item in directing_sorted:
-            title = item.get("title") or item.get("name") or "?"
-            year = (item.get("release_date") or item.get("first_air_date") or "")[:4]
-            item_id = item.get("id")
-            lines.append(f"  [{item_id}] {title}" + (f" ({year})" if year else ""))
+        for c in directing_sorted:
+            lines.append(f"  [{c.id}] {c.title}" + (f" ({c.year})" if c.year else ""))
+
+    if format == "json":
+        return {
+            "id": id,
+            "name": name,
+            "department": dept or None,
+            "birthday": birthday or None,
+            "deathday": deathday or None,
+            "place_of_birth": place or None,
+            "biography": bio,
+            "cast": [{"id": c.id, "media_type": c.media_type, "title": c.title,
+                      "year": c.year or None, "character": c.character or None} for c in cast_filtered],
+            "directing": [{"id": c.id, "media_type": c.media_type, "title": c.title,
+                           "year": c.year or None} for c in directing_sorted],
+        }
 
     return "\n".join(line for line in lines if line is not None)
 
 
-async def trending(type: str = "all", time_window: str = "week") -> str:
+async def trending(
+    type: str = "all", time_window: str = "week", locale: str | None = None, format: str | None = None,
+) -> str | dict[str, Any]:
     """
     Hae trendaavat elokuvat, sarjat tai henkilöt.
     type: 'movie', 'tv' tai 'all'
     time_window: 'day' tai 'week'
+    locale: nimien ja kuvausten kieli, esim. 'fi' tai 'en' (puuttuva kuvaus englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
-    endpoint = f"/trending/{type}/{time_window}"
-    params = {"api_key": TMDB_API_KEY, "language": "en"}
+    try:
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
+
+    # Taustapäivitetty tilannekuva (snapshots.py, englanniksi), live-haku vain jos se puuttuu tai on vanha
+    snap = await trending_snapshots.get(type, time_window)
+    results = list(snap.results)
+    if lang != FALLBACK_LANGUAGE:
+        # Muu kieli haetaan erikseen (vastausvälimuistissa TRENDING_LOCALE_TTL);
+        # puuttuvat kuvaukset tilannekuvasta ilman uutta kutsua
+        async with httpx.AsyncClient() as client:
+            data = await get_json(client, f"/trending/{type}/{time_window}", {"language": lang}, shape=Page)
+        fallback = results
+        results = parse_results(data.get("results", []), type)
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}{endpoint}", params=params)
-        r.raise_for_status()
-        data = r.json()
+        async def _from_snapshot(language: str) -> list:
+            return fallback
 
-    results = data.get("results", [])
+        await apply_fallback(results, lang, _from_snapshot)
     if not results:
-        return "Ei tuloksia."
+        return message("Ei tuloksia.", format)
 
-    movie_genre_map = {g["id"]: g["name"] for g in memory["movie_genres"]}
-    tv_genre_map = {g["id"]: g["name"] for g in memory["tv_genres"]}
     window_str = "tänään" if time_window == "day" else "tällä viikolla"
+    return respond(f"Trendaavat ({window_str})\n", results, memory["index"].genre_map, format, ref=ref_type)
 
-    lines = [f"Trendaavat ({window_str})\n"]
-    for item in results:
-        media_type = item.get("media_type", type)
-
-        if media_type == "person":
-            pid = item.get("id")
-            name = item.get("name", "?")
-            dept = item.get("known_for_department", "")
-            known_for = item.get("known_for", [])
-            known_titles = [kf.get("title") or kf.get("name") or "?" for kf in known_for[:3]]
-            lines.append(
-                f"[henkilö/{pid}] {name}" + (f" — {dept}" if dept else "") + "\n"
-                f"  Tunnettu: {', '.join(known_titles) or '-'}"
-            )
-            continue
-
-        if media_type == "movie":
-            title = item.get("title", "?")
-            original = item.get("original_title", "")
-            date = item.get("release_date", "")[:4]
-            genre_map = movie_genre_map
-        else:
-            title = item.get("name", "?")
-            original = item.get("original_name", "")
-            date = item.get("first_air_date", "")[:4]
-            genre_map = tv_genre_map
-
-        name_str = title if title == original or not original else f"{title} ({original})"
-        genre_names = [genre_map.get(gid, str(gid)) for gid in item.get("genre_ids", [])]
-        vote = item.get("vote_average", 0)
-        votes = item.get("vote_count", 0)
-        overview = item.get("overview", "")[:150]
-
-        lines.append(
-            f"[{media_type}/{item.get('id')}] {name_str} ({date})\n"
-            f"  Genret: {', '.join(genre_names) or '-'} | {vote:.1f}/10 ({votes} ääntä)\n"
-            f"  {overview}"
-        )
 
-    return "\n\n".join(lines)
-
-
-async def get_recommendations(id: int, type: str = "movie") -> str:
+async def get_recommendations(
+    id: int, type: str = "movie", locale: str | None = None, format: str | None = None,
+) -> str | dict[str, Any]:
     """
     Hae suosituksia elokuvan tai sarjan perusteella.
     id: TMDB-id (saadaan search_by_title- tai get_details-hausta)
     type: 'movie' tai 'tv'
+    locale: nimien ja kuvausten kieli, esim. 'fi' tai 'en' (puuttuva kuvaus englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
+    try:
+        lang = normalize_language(locale)
+    except ValueError as e:
+        return message(str(e), format)
     endpoint = f"/movie/{id}/recommendations" if type == "movie" else f"/tv/{id}/recommendations"
-    params = {"api_key": TMDB_API_KEY, "language": "en", "page": 1}
+    params = {"language": lang, "page": 1}
 
     async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}{endpoint}", params=params)
-        r.raise_for_status()
-        data = r.json()
-
-    results = data.get("results", [])
+        data = await get_json(client, endpoint, params, shape=Page)
+        results = parse_titles(data.get("results", []), type)
+        await apply_fallback(results, lang, _refetch_page(client, endpoint, params, type))
     if not results:
-        return "Ei suosituksia."
+        return message("Ei suosituksia.", format)
 
-    genre_list = memory["movie_genres"] if type == "movie" else memory["tv_genres"]
-    genre_map = {g["id"]: g["name"] for g in genre_list}
+    return respond(f"Suosituksia ({len(results)} kpl)\n", results, memory["index"].genre_map, format)
 
-    lines = [f"Suosituksia ({len(results)} kpl)\n"]
-    for item in results:
-        if type == "movie":
-            title = item.get("title", "?")
-            original = item.get("original_title", "")
-            date = item.get("release_date", "")[:4]
-        else:
-            title = item.get("name", "?")
-            original = item.get("original_name", "")
-            date = item.get("first_air_date", "")[:4]
 
-        name_str = title if title == original or not original else f"{title} ({original})"
-        genre_names = [genre_map.get(gid, str(gid)) for gid in item.get("genre_ids", [])]
-        vote = item.get("vote_average", 0)
-        votes = item.get("vote_count", 0)
-        overview = item.get("overview", "")[:150]
-
-        lines.append(
-            f"[{item.get('id')}] {name_str} ({date})\n"
-            f"  Genret: {', '.join(genre_names) or '-'} | {vote:.1f}/10 ({votes} ääntä)\n"
-            f"  {overview}"
-        )
-
-    return "\n\n".join(lines)
-
-
-async def get_keywords(id: int, type: str = "movie") -> str:
+async def get_keywords(id: int, type: str = "movie", format: str | None = None) -> str | dict[str, Any]:
     """
     Hae elokuvan tai sarjan keywordit TMDB-id:llä.
     id: TMDB-id (saadaan search_by_title- tai get_details-hausta)
     type: 'movie' tai 'tv'
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
     if type == "movie":
         endpoint = f"/movie/{id}/keywords"
@@ -664,19 +880,16 @@ async def get_keywords(id: int, type: str = "movie") -> str:
         field = "results"
 
     async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TMDB_BASE}{endpoint}", params={"api_key": TMDB_API_KEY})
-        r.raise_for_status()
-        data = r.json()
+        data = await get_json(client, endpoint, shape=KeywordList)
 
     keywords = data.get(field, [])
     if not keywords:
-        return "Ei keywordejä."
+        return message("Ei keywordejä.", format)
 
-    for kw in keywords:
-        name = kw.get("name", "").lower()
-        kw_id = str(kw.get("id", ""))
-        if name and kw_id:
-            memory["keyword_cache"][name] = kw_id
+    remember_keywords(keywords)
+
+    if format == "json":
+        return {"keywords": keywords}
 
     lines = [f"Keywordit ({len(keywords)} kpl):"]
     lines += [f"  [{kw['id']}] {kw['name']}" for kw in keywords]
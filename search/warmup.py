@@ -0,0 +1,161 @@
+"""Välimuistien lämmitys uudelleenkäynnistyksen jälkeen.
+
+Toistetaan kyselylokin (query_log.jsonl) yleisimmät kyselyt route():n läpi ja
+yleisimmät teosnimet search_by_title():n läpi. Kysely täyttää intent-välimuistin
+ja TMDB-vastausvälimuistin, nimihaku avainsana- ja hakutulosvälimuistin.
+Vanhempi historia luetaan debug.log:n INTENT-lohkoista (vain teosnimet).
+
+Tahti on rajattu (rate kutsua sekunnissa), ettei lämmitys kilpaile oikeiden
+käyttäjien kanssa luokittelijasta ja TMDB-kiintiöstä.
+
+Palvelimessa lämmitys ajetaan taustalla heti muistin latauksen jälkeen
+(TMDB_WARMUP=N). Välimuistit ovat prosessin omia, joten CLI lämmittää vain
+oman prosessinsa — sillä kokeillaan mitä toistettaisiin ja kauanko se kestää:
+
+  uv run python -m search.warmup --top 50 --rate 1
+  uv run python -m search.warmup --dry-run
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+from collections import Counter
+
+from . import memory as _memory_module
+from .memory import _LOG_FILE, _log, load_memory
+
+WARMUP_TOP = int(os.getenv("TMDB_WARMUP", "0"))
+WARMUP_RATE = float(os.getenv("TMDB_WARMUP_RATE", "1.0"))
+
+# debug.log: "[LOG] INTENT (postprocess jälkeen)" + reunaviiva + JSON seuraavaan lohkoon asti
+_INTENT_BLOCK = re.compile(r"\[LOG\] INTENT \(postprocess jälkeen\)\n─+\n(\{.*?\n\})\n", re.S)
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _read_query_log(path: str) -> list[dict]:
+    rows = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # keskeneräinen rivi kaatuneelta prosessilta
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def _media_type(value: str | None) -> str:
+    """search_by_title tuntee vain movie/tv — muu (all, puuttuva) haetaan elokuvana."""
+    return value if value in ("movie", "tv") else "movie"
+
+
+def _titles_from_debug_log(path: str) -> list[tuple[str, str]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return []
+    titles = []
+    for block in _INTENT_BLOCK.findall(text):
+        try:
+            intent = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        if intent.get("intent") in ("lookup", "similar_to"):
+            title = intent.get("title") or next(iter(intent.get("reference_titles") or []), None)
+            titles.append((title, _media_type(intent.get("media_type"))))
+    return [(t, m) for t, m in titles if t]
+
+
+def top_queries(n: int, path: str | None = None) -> list[str]:
+    """Yleisimmät kyselyt. Kirjainkoko ja välilyönnit eivät erota kyselyitä;
+    toistetaan ensimmäisenä nähty kirjoitusasu."""
+    counts: Counter[str] = Counter()
+    first: dict[str, str] = {}
+    for row in _read_query_log(path or _memory_module.QUERY_LOG):
+        query = row.get("query")
+        if not query:
+            continue
+        key = _norm(query).lower()
+        counts[key] += 1
+        first.setdefault(key, _norm(query))
+    return [first[k] for k, _ in counts.most_common(n)]
+
+
+def top_titles(n: int, path: str | None = None, debug_log: str | None = None) -> list[tuple[str, str]]:
+    """Yleisimmät (teosnimi, media_type) kyselylokista ja debug.log:n intenteistä.
+    Sama nimi elokuvana ja sarjana on kaksi eri hakua (eri välimuistirivit)."""
+    titles = [
+        (row["title"], _media_type(row.get("media_type")))
+        for row in _read_query_log(path or _memory_module.QUERY_LOG) if row.get("title")
+    ]
+    titles += _titles_from_debug_log(debug_log or _LOG_FILE)
+    counts: Counter[tuple[str, str]] = Counter()
+    first: dict[tuple[str, str], str] = {}
+    for title, media_type in titles:
+        key = (_norm(title).lower(), media_type)
+        counts[key] += 1
+        first.setdefault(key, _norm(title))
+    return [(first[k], k[1]) for k, _ in counts.most_common(n)]
+
+
+async def warm_up(top: int = 50, rate: float = WARMUP_RATE) -> dict:
+    """Toista top kyselyä ja top nimeä. Virheet kirjataan ja jatketaan.
+    Palauttaa {"queries", "titles", "errors"}."""
+    # Import tässä: smart/tools tuovat luokittelijan, jota CLI:n --dry-run ei tarvitse
+    from .smart import route
+    from .tools import search_by_title
+
+    queries = top_queries(top)
+    titles = top_titles(top)
+    interval = 1 / rate if rate > 0 else 0
+    errors = 0
+
+    calls = [lambda q=q: route(q, record=False) for q in queries]
+    calls += [lambda t=t, m=m: search_by_title(t, type=m) for t, m in titles]
+    for i, call in enumerate(calls):
+        if i and interval:
+            await asyncio.sleep(interval)
+        try:
+            await call()
+        except Exception as e:
+            errors += 1
+            _log("WARMUP VIRHE", repr(e))
+
+    _log("WARMUP", f"kyselyitä={len(queries)} nimiä={len(titles)} virheitä={errors}")
+    return {"queries": len(queries), "titles": len(titles), "errors": errors}
+
+
+def start(top: int = WARMUP_TOP, rate: float = WARMUP_RATE) -> asyncio.Task | None:
+    """Käynnistä lämmitys taustalle (server.py:n lifespan). top=0 → ei lämmitystä."""
+    if top <= 0:
+        return None
+    return asyncio.create_task(warm_up(top, rate))
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if args.dry_run:
+        print("Kyselyt:")
+        for q in top_queries(args.top):
+            print(f"  {q}")
+        print("Nimet:")
+        for t, m in top_titles(args.top):
+            print(f"  {t} ({m})")
+        return
+    await load_memory()
+    print(await warm_up(args.top, args.rate))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lämmitä välimuistit kyselylokin perusteella.")
+    parser.add_argument("--top", type=int, default=50, help="montako kyselyä ja nimeä toistetaan")
+    parser.add_argument("--rate", type=float, default=WARMUP_RATE, help="kutsuja sekunnissa")
+    parser.add_argument("--dry-run", action="store_true", help="näytä mitä toistettaisiin")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,26 +1,102 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import weakref
+from collections import defaultdict
 from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
 from mcp.server.fastmcp import FastMCP
+from mcp.server.session import ServerSession
+from mcp.types import CallToolResult, TextContent
+from pydantic import AnyUrl
 
-from search.memory import load_memory
+from search.memory import load_memory, memory
 from search.prompts import SmartSearchIntent
-from search.classifier import save_example
+from search.examples import save_example
 from search import tools
 from search.smart import route
+from search.format import to_records
+from search.snapshots import TYPES, WINDOWS, Snapshot, trending_snapshots, trending_uri
+from search import breaker, llm, shared_cache, warmup
+
+# HTTP-kuljetus (--transport http): osoite, workerit ja tilaton tila
+HTTP_HOST = os.getenv("TMDB_HTTP_HOST", "127.0.0.1")
+HTTP_PORT = int(os.getenv("TMDB_HTTP_PORT", "8000"))
+WORKERS = int(os.getenv("TMDB_WORKERS", "1"))
+# Usealla workerilla pyynnöt eivät osu samaan prosessiin — istuntoa ei voi pitää muistissa
+STATELESS = os.getenv("TMDB_HTTP_STATELESS", "") == "1"
 
 
 @asynccontextmanager
-async def lifespan(app):
+async def services():
+    """Prosessin palvelut: jaettu välimuisti, muisti, trendien päivitys, esilataus ja lämmitys.
+    Usealla workerilla taustatyöt tekee vain johtaja (shared_cache.is_leader) — muuten
+    TMDB-kuorma kerrottuisi workerien määrällä. Muut tuovat DSPy:n ensimmäisellä kutsulla
+    ja hakevat trendit itse vasta kun niitä kysytään."""
+    shared_cache.attach(memory)
+    leader = shared_cache.is_leader()
     await load_memory()
-    yield
+    if leader:
+        trending_snapshots.start()
+    # DSPy tuodaan taustalla: työkalulista on valmis ennen kuin kielimallipino on ladattu
+    preloading = llm.preload() if leader else None
+    # Lämmitys taustalla: palvelin ottaa kutsuja vastaan jo lämmityksen aikana
+    warming = warmup.start() if leader else None
+    try:
+        yield
+    finally:
+        for task in (preloading, warming):
+            if task:
+                task.cancel()
+        await trending_snapshots.stop()
+        shared_cache.detach(memory)
+
+
+# True kun HTTP-sovellus käynnisti palvelut itse (http_app)
+_app_services = False
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """MCP-palvelimen elinkaari. stdio: yksi istunto on koko prosessi. HTTP:ssä SDK
+    ajaa tämän jokaiselle istunnolle (tilattomana jokaiselle pyynnölle), joten
+    palvelut käynnistää sovelluksen oma elinkaari (http_app)."""
+    if _app_services:
+        yield
+        return
+    async with services():
+        yield
 
 
 mcp = FastMCP("tmdb", lifespan=lifespan)
 
+
+def _structured(fn):
+    """format='json' → dict palautetaan MCP:n rakenteisena vastauksena (structuredContent)
+    ja tiiviinä JSON-tekstinä asiakkaille jotka eivät lue rakenteista osaa."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        result = await fn(*args, **kwargs)
+        if isinstance(result, dict):
+            return CallToolResult(
+                content=[TextContent(type="text", text=json.dumps(result, ensure_ascii=False, separators=(",", ":")))],
+                structuredContent={"result": result},
+            )
+        return result
+    return wrapper
+
+
 for _fn in [
     tools.list_genres,
     tools.list_certifications,
     tools.search_by_title,
     tools.get_details,
+    tools.get_details_many,
+    tools.filter_by_provider,
     tools.list_watch_providers,
     tools.discover,
     tools.search_multi,
@@ -30,17 +106,113 @@ for _fn in [
     tools.get_recommendations,
     tools.get_keywords,
 ]:
-    mcp.tool()(_fn)
+    mcp.tool()(_structured(_fn))
 
 
 @mcp.tool()
-async def smart_search(query: str) -> str:
+@_structured
+async def smart_search(
+    query: str, region: str | None = None, locale: str | None = None, format: str | None = None,
+) -> str | dict[str, Any]:
     """
     Hae elokuvia, sarjoja tai henkilöitä luonnollisella kielellä.
     Tulkitsee kyselyn automaattisesti ja reitittää oikeaan hakuun.
     query: hakukysely suomeksi tai englanniksi
+    region: katselupalvelujen maa, esim. 'SE' (oletus FI)
+    locale: nimien ja kuvausten kieli, esim. 'fi' tai 'en' (puuttuva kuvaus englanniksi)
+    format: 'text' (oletus), 'compact' tai 'json' (rakenteinen vastaus)
     """
-    return await route(query)
+    return await route(query, format=format, region=region, locale=locale)
+
+
+# ─────────────────────────────────────────────────────────────
+# Trendaavat resursseina: tmdb://trending/{type}/{time_window}
+# Asiakas voi tilata resurssin (resources/subscribe) ja saa
+# resources/updated-ilmoituksen kun taustapäivitys muuttaa listaa.
+# ─────────────────────────────────────────────────────────────
+
+def _trending_resource(type: str, time_window: str):
+    async def read() -> str:
+        snap = await trending_snapshots.get(type, time_window)
+        data = {
+            "type": type,
+            "time_window": time_window,
+            "results": to_records(snap.results, memory["index"].genre_map),
+        }
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return read
+
+
+for _type in TYPES:
+    for _window in WINDOWS:
+        mcp.resource(
+            trending_uri(_type, _window),
+            name=f"trending-{_type}-{_window}",
+            description=f"Trendaavat ({_type}, {_window}) — päivittyy taustalla, tilattavissa",
+            mime_type="application/json",
+        )(_trending_resource(_type, _window))
+
+
+_subscribers: defaultdict[str, weakref.WeakSet[ServerSession]] = defaultdict(weakref.WeakSet)
+
+
+@mcp._mcp_server.subscribe_resource()
+async def _subscribe(uri: AnyUrl) -> None:
+    _subscribers[str(uri)].add(mcp._mcp_server.request_context.session)
+
+
+@mcp._mcp_server.unsubscribe_resource()
+async def _unsubscribe(uri: AnyUrl) -> None:
+    _subscribers[str(uri)].discard(mcp._mcp_server.request_context.session)
+
+
+async def _notify_subscribers(snap: Snapshot) -> None:
+    for session in list(_subscribers.get(snap.uri, ())):
+        try:
+            await session.send_resource_updated(AnyUrl(snap.uri))
+        except Exception:
+            # Yhteys katkennut → tilaus pois
+            _subscribers[snap.uri].discard(session)
+
+
+trending_snapshots.on_change(_notify_subscribers)
+
+# SDK ilmoittaa aina subscribe=False — tilaukset ovat tuettuja kun käsittelijä on rekisteröity
+_get_capabilities = mcp._mcp_server.get_capabilities
+
+
+def _capabilities_with_subscribe(*args, **kwargs):
+    caps = _get_capabilities(*args, **kwargs)
+    if caps.resources is not None:
+        caps.resources.subscribe = True
+    return caps
+
+
+mcp._mcp_server.get_capabilities = _capabilities_with_subscribe
+
+
+# ─────────────────────────────────────────────────────────────
+# Metriikat: katkaisijoiden tila, LLM-tokenit, välimuistien koot
+# ─────────────────────────────────────────────────────────────
+
+def metrics() -> dict[str, Any]:
+    return {
+        "worker": os.getpid(),
+        "breakers": breaker.states(),
+        "llm_usage": llm.usage_stats(),
+        "caches": {
+            name: memory[name].stats()
+            for name in ("response_cache", "intent_cache", "details_cache", "text_cache", "region_cache",
+                         "keyword_cache")
+        },
+        "shared_cache": shared_cache.stats(),
+    }
+
+
+@mcp.resource("tmdb://metrics", name="metrics", mime_type="application/json",
+              description="Katkaisijoiden tila (TMDB per polku, LLM), tokenit ja välimuistien koot")
+async def metrics_resource() -> str:
+    return json.dumps(metrics(), ensure_ascii=False, separators=(",", ":"))
 
 
 @mcp.tool()
@@ -53,11 +225,58 @@ async def add_training_example(query: str, correct_intent_json: str) -> str:
     """
     try:
         intent = SmartSearchIntent.model_validate_json(correct_intent_json)
-        save_example(query, intent)
+        # Lukko + fsync: ei tapahtumasilmukassa
+        await asyncio.to_thread(save_example, query, intent)
         return f"Esimerkki tallennettu: {query!r}"
     except Exception as e:
         return f"Virhe: {e}"
 
 
+# ─────────────────────────────────────────────────────────────
+# HTTP-kuljetus: uvicorn-workerit, jokaisessa oma tapahtumasilmukka
+# ─────────────────────────────────────────────────────────────
+
+def http_app():
+    """Streamable HTTP -sovellus (uvicornin factory). Palvelut käynnistetään kerran
+    per prosessi sovelluksen elinkaaressa, ei MCP-istunnoittain."""
+    global _app_services
+    _app_services = True
+    mcp.settings.stateless_http = STATELESS
+    app = mcp.streamable_http_app()
+    session_manager = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def app_lifespan(app):
+        async with services(), session_manager(app):
+            yield
+
+    app.router.lifespan_context = app_lifespan
+    return app
+
+
+def serve_http(host: str = HTTP_HOST, port: int = HTTP_PORT, workers: int = WORKERS) -> None:
+    """Usealla workerilla: tilaton HTTP ja jaettu SQLite-välimuisti (shared_cache.py).
+    Asetukset välitetään workereille ympäristömuuttujina — ne tuovat tämän moduulin itse."""
+    import uvicorn
+
+    if workers > 1:
+        os.environ["TMDB_HTTP_STATELESS"] = "1"
+        os.environ.setdefault("TMDB_SHARED_CACHE", str(shared_cache.DEFAULT_PATH))
+        uvicorn.run("server:http_app", factory=True, app_dir=str(Path(__file__).parent),
+                    host=host, port=port, workers=workers, log_level=mcp.settings.log_level.lower())
+    else:
+        uvicorn.run(http_app(), host=host, port=port, log_level=mcp.settings.log_level.lower())
+
+
 if __name__ == "__main__":
-    mcp.run()
+    parser = argparse.ArgumentParser(description="TMDB MCP -palvelin.")
+    parser.add_argument("--transport", choices=("stdio", "http"), default="stdio")
+    parser.add_argument("--host", default=HTTP_HOST)
+    parser.add_argument("--port", type=int, default=HTTP_PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="HTTP-workerprosessit (oletus TMDB_WORKERS tai 1)")
+    args = parser.parse_args()
+    if args.transport == "http":
+        serve_http(args.host, args.port, args.workers)
+    else:
+        mcp.run()
@@ -0,0 +1,65 @@
+# conftest.py — yhteiset fixturet
+#
+# Vastaus- ja intent-välimuisti sekä katkaisijat ovat prosessinlaajuisia: tyhjennetään ne
+# jokaisen testin alussa, jotta pyyntöjä laskevat testit eivät näe toistensa
+# vastauksia. Kyselyloki ja paikallinen intent-malli ohjataan testin omaan
+# hakemistoon (opetettu data/intent_model.json ei saa muuttaa route-testejä).
+#
+# tmdb_routes: httpx.AsyncClient korvataan MockTransport-asiakkaalla, joka vastaa
+# testitiedoston omasta reittitaulusta — ei API-kutsuja.
+
+import inspect
+import json
+
+import httpx
+import pytest
+
+from search import breaker, intent_model
+from search import memory as memory_module
+from search.memory import memory
+
+
+@pytest.fixture(autouse=True)
+def _tyhjat_valimuistit(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory_module, "QUERY_LOG", str(tmp_path / "query_log.jsonl"))
+    monkeypatch.setattr(intent_model, "MODEL_FILE", tmp_path / "intent_model.json")
+    memory["response_cache"].clear()
+    memory["intent_cache"].clear()
+    memory["region_cache"].clear()
+    memory["text_cache"].clear()
+    breaker.reset()
+    yield
+
+
+@pytest.fixture
+def tmdb_routes(monkeypatch):
+    """Asenna reittitaulu: tmdb_routes(routes, record=...) → lista kutsuista.
+
+    routes: polku → JSON-runko tai funktio(request), joka palauttaa rungon tai
+    httpx.Responsen (saa olla async). "/"-loppuinen polku kattaa kaikki alapolut.
+    Tuntematon polku → 404. record(request) määrää mitä kutsusta kirjataan
+    (oletuksena polku)."""
+    real = httpx.AsyncClient
+
+    def install(routes: dict, record=lambda request: request.url.path) -> list:
+        calls = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(record(request))
+            path = request.url.path
+            route = routes.get(path)
+            if route is None:
+                route = next((r for p, r in routes.items() if p.endswith("/") and path.startswith(p)), None)
+            if route is None:
+                return httpx.Response(404, content=b"{}")
+            body = route(request) if callable(route) else route
+            if inspect.isawaitable(body):
+                body = await body
+            if isinstance(body, httpx.Response):
+                return body
+            return httpx.Response(200, content=json.dumps(body).encode())
+
+        monkeypatch.setattr(httpx, "AsyncClient", lambda: real(transport=httpx.MockTransport(handler)))
+        return calls
+
+    return install
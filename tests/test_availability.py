@@ -0,0 +1,121 @@
+# test_availability.py — katselupalveluindeksi ja filter_by_provider
+#
+# Ei API-kutsuja: reitit vastaavat conftest.py:n tmdb_routes-fixturesta.
+#
+# Aja: uv run pytest tests/test_availability.py -v
+
+import pytest
+
+from search import tools
+from search.availability import WATCH_REGION, AvailabilityIndex, availability_for, streaming_names
+from search.memory import build_index, memory
+
+
+def providers(*names, kind="flatrate"):
+    return {"results": {"FI": {kind: [{"provider_id": i, "provider_name": n} for i, n in enumerate(names)]}}}
+
+
+ROUTES = {
+    "/3/movie/1/watch/providers": providers("Netflix"),
+    "/3/movie/2/watch/providers": providers("Yle Areena", "Netflix"),
+    "/3/movie/3/watch/providers": providers("Apple TV", kind="rent"),
+    "/3/discover/movie": {"page": 1, "total_pages": 1, "total_results": 2,
+                          "results": [{"id": 7, "title": "A"}, {"id": 8, "title": "B"}]},
+}
+
+
+@pytest.fixture
+def calls(tmdb_routes, monkeypatch):
+    calls = tmdb_routes(ROUTES)
+    monkeypatch.setitem(memory, "index", build_index({"movie_providers": [
+        {"provider_id": 8, "provider_name": "Netflix"},
+        {"provider_id": 323, "provider_name": "Yle Areena"},
+    ]}))
+    availability_for(WATCH_REGION)._cache.clear()
+    return calls
+
+
+# ─────────────────────────────────────────────────────────────
+# Indeksi
+# ─────────────────────────────────────────────────────────────
+
+def test_vuokraus_ei_ole_suoratoistoa():
+    region = providers("Netflix")["results"]["FI"] | providers("Apple TV", kind="rent")["results"]["FI"]
+    assert streaming_names(region) == {"Netflix"}
+
+
+def test_osittainen_tieto_riittaa_positiiviseen():
+    idx = AvailabilityIndex()
+    idx.add("movie", [1], "Netflix")
+    assert idx.answers("movie", 1, frozenset({"Netflix"}))
+    assert not idx.answers("movie", 1, frozenset({"Yle Areena"}))   # voi silti olla Areenassa
+    assert not idx.answers("movie", 1, None)
+    idx.set("movie", 1, ["Netflix"])
+    assert idx.answers("movie", 1, frozenset({"Yle Areena"}))       # koko lista tiedossa
+
+
+# ─────────────────────────────────────────────────────────────
+# filter_by_provider
+# ─────────────────────────────────────────────────────────────
+
+async def test_suodatus_palvelun_mukaan(calls):
+    data = await tools.filter_by_provider([1, 2, 3, 1, 404], providers=["areena", "netflix"], format="json")
+    assert data["results"] == [{"id": 1, "providers": ["Netflix"]},
+                               {"id": 2, "providers": ["Netflix", "Yle Areena"]}]
+    assert data["not_available"] == [3]
+    assert data["unknown"] == [404]
+
+
+async def test_toinen_kutsu_indeksista(calls):
+    await tools.filter_by_provider([1, 2])
+    n = len(calls)
+    out = await tools.filter_by_provider([1, 2], providers=["Netflix"])
+    assert len(calls) == n
+    assert "2/2 teosta" in out
+
+
+async def test_discover_tayttaa_indeksin(calls):
+    await tools.discover(watch_provider="Netflix", min_votes=0)
+    data = await tools.filter_by_provider([7, 8], providers=["Netflix"], format="json")
+    assert [r["id"] for r in data["results"]] == [7, 8]
+    assert not any("watch/providers" in c for c in calls)
+
+
+async def test_tuntematon_palvelu(calls):
+    out = await tools.filter_by_provider([1], providers=["Betamax"])
+    assert "Tuntematon suoratoistopalvelu" in out
+
+
+# ─────────────────────────────────────────────────────────────
+# Monen palvelun discover: yksi OR-haku + paikallinen ryhmittely
+# ─────────────────────────────────────────────────────────────
+
+async def test_monta_palvelua_yksi_haku(calls, monkeypatch):
+    seen_params = []
+    real_collect = tools.collect_titles
+
+    async def spy(client, endpoint, params, *args, **kwargs):
+        seen_params.append(dict(params))
+        return await real_collect(client, endpoint, params, *args, **kwargs)
+
+    monkeypatch.setattr(tools, "collect_titles", spy)
+    availability_for(WATCH_REGION).set("movie", 7, ["Yle Areena"])
+    data = await tools.discover(watch_provider=["Netflix", "areena"], min_votes=0, format="json")
+
+    assert calls.count("/3/discover/movie") == 1
+    assert seen_params[0]["with_watch_providers"] == "8|323"
+    sections = {s["watch_provider"]: [r["id"] for r in s["results"]] for s in data["sections"]}
+    assert sections == {"Yle Areena": [7], "Netflix tai Yle Areena": [8]}
+
+
+async def test_raja_koskee_jokaista_palveluosiota(tmdb_routes, calls):
+    page = {"page": 1, "total_pages": 1, "total_results": 4,
+            "results": [{"id": i, "title": f"T{i}"} for i in (7, 8, 9, 10)]}
+    tmdb_routes({**ROUTES, "/3/discover/movie": page})
+    index = availability_for(WATCH_REGION)
+    for id in (7, 8, 9):
+        index.set("movie", id, ["Netflix"])
+    data = await tools.discover(watch_provider=["Netflix", "areena"], min_votes=0, limit=2, format="json")
+
+    sections = {s["watch_provider"]: [r["id"] for r in s["results"]] for s in data["sections"]}
+    assert sections == {"Netflix": [7, 8], "Netflix tai Yle Areena": [10]}
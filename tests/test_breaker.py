@@ -0,0 +1,171 @@
+# test_breaker.py — katkaisijat TMDB:lle ja kielimallille, vanhentunut välimuisti varana
+#
+# Ei API-kutsuja: conftestin tmdb_routes simuloi alhaalla olevan TMDB:n.
+#
+# Aja: uv run pytest tests/test_breaker.py -v
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from search import breaker, llm
+from search.breaker import CLOSED, HALF_OPEN, OPEN, CircuitOpen, tmdb_family
+from search.decode import Page
+from search.memory import _norm_query, memory
+from search.prompts import SmartSearchIntent
+from search.tmdb import get_json
+
+PAGE = json.dumps({"page": 1, "total_pages": 1, "total_results": 1,
+                   "results": [{"id": 1, "title": "Vanha"}]}).encode()
+
+
+@pytest.fixture
+def tmdb_status(tmdb_routes):
+    """Jokainen TMDB-polku vastaa samalla statuksella: tmdb_status(503) → lista kutsuista."""
+    def install(status: int) -> list:
+        body = PAGE if status == 200 else b'{"status_message":"x"}'
+        return tmdb_routes({"/3/": lambda request: httpx.Response(status, content=body)})
+    return install
+
+
+# ─────────────────────────────────────────────────────────────
+# Katkaisijan tilat
+# ─────────────────────────────────────────────────────────────
+
+def test_aukeaa_virheosuudesta_ja_torjuu():
+    b = breaker.breaker("testi")
+    for ok in (True, False, True, False):
+        b.record(ok)
+    assert b.state == CLOSED  # alle MIN_CALLS kutsua
+    b.record(False)
+    assert b.state == OPEN and b.trips == 1
+    assert not b.allow()
+    assert breaker.states()["testi"]["rejected"] == 1
+
+
+def test_puoliauki_yksi_koekutsu(monkeypatch):
+    monkeypatch.setattr(breaker, "COOLDOWN", 60)
+    b = breaker.breaker("testi")
+    b._open()
+    b._opened_at -= 61
+    assert b.allow() and b.state == HALF_OPEN
+    assert not b.allow()  # toinen odottaa koekutsun tulosta
+    b.record(False)
+    assert b.state == OPEN and b.trips == 2
+    b._opened_at -= 61
+    assert b.allow()
+    b.record(True)
+    assert b.state == CLOSED and b.allow()
+
+
+def test_polun_alku():
+    assert tmdb_family("/search/movie") == "tmdb:search"
+    assert tmdb_family("/movie/603/credits") == "tmdb:movie"
+    assert tmdb_family("/discover/tv") == "tmdb:discover"
+
+
+# ─────────────────────────────────────────────────────────────
+# TMDB
+# ─────────────────────────────────────────────────────────────
+
+async def test_vanhentunut_rivi_palautetaan_kun_tmdb_alhaalla(tmdb_status):
+    key = ("/search/movie", (("query", "vanha"),))
+    memory["response_cache"].set(key, PAGE, ttl=-1)
+    calls = tmdb_status(503)
+    async with httpx.AsyncClient() as client:
+        data = await get_json(client, "/search/movie", {"query": "vanha"}, shape=Page)
+    assert data["results"][0]["title"] == "Vanha"
+    assert len(calls) == 1
+
+
+async def test_auki_katkaisija_ei_kutsu_tmdb(tmdb_status):
+    calls = tmdb_status(500)
+    async with httpx.AsyncClient() as client:
+        for i in range(breaker.MIN_CALLS):
+            with pytest.raises(httpx.HTTPStatusError):
+                await get_json(client, "/discover/movie", {"page": i})
+        assert breaker.states()["tmdb:discover"]["state"] == OPEN
+        with pytest.raises(CircuitOpen):
+            await get_json(client, "/discover/movie", {"page": 99})
+        # raise_for_status=False -kutsuja saa tyhjän vastauksen
+        assert await get_json(client, "/discover/movie", {"page": 98}, shape=Page, raise_for_status=False) == {}
+        # muut polut toimivat omalla katkaisijallaan
+        with pytest.raises(httpx.HTTPStatusError):
+            await get_json(client, "/search/movie", {"query": "x"})
+    assert len(calls) == breaker.MIN_CALLS + 1
+
+
+async def test_404_ei_laukaise(tmdb_status):
+    tmdb_status(404)
+    async with httpx.AsyncClient() as client:
+        for i in range(breaker.MIN_CALLS + 2):
+            await get_json(client, f"/movie/{i}", raise_for_status=False)
+    assert breaker.states()["tmdb:movie"]["state"] == CLOSED
+
+
+async def test_verkkovirhe_laukaisee(tmdb_routes):
+    def unreachable(request):
+        raise httpx.ConnectError("ei yhteyttä")
+
+    tmdb_routes({"/3/search/": unreachable})
+    async with httpx.AsyncClient() as client:
+        for i in range(breaker.MIN_CALLS - 1):
+            with pytest.raises(httpx.ConnectError):
+                await get_json(client, "/search/tv", {"query": i})
+        # raise_for_status=False: tyhjä vastaus kuten muillekin epäonnistuneille hauille
+        assert await get_json(client, "/search/tv", {"query": "x"}, raise_for_status=False) == {}
+    assert breaker.states()["tmdb:search"]["state"] == OPEN
+
+
+# ─────────────────────────────────────────────────────────────
+# Kielimalli
+# ─────────────────────────────────────────────────────────────
+
+async def test_llm_virheet_avaavat_katkaisijan_ja_vara_kaytetaan(monkeypatch):
+    calls = []
+
+    async def failing(query, memory, fast=False):
+        calls.append(query)
+        raise RuntimeError("503 palvelu alhaalla")
+
+    monkeypatch.setattr(llm, "_module", lambda name: asyncio.sleep(0, result=SimpleNamespace(classify_query=failing)))
+    for _ in range(breaker.MIN_CALLS + 3):
+        intent = await llm.classify_query("trendaavat sarjat", {})
+        assert intent.intent == "trending" and intent.source == "heuristic"
+    assert len(calls) == breaker.MIN_CALLS
+    assert breaker.states()["llm"]["state"] == OPEN
+
+
+async def test_valimuistin_intent_ei_ole_llm_kutsu(monkeypatch):
+    calls = []
+
+    async def failing(query, memory, fast=False):
+        calls.append(query)
+        raise RuntimeError("503 palvelu alhaalla")
+
+    monkeypatch.setattr(llm, "_module", lambda name: asyncio.sleep(0, result=SimpleNamespace(classify_query=failing)))
+    cached = SmartSearchIntent(intent="discover", media_type="movie", genres=["Kauhu"])
+    memory["intent_cache"].set(_norm_query("Hyviä  kauhuleffoja"), cached)
+    for _ in range(breaker.MIN_CALLS):
+        await llm.classify_query("hyviä kauhuleffoja", {})
+    assert calls == []
+    assert "llm" not in breaker.states()  # osumat eivät kirjaudu katkaisijalle
+
+    for _ in range(breaker.MIN_CALLS):
+        await llm.classify_query("trendaavat sarjat", {})
+    assert breaker.states()["llm"]["state"] == OPEN
+    intent = await llm.classify_query("hyviä kauhuleffoja", {})  # auki, silti välimuistista
+    assert intent.genres == ["Kauhu"] and intent is not cached
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_metriikat_nayttavat_katkaisijat():
+    import server
+
+    breaker.breaker("tmdb:search").record(True)
+    data = server.metrics()
+    assert data["breakers"]["tmdb:search"]["state"] == CLOSED
+    assert "llm_usage" in data and "response_cache" in data["caches"]
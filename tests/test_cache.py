@@ -0,0 +1,111 @@
+# test_cache.py — TTLCache: vanheneminen, LRU, tavukirjanpito ja lukko
+#
+# Kello korvataan monkeypatchilla, joten vanheneminen testataan odottamatta.
+#
+# Aja: uv run pytest tests/test_cache.py -v
+
+import threading
+
+import pytest
+
+from search.cache import TTLCache, sizeof
+from search.memory import memory
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("search.cache.time.monotonic", lambda: clock[0])
+    return clock
+
+
+# ─────────────────────────────────────────────────────────────
+# Vanheneminen ja LRU
+# ─────────────────────────────────────────────────────────────
+
+def test_ttlcache_vanhenee_ja_rajaa_koon(now):
+    c = TTLCache(maxsize=2, ttl=10)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")          # a tuoreimmaksi
+    c.set("c", 3)       # b putoaa pois
+    assert "b" not in c and c.get("a") == 1
+    now[0] += 11
+    assert c.get("a") is None
+
+
+def test_rivikohtainen_kesto(now):
+    c = TTLCache(maxsize=10, ttl=10)
+    c.set("lyhyt", 1, ttl=1)
+    c.set("pitka", 2)
+    now[0] += 2
+    assert c.get("lyhyt") is None and c.get("pitka") == 2
+
+
+def test_get_entry_palauttaa_vanhentuneen_varaksi(now):
+    c = TTLCache(maxsize=10, ttl=10)
+    assert c.get_entry("a") is None
+    c.set("a", "x")
+    assert c.get_entry("a") == ("x", True)
+    now[0] += 11
+    assert c.get_entry("a") == ("x", False)
+    assert c.get_entry("a") == ("x", False)  # ei poistettu
+    assert c.get("a") is None and c.get_entry("a") is None  # get poistaa
+
+
+# ─────────────────────────────────────────────────────────────
+# Tavukirjanpito
+# ─────────────────────────────────────────────────────────────
+
+def test_ttlcache_laskee_tavut_ja_rajaa_niilla():
+    c = TTLCache(maxsize=100, ttl=10, maxbytes=sizeof("a", b"x" * 100) * 2)
+    c.set("a", b"x" * 100)
+    c.set("b", b"x" * 100)
+    assert c.stats() == {"entries": 2, "bytes": c.maxbytes}
+    c.set("a", b"x" * 100)       # korvaus ei laske kahdesti
+    assert len(c) == 2
+    c.set("c", b"x" * 100)       # b on vanhin → pois
+    assert "b" not in c and c.nbytes <= c.maxbytes
+    c.clear()
+    assert c.stats() == {"entries": 0, "bytes": 0}
+
+
+def test_ttlcache_vanhentunut_vapauttaa_tavut(now):
+    c = TTLCache(maxsize=10, ttl=10)
+    c.set("a", "x")
+    now[0] += 11
+    assert c.get("a") is None and c.nbytes == 0
+
+
+def test_liian_suuri_rivi_ei_jaa():
+    c = TTLCache(maxsize=10, ttl=10, maxbytes=sizeof("a", "x") * 2)
+    c.set("a", "x")
+    c.set("iso", "x" * 1000)
+    assert len(c) == 0 and c.nbytes == 0
+
+
+def test_keyword_cache_on_rajattu():
+    cache = memory["keyword_cache"]
+    assert isinstance(cache, TTLCache)
+    assert cache.maxsize > 0 and cache.maxbytes > 0
+
+
+# ─────────────────────────────────────────────────────────────
+# Säikeet
+# ─────────────────────────────────────────────────────────────
+
+def test_samanaikaiset_kirjoitukset_pitavat_kirjanpidon():
+    c = TTLCache(maxsize=50, ttl=60)
+
+    def writer(n):
+        for i in range(500):
+            c.set((n, i % 80), "x" * (i % 7))
+            c.get((n, (i * 3) % 80))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert len(c) == 50
+    assert c.nbytes == sum(size for _, _, size in c._data.values())
@@ -0,0 +1,67 @@
+# test_classifier.py — luokittelijan promptin tiivistys ja tokenikirjanpito
+#
+# Ei LLM-kutsuja: prompti muotoillaan DSPy:n adapterilla ja ennuste korvataan.
+#
+# Aja: uv run pytest tests/test_classifier.py -v
+
+import json
+import time
+from types import SimpleNamespace
+
+import dspy
+
+from search import classifier, llm
+
+MEMORY = {
+    "movie_genres": [{"id": 28, "name": "Toiminta"}, {"id": 18, "name": "Draama"}],
+    "tv_genres": [{"id": 16, "name": "Animaatio"}],
+    "movie_providers": [
+        {"provider_id": 8, "provider_name": "Netflix"},
+        {"provider_id": 323, "provider_name": "Yle Areena"},
+        {"provider_id": 337, "provider_name": "Disney Plus"},
+        {"provider_id": 119, "provider_name": "Amazon Prime Video"},
+    ],
+}
+
+
+def test_vain_mainitut_palvelut_lahetetaan():
+    assert classifier.mentioned_providers("sarjoja Netflixistä", MEMORY) == ["Netflix"]
+    assert classifier.mentioned_providers("jotain areenasta tai primestä", MEMORY) == ["Yle Areena", "Amazon Prime Video"]
+    assert classifier._inputs("hyviä kauhuleffoja", MEMORY)["available_providers"] == "-"
+
+
+def test_kysely_on_promptin_lopussa_ja_alku_pysyy_samana():
+    adapter = dspy.ChatAdapter()
+    a = adapter.format(classifier.QueryClassification, [], classifier._inputs("kuka on tom hanks", MEMORY))
+    b = adapter.format(classifier.QueryClassification, [], classifier._inputs("trendaavat sarjat", MEMORY))
+    assert a[0] == b[0]  # system-viesti (ohje) identtinen
+    user_a, user_b = a[-1]["content"], b[-1]["content"]
+    shared = user_a.index("kuka on tom hanks")
+    assert user_a[:shared] == user_b[:shared]  # genret ja päivä ennen kyselykohtaisia kenttiä
+
+
+def test_tokenit_kirjataan_kutsukohtaisesti_ja_yhteensa(monkeypatch):
+    monkeypatch.setattr(llm, "_usage", {})
+    usage = {"gemini/x": {"prompt_tokens": 900, "completion_tokens": 40,
+                          "prompt_tokens_details": {"cached_tokens": 700}}}
+    prediction = SimpleNamespace(get_lm_usage=lambda: usage)
+
+    row = llm.record_usage("classify", prediction, time.perf_counter())
+    assert (row["prompt_tokens"], row["cached_tokens"], row["completion_tokens"]) == (900, 700, 40)
+    llm.record_usage("classify", SimpleNamespace(get_lm_usage=lambda: None), time.perf_counter())
+
+    stats = llm.usage_stats()["classify"]
+    assert stats["calls"] == 2 and stats["prompt_tokens"] == 900
+    assert stats["avg_prompt_tokens"] == 450
+
+
+def test_vanhan_signatuurin_ohjelmaa_ei_ladata(tmp_path):
+    path = tmp_path / "ohjelma.json"
+    classifier.save_program(dspy.Predict(classifier.QueryClassification), "predict", path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["fields"][-2:] == ["query", "result"]
+    assert classifier.load_program(path) is not None
+
+    data["fields"] = ["query", *data["fields"][:-2], "result"]
+    path.write_text(json.dumps(data), encoding="utf-8")
+    assert classifier.load_program(path) is None
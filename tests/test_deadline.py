@@ -0,0 +1,170 @@
+# test_deadline.py — aikarajat, suojatut kutsut ja paikallinen vara kielimallin tilalle
+#
+# Ei LLM-kutsuja: hitaat kutsut simuloidaan asyncio.sleepillä ja time.sleepillä.
+#
+# Aja: uv run pytest tests/test_deadline.py -v
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from search import breaker, classifier, deadline, llm
+from search.deadline import LatencyWindow, hedged
+from search.models import Title
+from search.prompts import SmartSearchIntent
+
+
+# ─────────────────────────────────────────────────────────────
+# Aikaraja
+# ─────────────────────────────────────────────────────────────
+
+def test_sisempi_raja_ei_pidenna_ulompaa():
+    assert deadline.remaining() is None
+    assert deadline.timeout(8) == 8
+    with deadline.within(1.0):
+        with deadline.within(60):
+            assert deadline.remaining() <= 1.0
+            assert deadline.timeout(8) <= 1.0
+        with deadline.within(0.1):
+            assert deadline.timeout(8) <= 0.1
+    assert deadline.remaining() is None
+
+
+async def test_raja_kulkee_saikeeseen():
+    with deadline.within(5):
+        left = await asyncio.to_thread(deadline.remaining)
+    assert left is not None and 4 < left <= 5
+
+
+def test_suojauskynnys_persentiilista():
+    window = LatencyWindow()
+    assert window.hedge_after() == deadline.HEDGE_DEFAULT
+    for i in range(100):
+        window.add(1.0 + i / 100)
+    assert abs(window.hedge_after(0.9) - 1.9) < 1e-9
+    assert LatencyWindow().percentile(0.5) is None
+
+
+# ─────────────────────────────────────────────────────────────
+# Suojattu kutsu
+# ─────────────────────────────────────────────────────────────
+
+async def test_nopea_kutsu_ei_suojaa():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "ok"
+
+    assert await hedged(call, hedge_after=0.5, limit=2) == ("ok", False)
+    assert len(calls) == 1
+
+
+async def test_hidas_kutsu_suojataan_ja_nopeampi_voittaa():
+    delays = iter([1.0, 0.01])
+
+    async def call():
+        await asyncio.sleep(next(delays))
+        return "tulos"
+
+    started = time.monotonic()
+    assert await hedged(call, hedge_after=0.05, limit=2) == ("tulos", True)
+    assert time.monotonic() - started < 0.5
+
+
+async def test_aikaraja_ylittyy():
+    async def call():
+        await asyncio.sleep(1)
+
+    with pytest.raises(TimeoutError):
+        await hedged(call, hedge_after=0.02, limit=0.05)
+
+
+async def test_virhe_valitetaan():
+    async def call():
+        raise ValueError("rikki")
+
+    with pytest.raises(ValueError):
+        await hedged(call, hedge_after=0.5, limit=1)
+
+
+async def test_luokittelija_suojataan(monkeypatch):
+    delays = iter([0.3, 0.0])
+
+    def slow_then_fast(query, inputs, fast=False):
+        time.sleep(next(delays))
+        return SmartSearchIntent(intent="trending", media_type="movie")
+
+    monkeypatch.setattr(classifier, "_classify_sync", slow_then_fast)
+    monkeypatch.setattr(classifier, "latencies", SimpleNamespace(hedge_after=lambda: 0.05, add=lambda s: None))
+    started = time.monotonic()
+    intent = await classifier.classify_query("trendaa", {})
+    assert intent.intent == "trending"
+    assert time.monotonic() - started < 0.25
+
+
+# ─────────────────────────────────────────────────────────────
+# Paikallinen vara
+# ─────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("query, intent, media_type", [
+    ("trendaavat sarjat", "trending", "tv"),
+    ("mitkä elokuvat trendaa tänään", "trending", "movie"),
+    ("kuka on Tom Hanks", "person", "tv"),
+    ("synkkiä animesarjoja", "discover", "tv"),
+    ("Inception elokuva", "lookup", "movie"),
+])
+def test_heuristinen_intent(query, intent, media_type):
+    result = llm.heuristic_intent(query)
+    assert (result.intent, result.media_type) == (intent, media_type)
+    assert result.source == "heuristic"
+
+
+def test_heuristiikka_kayttaa_epavarmaa_arvausta():
+    from search.intent_model import Guess
+    result = llm.heuristic_intent("kuka on Tom Hanks", Guess("person", 0.6, "movie", 0.7))
+    assert (result.intent, result.media_type, result.person_name) == ("person", "movie", "Tom Hanks")
+
+
+async def test_luokittelun_aikakatkaisu_palauttaa_heuristisen(monkeypatch):
+    async def slow(query, memory, fast=False):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(llm, "_module", lambda name: asyncio.sleep(0, result=SimpleNamespace(classify_query=slow)))
+    monkeypatch.setattr(deadline, "CLASSIFY_TIMEOUT", 0.05)
+    intent = await llm.classify_query("trendaavat sarjat", {})
+    assert intent.intent == "trending" and intent.source == "heuristic"
+    assert breaker.states()["llm"]["error_rate"] == 1.0  # kielimalli oli hidas
+
+
+async def test_kulunut_kyselyn_raja_ei_kirjaa_katkaisijalle(monkeypatch):
+    called = []
+
+    async def fast(*args, **kwargs):
+        called.append(args)
+
+    monkeypatch.setattr(llm, "_module", lambda name: asyncio.sleep(
+        0, result=SimpleNamespace(classify_query=fast, rerank_candidates=fast)))
+    with deadline.within(0.05):  # TMDB käytti ajan: vaiheiden katot leikkautuvat
+        intent = await llm.classify_query("trendaavat sarjat", {})
+        ids = await llm.rerank_candidates([], None, [Title(id=1, media_type="movie", title="A")])
+    assert intent.source == "heuristic" and ids == [1]
+    assert called == []
+    assert breaker.states()["llm"]["calls_in_window"] == 0
+
+
+async def test_rerankin_aikakatkaisu_palauttaa_paikallisen_jarjestyksen(monkeypatch):
+    async def slow(*args):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(llm, "_module", lambda name: asyncio.sleep(0, result=SimpleNamespace(rerank_candidates=slow)))
+    candidates = [
+        Title(id=1, media_type="movie", title="Komedia", genre_ids=(35,)),
+        Title(id=2, media_type="movie", title="Scifi", genre_ids=(878,), overview="dystopia"),
+    ]
+    refs = [{"name": "Ref", "overview": "", "kw_names": ["dystopia"], "genre_ids": (878,)}]
+    monkeypatch.setattr(deadline, "RERANK_TIMEOUT", 0.05)
+    ids = await llm.rerank_candidates(refs, None, candidates)
+    assert ids == [2, 1]
@@ -0,0 +1,87 @@
+# test_decode.py — JSON-dekooderin ja muotojen (shape) testit
+#
+# Jokainen backend (json, orjson, msgspec) ajetaan samoilla syötteillä:
+# tuloksen pitää olla sama riippumatta siitä mikä kirjasto on asennettu.
+#
+# Aja: uv run pytest tests/test_decode.py -v
+
+import json
+
+import pytest
+from search import decode as dec
+
+
+BACKENDS = ["json"] + (["orjson"] if dec.orjson else []) + (["msgspec"] if dec.msgspec else [])
+
+
+PERSON = {
+    "id": 2231,
+    "name": "Samuel L. Jackson",
+    "biography": "Pitkä elämäkerta",
+    "popularity": 40.1,
+    "profile_path": "/abc.jpg",
+    "combined_credits": {
+        "cast": [
+            {"id": 1, "title": "Pulp Fiction", "media_type": "movie", "release_date": "1994-09-10",
+             "vote_count": 27000, "character": "Jules", "poster_path": "/p.jpg", "overview": "..."},
+        ],
+        "crew": [
+            {"id": 2, "name": "Sarja", "media_type": "tv", "first_air_date": None,
+             "vote_count": 3, "job": "Producer", "credit_id": "x"},
+        ],
+    },
+}
+
+
+# ─────────────────────────────────────────────────────────────
+# Muotoon karsinta
+# ─────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_muoto_pudottaa_ylimaaraiset_kentat(backend):
+    d = dec.decode(json.dumps(PERSON).encode(), dec.PersonDetails, backend=backend)
+    assert "popularity" not in d
+    assert "profile_path" not in d
+    cast = d["combined_credits"]["cast"][0]
+    assert cast == {"id": 1, "title": "Pulp Fiction", "media_type": "movie",
+                    "release_date": "1994-09-10", "vote_count": 27000, "character": "Jules"}
+    crew = d["combined_credits"]["crew"][0]
+    assert "credit_id" not in crew
+    assert crew["first_air_date"] is None
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_ilman_muotoa_palautetaan_kaikki(backend):
+    d = dec.decode(json.dumps(PERSON).encode(), backend=backend)
+    assert d == PERSON
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_puuttuvat_kentat_eivat_kaada(backend):
+    """TMDB:n virhevastaus (esim. 404) dekoodautuu tyhjäksi sivuksi."""
+    body = b'{"status_code": 34, "status_message": "not found", "success": false}'
+    d = dec.decode(body, dec.Page, backend=backend)
+    assert d.get("results", []) == []
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_kokonaisluku_kelpaa_floatiksi(backend):
+    body = b'{"results": [{"id": 5, "vote_average": 8, "genre_ids": [18]}]}'
+    d = dec.decode(body, dec.Page, backend=backend)
+    assert d["results"][0]["vote_average"] == 8
+
+
+# ─────────────────────────────────────────────────────────────
+# Odottamaton tyyppi → fallback tyypittömään parsintaan
+# ─────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_vaara_tyyppi_ei_kaada(backend):
+    body = b'{"results": [{"id": 5, "vote_average": "8.1", "extra": 1}]}'
+    d = dec.decode(body, dec.Page, backend=backend)
+    assert d["results"][0] == {"id": 5, "vote_average": "8.1"}
+
+
+def test_tuntematon_backend_valitsee_parhaan():
+    assert dec._select_backend("ei-tällaista") in ("msgspec", "orjson", "json")
+    assert dec._select_backend("json") == "json"
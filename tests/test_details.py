@@ -0,0 +1,172 @@
+# test_details.py — get_details: append_to_response ja kokoelman välimuisti
+#
+# Ei API-kutsuja: reitit vastaavat conftest.py:n tmdb_routes-fixturesta.
+#
+# Aja: uv run pytest tests/test_details.py -v
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from search import tools
+from search.memory import memory
+
+
+def movie(id, title, year):
+    return {
+        "id": id, "title": title, "original_title": title, "release_date": f"{year}-01-01",
+        "genres": [{"id": 28, "name": "Action"}], "vote_average": 7.5, "vote_count": 100,
+        "belongs_to_collection": {"id": 10, "name": "Matrix Collection"},
+        "keywords": {"keywords": [{"id": 4565, "name": "dystopia"}]},
+        "credits": {
+            "cast": [{"id": 2, "name": "Carrie-Anne Moss", "order": 1}, {"id": 1, "name": "Keanu Reeves", "order": 0}],
+            "crew": [{"id": 3, "name": "Lana Wachowski", "job": "Director"}, {"id": 4, "name": "X", "job": "Editor"}],
+        },
+        "watch/providers": {"results": {
+            "FI": {"flatrate": [{"provider_id": 8, "provider_name": "Netflix"}]},
+            "US": {"flatrate": [{"provider_id": 15, "provider_name": "Hulu"}]},
+        }},
+        "recommendations": {"results": [{"id": 99, "title": "Dark City", "release_date": "1998-02-27"}]},
+    }
+
+
+ROUTES = {
+    "/3/movie/603": movie(603, "The Matrix", 1999),
+    "/3/movie/604": movie(604, "The Matrix Reloaded", 2003),
+    "/3/collection/10": {"id": 10, "name": "Matrix Collection", "parts": [
+        {"id": 604, "title": "The Matrix Reloaded", "release_date": "2003-05-15"},
+        {"id": 603, "title": "The Matrix", "release_date": "1999-03-31"},
+    ]},
+}
+
+
+@pytest.fixture
+def calls(tmdb_routes):
+    calls = tmdb_routes(ROUTES, record=lambda request: (request.url.path, dict(request.url.params)))
+    memory["collection_cache"].clear()
+    memory["details_cache"].clear()
+    return calls
+
+
+async def test_yksi_kutsu_append_to_response(calls):
+    out = await tools.get_details(603)
+    details = [p for path, p in calls if path == "/3/movie/603"]
+    assert len(details) == 1
+    assert details[0]["append_to_response"] == "keywords,credits,watch/providers,recommendations"
+    assert "Ohjaus: Lana Wachowski" in out
+    assert "Pääosissa: Keanu Reeves, Carrie-Anne Moss" in out
+    assert "Katsottavissa (FI): Netflix" in out
+    assert "Hulu" not in out
+    assert "[99] Dark City (1998)" in out
+    assert memory["keyword_cache"].get("dystopia") == "4565"
+
+
+async def test_kokoelma_haetaan_kerran_koko_sarjalle(calls):
+    first = await tools.get_details(603)
+    second = await tools.get_details(604)
+    assert [path for path, _ in calls].count("/3/collection/10") == 1
+    assert "The Matrix (1999) — 0.0/10 ◄ tämä" in first
+    assert "The Matrix Reloaded (2003) — 0.0/10 ◄ tämä" in second
+
+
+async def test_json_tila(calls):
+    data = await tools.get_details(603, format="json")
+    assert not {"watch/providers", "watch_providers", "credits"} & set(data)
+    assert data["streaming"] == ["Netflix"]   # vain pyydetyn maan palvelut
+    assert data["directors"] == ["Lana Wachowski"]
+    assert data["cast"] == ["Keanu Reeves", "Carrie-Anne Moss"]
+    assert data["keywords"] == ["dystopia"]
+    assert data["recommendations"] == [{"id": 99, "title": "Dark City", "year": "1998"}]
+    assert [p["id"] for p in data["collection"]["parts"]] == [603, 604]
+
+
+# ─────────────────────────────────────────────────────────────
+# get_details_many
+# ─────────────────────────────────────────────────────────────
+
+async def test_many_duplikaatit_ja_valimuisti(calls):
+    await tools.get_details(603)
+    out = await tools.get_details_many([603, 604, 603])
+    paths = [path for path, _ in calls]
+    assert paths.count("/3/movie/603") == 1   # jo välimuistissa
+    assert paths.count("/3/movie/604") == 1
+    assert out.index("[603] The Matrix (1999)") < out.index("[604] The Matrix Reloaded (2003)")
+
+
+async def test_many_puuttuva_id(calls):
+    data = await tools.get_details_many([603, 1], format="json")
+    assert [d["id"] for d in data["results"]] == [603]
+    assert data["missing"] == [1]
+
+
+async def test_muu_maa_samasta_valimuistista(calls):
+    from search.availability import availability_for
+
+    await tools.get_details(603)
+    out = await tools.get_details(603, region="us")
+    assert [path for path, _ in calls].count("/3/movie/603") == 1
+    assert "Katsottavissa (US): Hulu" in out
+    assert "Netflix" not in out
+    assert availability_for("US").get("movie", 603) == (frozenset({"Hulu"}), True)
+
+
+async def test_kokoelma_ja_varakieli_rinnakkain(tmdb_routes):
+    memory["collection_cache"].clear()
+    memory["details_cache"].clear()
+
+    async def slow(body):
+        await asyncio.sleep(0.1)
+        return body
+
+    tmdb_routes({
+        "/3/movie/603": lambda request: (
+            ROUTES["/3/movie/603"] if request.url.params["language"] == "fi"
+            else slow({"id": 603, "overview": "A hacker wakes up."})
+        ),
+        "/3/collection/10": lambda request: slow(ROUTES["/3/collection/10"]),
+    })
+    started = time.monotonic()
+    data = await tools.get_details(603, locale="fi", format="json")
+    assert data["overview"] == "A hacker wakes up."
+    assert data["collection"]["name"] == "Matrix Collection"
+    assert time.monotonic() - started < 0.18
+
+
+def _unreachable(request):
+    raise httpx.ConnectError("ei yhteyttä")
+
+
+@pytest.mark.parametrize("failure", [lambda request: httpx.Response(503, content=b"{}"), _unreachable])
+async def test_kokoelman_virhe_ei_kaada_tietoja(tmdb_routes, failure):
+    memory["collection_cache"].clear()
+    memory["details_cache"].clear()
+    tmdb_routes({**ROUTES, "/3/collection/10": failure})
+    data = await tools.get_details(603, format="json")
+    assert data["title"] == "The Matrix"
+    assert data["collection"] is None
+
+
+async def test_kokoelmahaku_perutaan_virheessa(tmdb_routes, monkeypatch):
+    memory["collection_cache"].clear()
+    memory["details_cache"].clear()
+    cancelled = []
+
+    async def hanging(request):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(request.url.path)
+            raise
+
+    async def broken(*args):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("rikki")
+
+    tmdb_routes({**ROUTES, "/3/collection/10": hanging})
+    monkeypatch.setattr(tools, "apply_fallback", broken)
+    with pytest.raises(RuntimeError):
+        await tools.get_details(603)
+    await asyncio.sleep(0)
+    assert cancelled == ["/3/collection/10"]
@@ -0,0 +1,113 @@
+# test_examples.py — luokitteluesimerkkien JSONL-tallennus (lisäys, lukko, tiivistys)
+#
+# Aja: uv run pytest tests/test_examples.py -v
+
+import json
+import threading
+
+from search import examples
+from search.examples import compact, load_examples, save_example, stats
+from search.prompts import SmartSearchIntent
+
+
+def _intent(**kw) -> SmartSearchIntent:
+    return SmartSearchIntent(**{"intent": "discover", "media_type": "movie", **kw})
+
+
+def test_tallennus_lisaa_rivin_ja_viimeisin_voittaa(tmp_path):
+    path = tmp_path / "examples.jsonl"
+    save_example("kauhuleffoja", _intent(genres=["Kauhu"]), path)
+    save_example("Kauhuleffoja ", _intent(genres=["Kauhu", "Trilleri"]), path)
+    save_example("kuka on tom hanks", _intent(intent="person", person_name="Tom Hanks"), path)
+
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+    by_query = {e["query"].strip().lower(): e["correct"] for e in load_examples(path)}
+    assert by_query["kauhuleffoja"]["genres"] == ["Kauhu", "Trilleri"]
+    assert by_query["kuka on tom hanks"]["intent"] == "person"
+    assert stats(path) == {"examples": 2, "lines": 3, "bytes": path.stat().st_size}
+
+
+def test_keskenerainen_ja_rikkinainen_rivi_ohitetaan(tmp_path):
+    path = tmp_path / "examples.jsonl"
+    save_example("a", _intent(), path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("{rikki}\n")
+        f.write('{"query": "b", "correct": {"intent": "disc')  # kaatunut kirjoittaja
+    assert [e["query"] for e in load_examples(path)] == ["a"]
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('over", "media_type": "movie"}}\n')
+    assert [e["query"] for e in load_examples(path)] == ["a", "b"]
+
+
+def test_lataus_lukee_vain_uudet_rivit(tmp_path, monkeypatch):
+    path = tmp_path / "examples.jsonl"
+    save_example("a", _intent(), path)
+    assert examples._readers[path].offset == path.stat().st_size
+
+    with open(path, "a", encoding="utf-8") as f:  # toinen prosessi kirjoitti
+        f.write(json.dumps({"query": "b", "correct": _intent().model_dump()}) + "\n")
+    seen = []
+    real_loads = json.loads
+    monkeypatch.setattr(examples.json, "loads", lambda s: seen.append(s) or real_loads(s))
+    assert [e["query"] for e in load_examples(path)] == ["a", "b"]
+    assert len(seen) == 1  # vain uusi rivi jäsennettiin
+
+
+def test_tiivistys_jattaa_vain_voimassa_olevat(tmp_path):
+    path = tmp_path / "examples.jsonl"
+    for i in range(5):
+        save_example("sama", _intent(genres=[f"G{i}"]), path)
+    save_example("toinen", _intent(), path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("{rikki}\n")
+
+    assert compact(path) == {"before": 6, "after": 2}
+    lines = [json.loads(l) for l in path.read_text(encoding="utf-8").splitlines()]
+    assert [(r["query"], r["correct"]["genres"]) for r in lines] == [("sama", ["G4"]), ("toinen", None)]
+    assert not (tmp_path / "examples.jsonl.tmp").exists()
+    assert [e["query"] for e in load_examples(path)] == ["sama", "toinen"]
+
+
+def test_automaattinen_tiivistys(tmp_path, monkeypatch):
+    monkeypatch.setattr(examples, "COMPACT_MIN_LINES", 4)
+    path = tmp_path / "examples.jsonl"
+    for _ in range(5):
+        save_example("sama", _intent(), path)
+    assert len(path.read_text(encoding="utf-8").splitlines()) < 5
+    assert len(load_examples(path)) == 1
+
+
+def test_vanha_json_luetaan_ja_siirretaan(tmp_path):
+    legacy = tmp_path / "examples.json"
+    legacy.write_text(json.dumps([
+        {"query": "vanha", "correct": {"intent": "trending", "media_type": "movie"}},
+        {"query": "korvattu", "correct": {"intent": "trending", "media_type": "movie"}},
+    ]), encoding="utf-8")
+    path = tmp_path / "examples.jsonl"
+    assert [e["query"] for e in load_examples(path)] == ["vanha", "korvattu"]
+
+    save_example("korvattu", _intent(), path)
+    assert {e["query"]: e["correct"]["intent"] for e in load_examples(path)} == {
+        "vanha": "trending", "korvattu": "discover"}
+    compact(path)
+    assert not legacy.exists()
+    assert {e["query"] for e in load_examples(path)} == {"vanha", "korvattu"}
+
+
+def test_rinnakkaiset_tallennukset_eivat_sotkeudu(tmp_path):
+    path = tmp_path / "examples.jsonl"
+
+    def writer(n: int) -> None:
+        for i in range(25):
+            save_example(f"kysely {n}-{i}", _intent(keywords=["x" * 200]), path)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 200
+    assert all(json.loads(l)["query"].startswith("kysely") for l in lines)
+    assert len(load_examples(path)) == 200
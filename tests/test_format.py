@@ -0,0 +1,126 @@
+# test_format.py — yhteinen tulosformatteri: pohjat, kokoraja ja tilat
+#
+# Aja: uv run pytest tests/test_format.py -v
+
+import json
+
+from search.format import _fair_cap, message, render, ref_fi, respond
+from search.models import Person, Title
+
+
+GENRES = {"movie": {18: "Draama"}, "tv": {16: "Animaatio"}}
+
+
+def genre_map_for(media_type):
+    return GENRES.get(media_type, {})
+
+
+def make_title(id, overview="", media_type="movie", **kw):
+    return Title(id=id, media_type=media_type, title=kw.pop("title", f"Teos {id}"),
+                 year="2001", overview=overview, genre_ids=(18,), vote_average=7.25, vote_count=10, **kw)
+
+
+# ─────────────────────────────────────────────────────────────
+# Tekstitila
+# ─────────────────────────────────────────────────────────────
+
+def test_line_pohja_sama_kuin_ennen():
+    out = render("Otsikko\n", [make_title(1, "Lyhyt kuvaus.")], genre_map_for)
+    assert out == (
+        "Otsikko\n\n\n"
+        "[1] Teos 1 (2001)\n"
+        "  Genret: Draama | 7.2/10 (10 ääntä)\n"
+        "  Lyhyt kuvaus."
+    )
+
+
+def test_full_pohja_arvosana_omalla_rivilla():
+    out = render("H\n", [make_title(1, "x" * 50)], genre_map_for, layout="full")
+    assert "\n  Arvosana: 7.2/10 (10 ääntä)\n" in out
+
+
+def test_henkilo_ilman_kuvausriviä():
+    p = Person(id=5, name="Tom Hanks", department="Acting",
+               known_for=(make_title(1, title="Big"),))
+    out = render("H\n", [p], genre_map_for, ref=ref_fi)
+    assert out.endswith("[henkilö/5] Tom Hanks — Acting\n  Tunnettu: Big (2001)")
+
+
+# ─────────────────────────────────────────────────────────────
+# Kokoraja
+# ─────────────────────────────────────────────────────────────
+
+def test_kokoraja_pitaa():
+    items = [make_title(i, "sana " * 200) for i in range(20)]
+    out = render("H\n", items, genre_map_for, budget=3000)
+    assert len(out) <= 3000
+
+
+def test_lyhyet_kuvaukset_antavat_tilaa_pitkille():
+    items = [make_title(1, "lyhyt"), make_title(2, "pitkä " * 100)]
+    out = render("H\n", items, genre_map_for, budget=600)
+    assert "lyhyt" in out
+    assert len(out) <= 600
+    # pitkä kuvaus saa enemmän kuin puolet jaettavasta tilasta
+    long_line = [line for line in out.splitlines() if "pitkä" in line][0]
+    assert len(long_line) > 150
+
+
+def test_liian_pieni_raja_pudottaa_rivit():
+    items = [make_title(i, "kuvaus") for i in range(50)]
+    out = render("H\n", items, genre_map_for, budget=500)
+    assert "muuta (vastauksen kokoraja)" in out
+
+
+def test_otsikot_tayttavat_katon_ei_kuvauksia():
+    items = [make_title(1, "kuvaus", title="x" * 300)]
+    out = render("H\n", items, genre_map_for, budget=100)
+    assert "…" not in out and "kuvaus" not in out
+
+
+def test_tyhja_kuvaus_ei_tee_rivia():
+    out = render("H\n", [make_title(1, ""), make_title(2, "kuvaus")], genre_map_for)
+    assert out.endswith("(10 ääntä)\n\n[2] Teos 2 (2001)\n  Genret: Draama | 7.2/10 (10 ääntä)\n  kuvaus")
+    assert "ääntä)\n  \n" not in out
+
+
+def test_fair_cap():
+    assert _fair_cap([10, 10, 100], 60) == 40
+    assert _fair_cap([10, 20], 100) == 20
+
+
+# ─────────────────────────────────────────────────────────────
+# Compact ja JSON
+# ─────────────────────────────────────────────────────────────
+
+def test_compact_yksi_rivi_per_teos():
+    out = render("H\n", [make_title(1, "kuvaus"), make_title(2, "kuvaus")], genre_map_for, mode="compact")
+    assert "kuvaus" not in out
+    assert "[2] Teos 2 (2001) 7.2/10 · Draama" in out
+
+
+def test_json_tila():
+    out = render("Otsikko\n", [make_title(1, "kuvaus")], genre_map_for, mode="json")
+    data = json.loads(out)
+    assert data["header"] == "Otsikko"
+    r = data["results"][0]
+    assert r["id"] == 1
+    assert r["genre_ids"] == [18]
+    assert r["year"] == "2001"
+    assert r["overview"] == "kuvaus"
+
+
+def test_respond_json_palauttaa_dictin():
+    data = respond("Otsikko\n", [make_title(1, "kuvaus")], genre_map_for, "json", layout="full")
+    assert data["header"] == "Otsikko"
+    assert data["results"][0]["genres"] == ["Draama"]
+
+
+def test_respond_teksti_kuten_render():
+    items = [make_title(1, "kuvaus")]
+    assert respond("H\n", items, genre_map_for, "text") == render("H\n", items, genre_map_for, mode="text")
+
+
+def test_message_json():
+    assert message("Ei tuloksia.", "json") == {"message": "Ei tuloksia.", "results": []}
+    assert message("Ei tuloksia.") == "Ei tuloksia."
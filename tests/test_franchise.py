@@ -0,0 +1,109 @@
+# test_franchise.py — franchise-resolveri: lähteet, välimuisti ja paikallinen pisteytys
+#
+# Ei API-kutsuja: conftestin tmdb_routes vastaa polun perusteella.
+#
+# Aja: uv run pytest tests/test_franchise.py -v
+
+import httpx
+import pytest
+
+from search.franchise import rank, resolve, sort_for
+from search.memory import memory
+from search.models import Title
+
+
+def t(id, year="2000", vote=7.0, votes=1000, pop=10.0, title=None):
+    return Title(id=id, media_type="movie", title=title or f"Teos {id}", year=year,
+                 vote_average=vote, vote_count=votes, popularity=pop)
+
+
+ROUTES = {
+    "/3/search/collection": {"results": [{"id": 10, "name": "Star Wars Collection"},
+                                         {"id": 11, "name": "Muu kokoelma"}]},
+    "/3/collection/10": {"id": 10, "name": "Star Wars Collection", "parts": [
+        {"id": 2, "title": "The Empire Strikes Back", "release_date": "1980-05-20"},
+        {"id": 1, "title": "Star Wars", "release_date": "1977-05-25"},
+    ]},
+    "/3/search/keyword": {"results": [{"id": 500, "name": "star wars"}, {"id": 501, "name": "star wars parody"}]},
+    "/3/discover/movie": {"page": 1, "total_pages": 1, "results": [
+        {"id": 1, "title": "Star Wars"}, {"id": 3, "title": "Rogue One"},
+    ]},
+    "/3/search/movie": {"page": 1, "total_pages": 1, "results": [
+        {"id": 4, "title": "Star Wars: The Force Awakens"}, {"id": 99, "title": "Spaceballs"},
+    ]},
+}
+
+
+@pytest.fixture
+def calls(tmdb_routes):
+    memory["franchise_cache"].clear()
+    memory["collection_cache"].clear()
+    return tmdb_routes(ROUTES, record=lambda request: (request.url.path, dict(request.url.params)))
+
+
+# ─────────────────────────────────────────────────────────────
+# Resolveri
+# ─────────────────────────────────────────────────────────────
+
+async def test_jasenet_kaikista_lahteista(calls):
+    async with httpx.AsyncClient() as client:
+        fr = await resolve(client, "Star Wars", "movie")
+    ids = {m.id for m in fr.members}
+    assert ids == {1, 2, 3, 4}           # Spaceballs ei osu nimeen
+    assert fr.collections == ("Star Wars Collection",)
+    assert fr.keywords == ("star wars",)  # vain täsmälleen sama keyword
+    discover = [p for path, p in calls if path == "/3/discover/movie"][0]
+    assert discover["with_keywords"] == "500"
+
+
+async def test_toinen_haku_valimuistista(calls):
+    async with httpx.AsyncClient() as client:
+        await resolve(client, "Star Wars", "movie")
+        n = len(calls)
+        fr = await resolve(client, "star  wars", "movie")
+    assert len(calls) == n
+    assert len(fr.members) == 4
+
+
+async def test_sarjoilla_ei_kokoelmia(calls):
+    async with httpx.AsyncClient() as client:
+        await resolve(client, "Gundam", "tv")
+    assert not any(path.startswith("/3/search/collection") for path, _ in calls)
+
+
+async def test_kaatunut_lahde_ohitetaan(tmdb_routes, calls):
+    # Rikkinäinen keyword-vastaus ei kaada kokoelmia eikä nimihakua
+    tmdb_routes({**ROUTES, "/3/search/keyword": lambda request: httpx.Response(200, content=b"<html>")})
+    async with httpx.AsyncClient() as client:
+        fr = await resolve(client, "Star Wars", "movie")
+    assert {m.id for m in fr.members} == {1, 2, 4}
+    assert fr.keywords == ()
+    # Osittainen tulos ei jää franchise-välimuistiin
+    assert memory["franchise_cache"].get(("movie", "star wars")) is None
+
+
+async def test_kaikki_lahteet_kaatuvat(tmdb_routes, calls):
+    broken = lambda request: httpx.Response(200, content=b"<html>")
+    tmdb_routes({"/3/search/": broken})
+    async with httpx.AsyncClient() as client:
+        with pytest.raises(ValueError):
+            await resolve(client, "Star Wars", "movie")
+
+
+# ─────────────────────────────────────────────────────────────
+# Paikallinen pisteytys
+# ─────────────────────────────────────────────────────────────
+
+def test_paras_painottaa_aanimaaraa():
+    members = [t(1, vote=9.5, votes=3), t(2, vote=8.0, votes=20000), t(3, vote=6.0, votes=5000)]
+    assert [m.id for m in rank(members, "vote_average.desc")] == [2, 1, 3]
+
+
+def test_uusin_ensin_ja_tuntematon_vuosi_viimeisena():
+    members = [t(1, year="1999"), t(2, year=""), t(3, year="2020")]
+    assert [m.id for m in rank(members, "release_date.desc")] == [3, 1, 2]
+
+
+def test_katselujarjestys():
+    assert sort_for("star wars katselujärjestyksessä", "popularity.desc") == "release_date.asc"
+    assert sort_for("paras star wars", "vote_average.desc") == "vote_average.desc"
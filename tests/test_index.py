@@ -0,0 +1,90 @@
+# test_index.py — muistin hakuindeksit ja Aho-Corasick-palveluhaku
+#
+# Ei API-kutsuja: indeksi rakennetaan käsin annetusta referenssidatasta.
+#
+# Aja: uv run pytest tests/test_index.py -v
+
+from search.matcher import KeywordMatcher
+from search.memory import build_index
+
+
+DATA = {
+    "movie_genres": [{"id": 28, "name": "Toiminta"}, {"id": 18, "name": "Draama"}],
+    "tv_genres": [{"id": 10759, "name": "Action & Adventure"}],
+    "movie_providers": [
+        {"provider_id": 8, "provider_name": "Netflix"},
+        {"provider_id": 323, "provider_name": "Yle Areena"},
+        {"provider_id": 337, "provider_name": "Disney Plus"},
+    ],
+    "tv_providers": [
+        {"provider_id": 8, "provider_name": "Netflix"},
+        {"provider_id": 1899, "provider_name": "HBO Max"},
+    ],
+}
+
+
+# ─────────────────────────────────────────────────────────────
+# KeywordMatcher
+# ─────────────────────────────────────────────────────────────
+
+def test_matcher_loytaa_paallekkaiset():
+    m = KeywordMatcher({"he": 1, "she": 2, "hers": 3})
+    assert {v for _, _, v in m.find("ushers")} == {1, 2, 3}
+
+
+def test_matcher_ei_osumaa():
+    assert KeywordMatcher({"netflix": 1}).find("ei palveluita") == []
+
+
+# ─────────────────────────────────────────────────────────────
+# Genret
+# ─────────────────────────────────────────────────────────────
+
+def test_genre_id_kirjainkoosta_riippumatta():
+    idx = build_index(DATA)
+    assert idx.genre_id("movie", "toiminta") == 28
+    assert idx.genre_id("movie", "DRAAMA") == 18
+    assert idx.genre_id("tv", "toiminta") is None
+
+
+def test_genre_map_on_jaadytetty():
+    idx = build_index(DATA)
+    gm = idx.genre_map("movie")
+    assert gm[28] == "Toiminta"
+    try:
+        gm[99] = "x"
+        assert False, "genre_map ei saa olla muokattava"
+    except TypeError:
+        pass
+
+
+# ─────────────────────────────────────────────────────────────
+# Palvelut
+# ─────────────────────────────────────────────────────────────
+
+def test_palvelu_nimella_ja_aliaksella():
+    idx = build_index(DATA)
+    assert idx.provider("movie", "netflix")["provider_id"] == 8
+    assert idx.provider("movie", "Disney+")["provider_id"] == 337
+    assert idx.provider("movie", "areena")["provider_id"] == 323
+    assert idx.provider("tv", "hbo")["provider_id"] == 1899
+    assert idx.provider("movie", "hbo") is None  # ei elokuvapuolella
+
+
+def test_palvelut_tekstista_taivutettuna():
+    idx = build_index(DATA)
+    found = idx.providers_in("sarjoja kuten Downton Abbey Yle Areenassa tai Netflixistä")
+    assert found == ["Yle Areena", "Netflix"]
+
+
+def test_palvelu_vain_sanan_alusta():
+    """'max' ei ole virallinen nimi, eikä 'hbo max' osu sanan keskeltä."""
+    idx = build_index(DATA)
+    assert idx.providers_in("elokuvia kuten Mad Max") == []
+    assert idx.providers_in("xhbo max") == []
+
+
+def test_tyhja_muisti_toimii():
+    idx = build_index({})
+    assert idx.providers_in("Netflix") == []
+    assert idx.genre_map("movie") == {}
@@ -0,0 +1,134 @@
+# test_intent_model.py — paikallinen intent-luokittelija (merkki-n-grammit + lineaarinen malli)
+#
+# Aja: uv run pytest tests/test_intent_model.py -v
+
+import json
+from unittest.mock import AsyncMock
+
+from search import intent_model, llm
+from search.intent_model import Guess, IntentModel, evaluate, featurize, training_rows
+from search.memory import _norm_query
+
+ROWS = [
+    {"query": q, "intent": intent, "media_type": media, "weight": 1.0}
+    for q, intent, media in [
+        ("mikä on trendaavaa", "trending", "movie"),
+        ("mitä trendaa nyt", "trending", "movie"),
+        ("trendaavat sarjat tänään", "trending", "tv"),
+        ("trending movies this week", "trending", "movie"),
+        ("kuka on tom hanks", "person", "movie"),
+        ("kuka on meryl streep", "person", "movie"),
+        ("who is keanu reeves", "person", "movie"),
+        ("samanlaisia kuin inception", "similar_to", "movie"),
+        ("samanlaisia kuin breaking bad", "similar_to", "tv"),
+        ("jotain kuten the office", "similar_to", "tv"),
+        ("hyviä kauhuleffoja 80-luvulta", "discover", "movie"),
+        ("parhaat komediasarjat", "discover", "tv"),
+    ]
+]
+
+
+def test_featurize_ngrammit_ja_sanat():
+    feats = featurize("Kuka  ON")
+    assert " k" in feats and "kuka" in feats and "w:on" in feats
+    assert featurize("kuka on") == feats  # kirjainkoko ja välilyönnit eivät vaikuta
+    assert abs(sum(v * v for v in feats.values()) - 1.0) < 1e-9
+
+
+def test_opetettu_malli_ennustaa_intentin_ja_mediatyypin():
+    model = IntentModel.train(ROWS, epochs=30)
+    g = model.predict("kuka on brad pitt")
+    assert g.intent == "person"
+    assert model.predict("samanlaisia kuin friends").intent == "similar_to"
+    assert model.predict("trendaavat sarjat").media_type == "tv"
+    assert 0 < g.intent_p <= 1 and 0 < g.media_type_p <= 1
+
+
+def test_yhden_luokan_paa_ei_ole_varma():
+    rows = [r for r in ROWS if r["media_type"] == "movie"]
+    model = IntentModel.train(rows, epochs=30)
+    g = model.predict("kuka on tom hanks")
+    assert g.intent == "person" and g.media_type == "movie"
+    assert g.media_type_p == 0.0 and not g.confident
+
+
+def test_tallennus_ja_lataus_sailyttaa_ennusteet(tmp_path):
+    model = IntentModel.train(ROWS, epochs=10)
+    path = tmp_path / "malli.json"
+    model.save(path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["version"] == 1 and data["examples"] == len(ROWS)
+    assert set(data["heads"]) == {"intent", "media_type"}
+
+    loaded = IntentModel.load(path)
+    a, b = model.predict("kuka on tom cruise"), loaded.predict("kuka on tom cruise")
+    assert a.intent == b.intent and abs(a.intent_p - b.intent_p) < 1e-3
+
+
+def test_guess_ilman_mallia_on_none():
+    assert intent_model.guess("kuka on tom hanks") is None
+
+
+def test_guess_lataa_mallin_tiedostosta():
+    IntentModel.train(ROWS, epochs=30).save(intent_model.MODEL_FILE)
+    assert intent_model.guess("kuka on brad pitt").intent == "person"
+
+
+def test_opetusdata_yhdistaa_lokin_ja_esimerkit(tmp_path):
+    log = tmp_path / "log.jsonl"
+    log.write_text("\n".join(json.dumps(r) for r in [
+        {"query": "kuka on tom hanks", "intent": "lookup", "media_type": "movie", "source": "llm"},
+        {"query": "trendaavaa", "intent": "trending", "media_type": "movie", "source": "llm"},
+        {"query": "välimuistista", "intent": "trending", "media_type": "movie", "source": "local"},
+        {"query": "vanha rivi", "intent": "discover"},
+    ]) + "\n{rikki", encoding="utf-8")
+    examples = tmp_path / "examples.jsonl"
+    examples.write_text(json.dumps(
+        {"query": "Kuka on Tom  Hanks", "correct": {"intent": "person", "media_type": "movie"}},
+    ) + "\n", encoding="utf-8")
+
+    rows = {_norm_query(r["query"]): r for r in training_rows(examples, str(log))}
+    assert set(rows) == {"kuka on tom hanks", "trendaavaa"}
+    assert rows["kuka on tom hanks"]["intent"] == "person"  # käsin korjattu voittaa
+    assert rows["kuka on tom hanks"]["weight"] == intent_model.EXAMPLE_WEIGHT
+
+
+def test_arviointi_raportoi_tarkkuuden_ja_viiveen():
+    result = evaluate(IntentModel.train(ROWS, epochs=30), ROWS)
+    assert result["n"] == len(ROWS)
+    assert set(result["accuracy"]) == {"intent", "media_type"}
+    assert result["accuracy"]["intent"] >= 0.9
+    assert 0 <= result["coverage"] <= 1
+    assert set(result["latency_ms"]) == {"p50", "p95"}
+    assert evaluate(IntentModel.train(ROWS, epochs=1), []) == {"n": 0}
+
+
+async def test_varma_person_ohittaa_kielimallin(monkeypatch):
+    monkeypatch.setattr(intent_model, "guess", lambda q: Guess("person", 0.97, "movie", 0.95))
+    module = AsyncMock()
+    monkeypatch.setattr(llm, "_module", module)
+
+    intent = await llm.classify_query("Kuka on Tom Hanks?", {})
+    assert intent.intent == "person" and intent.person_name == "Tom Hanks"
+    assert intent.source == "local"
+    module.assert_not_called()
+
+
+async def test_varma_trending_paattelee_aikaikkunan(monkeypatch):
+    monkeypatch.setattr(intent_model, "guess", lambda q: Guess("trending", 0.99, "tv", 0.93))
+    monkeypatch.setattr(llm, "_module", AsyncMock())
+    intent = await llm.classify_query("mitkä sarjat trendaa tänään", {})
+    assert (intent.intent, intent.media_type, intent.time_window) == ("trending", "tv", "day")
+
+
+async def test_muu_varma_intent_kevennetty_kutsu(monkeypatch):
+    classifier = type("C", (), {"classify_query": AsyncMock(return_value="intent")})
+    monkeypatch.setattr(llm, "_module", AsyncMock(return_value=classifier))
+
+    monkeypatch.setattr(intent_model, "guess", lambda q: Guess("discover", 0.95, "movie", 0.99))
+    await llm.classify_query("hyviä kauhuleffoja", {})
+    classifier.classify_query.assert_awaited_with("hyviä kauhuleffoja", {}, fast=True)
+
+    monkeypatch.setattr(intent_model, "guess", lambda q: Guess("person", 0.6, "movie", 0.99))
+    await llm.classify_query("tom hanks", {})
+    classifier.classify_query.assert_awaited_with("tom hanks", {}, fast=False)
@@ -0,0 +1,131 @@
+# test_localize.py — tulosten kieli ja varakieli (fi → en) välimuistin kautta
+#
+# Ei API-kutsuja: conftest.py:n tmdb_routes vastaa reittitaulusta, joka
+# palauttaa kielen mukaan eri vastauksen ja kirjaa pyydetyt kielet.
+#
+# Aja: uv run pytest tests/test_localize.py -v
+
+import pytest
+
+from search import tools
+from search.localize import apply_fallback, normalize_language, remember
+from search.memory import build_index, memory
+from search.models import Title
+
+
+SEARCH = {
+    "fi": [{"id": 1, "title": "Matriisi", "overview": "Hakkeri herää."},
+           {"id": 2, "title": "Matriisi 2", "overview": ""}],
+    "en": [{"id": 1, "title": "The Matrix", "overview": "A hacker wakes up."},
+           {"id": 2, "title": "The Matrix Reloaded", "overview": "Neo returns."}],
+}
+DETAILS = {
+    "fi": {"id": 1, "title": "Matriisi", "overview": ""},
+    "en": {"id": 1, "title": "The Matrix", "overview": "A hacker wakes up."},
+}
+PERSON = {
+    "fi": {"id": 6384, "name": "Keanu Reeves", "biography": "",
+           "combined_credits": {"cast": [{"id": 1, "media_type": "movie", "title": "Matriisi", "vote_count": 9}]}},
+    "en": {"id": 6384, "name": "Keanu Reeves", "biography": "Canadian actor.",
+           "combined_credits": {"cast": [{"id": 1, "media_type": "movie", "title": "The Matrix", "vote_count": 9}]}},
+}
+
+
+def _lang(request):
+    return request.url.params["language"]
+
+
+ROUTES = {
+    "/3/search/movie": lambda request: {"page": 1, "total_pages": 1, "total_results": 2,
+                                        "results": SEARCH[_lang(request)]},
+    "/3/movie/1": lambda request: DETAILS[_lang(request)],
+    "/3/person/6384": lambda request: PERSON[_lang(request)],
+    "/3/search/person": lambda request: {"page": 1, "total_pages": 1, "total_results": 1, "results": [
+        {"id": 6384, "name": "Keanu Reeves", "known_for": [{**SEARCH[_lang(request)][0], "media_type": "movie"}]},
+    ]},
+    "/3/collection/10": lambda request: {"id": 10, "parts": [
+        {"id": 1, "title": "Matriisi" if _lang(request) == "fi" else "The Matrix", "release_date": "1999-03-31"},
+    ]},
+}
+
+
+@pytest.fixture
+def calls(tmdb_routes, monkeypatch):
+    calls = tmdb_routes(ROUTES, record=lambda request: (request.url.path, _lang(request)))
+    monkeypatch.setitem(memory, "index", build_index({}))
+    memory["details_cache"].clear()
+    return calls
+
+
+def test_kielikoodi():
+    assert normalize_language(None) == "en"
+    assert normalize_language("FI") == "fi"
+    assert normalize_language("pt-br") == "pt-BR"
+    with pytest.raises(ValueError):
+        normalize_language("suomi")
+
+
+async def test_puuttuva_kuvaus_varakielella(calls):
+    out = await tools.search_by_title("matrix", locale="fi", format="json")
+    assert [r["title"] for r in out["results"]] == ["Matriisi", "Matriisi 2"]
+    assert [r["overview"] for r in out["results"]] == ["Hakkeri herää.", "Neo returns."]
+    assert calls == [("/3/search/movie", "fi"), ("/3/search/movie", "en")]
+
+    # Toinen haku: molemmat kielet vastausvälimuistista
+    await tools.search_by_title("matrix", locale="fi")
+    assert len(calls) == 2
+
+
+async def test_varakieli_valimuistista_ilman_hakua(calls):
+    remember([Title(id=2, media_type="movie", title="x", overview="Cached.")], "en")
+    out = await tools.search_by_title("matrix", locale="fi", format="json")
+    assert out["results"][1]["overview"] == "Cached."
+    assert calls == [("/3/search/movie", "fi")]
+
+
+async def test_englanti_ei_varakielta(calls):
+    await tools.search_by_title("matrix")
+    assert calls == [("/3/search/movie", "en")]
+
+
+async def test_tiedot_varakielella(calls):
+    await tools.get_details(1)
+    data = await tools.get_details(1, locale="fi", format="json")
+    assert data["title"] == "Matriisi"
+    assert data["overview"] == "A hacker wakes up."
+    # en-tiedot olivat jo välimuistissa → ei erillistä varakielihakua
+    assert calls == [("/3/movie/1", "en"), ("/3/movie/1", "fi")]
+
+
+async def test_henkilo_kielella_ja_elamakerta_varakielella(calls):
+    out = await tools.search_person("keanu", locale="fi")
+    assert "Matriisi" in out
+    data = await tools.get_person(6384, locale="fi", format="json")
+    assert data["biography"] == "Canadian actor."
+    assert data["cast"][0]["title"] == "Matriisi"
+    assert calls == [("/3/search/person", "fi"), ("/3/person/6384", "fi"), ("/3/person/6384", "en")]
+
+
+async def test_kokoelma_samalla_kielella(calls, monkeypatch):
+    monkeypatch.setitem(DETAILS, "fi", {**DETAILS["fi"], "belongs_to_collection": {"id": 10, "name": "Matriisi-kokoelma"}})
+    memory["collection_cache"].clear()
+    data = await tools.get_details(1, locale="fi", format="json")
+    assert data["collection"]["parts"][0]["title"] == "Matriisi"
+    assert ("/3/collection/10", "fi") in calls
+
+
+async def test_virheellinen_kieli(calls):
+    assert (await tools.search_by_title("matrix", locale="suomi")).startswith("Tuntematon kieli")
+    assert calls == []
+
+
+async def test_refetch_vain_tarvittaessa():
+    fetched = []
+
+    async def refetch(language):
+        fetched.append(language)
+        return []
+
+    titles = [Title(id=1, media_type="movie", title="A", overview="ok")]
+    await apply_fallback(titles, "fi", refetch)
+    assert fetched == []
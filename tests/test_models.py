@@ -0,0 +1,57 @@
+# test_models.py — Title/Person/Credit-rakenteiden muunnokset TMDB-riveistä
+#
+# Aja: uv run pytest tests/test_models.py -v
+
+from search.models import Credit, Person, Title, genre_names, parse_results, parse_titles
+
+
+def test_elokuvan_nimi_ja_vuosi():
+    t = Title.from_tmdb({"id": 1, "title": "Amélie", "original_title": "Le Fabuleux Destin d'Amélie Poulain",
+                         "release_date": "2001-04-25", "genre_ids": [35]})
+    assert t.media_type == "movie"
+    assert t.year == "2001"
+    assert t.display_name == "Amélie (Le Fabuleux Destin d'Amélie Poulain)"
+    assert t.label == "Amélie (2001)"
+
+
+def test_sarjan_kentat_name_ja_first_air_date():
+    t = Title.from_tmdb({"id": 2, "name": "Dark", "original_name": "Dark", "first_air_date": "2017-12-01"}, "tv")
+    assert t.media_type == "tv"
+    assert t.title == "Dark"
+    assert t.display_name == "Dark"  # sama nimi → ei toistoa
+    assert t.year == "2017"
+
+
+def test_null_kentat_eivat_kaada():
+    t = Title.from_tmdb({"id": 3, "title": "X", "release_date": None, "overview": None})
+    assert t.year == ""
+    assert t.overview == ""
+    assert t.label == "X"
+
+
+def test_parse_results_erottelee_henkilot():
+    rows = [
+        {"id": 1, "media_type": "movie", "title": "A"},
+        {"id": 2, "media_type": "person", "name": "B", "known_for": [{"id": 9, "title": "C", "release_date": "1999"}]},
+    ]
+    res = parse_results(rows)
+    assert isinstance(res[0], Title)
+    assert isinstance(res[1], Person)
+    assert res[1].known_for[0].label == "C (1999)"
+    assert [t.id for t in parse_titles(rows)] == [1]
+
+
+def test_genre_names_tuntematon_id_numerona():
+    t = Title.from_tmdb({"id": 1, "title": "A", "genre_ids": [18, 999]})
+    assert genre_names(t, {18: "Draama"}) == ["Draama", "999"]
+
+
+def test_credit_rooli():
+    c = Credit.from_tmdb({"id": 5, "name": "Sarja", "media_type": "tv", "character": None, "vote_count": 3})
+    assert c.character == ""
+    assert c.title == "Sarja"
+
+
+def test_rakenteet_ovat_slotattuja():
+    t = Title.from_tmdb({"id": 1, "title": "A"})
+    assert not hasattr(t, "__dict__")
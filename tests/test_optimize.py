@@ -0,0 +1,129 @@
+# test_optimize.py — luokittelijan optimointi: metriikka, esimerkit, valinta, tallennus ja lataus
+#
+# Ei LLM-kutsuja: ohjelmat ja kielimalli korvataan testissä.
+#
+# Aja: uv run pytest tests/test_optimize.py -v
+
+import json
+from types import SimpleNamespace
+
+import dspy
+
+from search import classifier, optimize
+from search.prompts import SmartSearchIntent
+
+MEMORY = {
+    "movie_genres": [{"id": 27, "name": "Kauhu"}],
+    "tv_genres": [{"id": 16, "name": "Animaatio"}],
+    "movie_providers": [{"provider_id": 8, "provider_name": "Netflix"}],
+}
+
+
+def _example(query: str, **correct) -> dspy.Example:
+    inputs = classifier._inputs(query, MEMORY)
+    return dspy.Example(**inputs, result=SmartSearchIntent(**correct)).with_inputs(*inputs)
+
+
+def test_metriikka_intent_mediatyyppi_ja_paakentta():
+    ex = _example("kuka on tom hanks", intent="person", media_type="movie", person_name="Tom Hanks")
+    right = SimpleNamespace(result=SmartSearchIntent(intent="person", media_type="movie", person_name="tom hanks"))
+    wrong_name = SimpleNamespace(result=SmartSearchIntent(intent="person", media_type="movie", person_name="Tom Cruise"))
+    assert optimize.metric(ex, right) == 1.0
+    assert abs(optimize.metric(ex, wrong_name) - 2 / 3) < 1e-9
+    assert optimize.metric(ex, wrong_name, trace=[]) is False
+    assert optimize.metric(ex, None) == 0.0
+
+    sim = _example("kuten a ja b", intent="similar_to", media_type="movie", reference_titles=["A", "B"])
+    got = SimpleNamespace(result=SmartSearchIntent(intent="similar_to", media_type="movie", reference_titles=["b", "a"]))
+    assert optimize.metric(sim, got) == 1.0
+
+
+def test_esimerkit_tiedostosta_samoilla_syotteilla(tmp_path):
+    path = tmp_path / "examples.jsonl"
+    path.write_text("".join(json.dumps(e) + "\n" for e in [
+        {"query": "kauhuleffoja", "correct": {"intent": "discover", "media_type": "movie", "genres": ["Kauhu"]}},
+        {"query": "", "correct": {}},
+    ]), encoding="utf-8")
+    [ex] = optimize.trainset(path, MEMORY)
+    assert ex.inputs().toDict()["available_movie_genres"] == "Kauhu"
+    assert ex.result.genres == ["Kauhu"]
+    assert optimize.trainset(tmp_path / "puuttuu.jsonl", MEMORY) == []
+
+
+def test_esimerkeista_poistetaan_listat():
+    program = dspy.Predict(classifier.QueryClassification)
+    program.demos = [_example("kuka on x", intent="person", media_type="movie", person_name="x")]
+    optimize.slim_demos(program)
+    keys = set(program.demos[0].keys())
+    assert "query" in keys and "result" in keys
+    assert not keys & set(optimize._BULKY_INPUTS)
+
+
+def test_jako_pienella_joukolla_arvioi_kaikilla():
+    few = [_example(f"q{i}", intent="trending", media_type="movie") for i in range(5)]
+    assert optimize.split(few, 0.3) == (few, few)
+    many = [_example(f"q{i}", intent="trending", media_type="movie") for i in range(20)]
+    train, dev = optimize.split(many, 0.3)
+    assert len(dev) == 6 and len(train) == 14 and not {id(e) for e in train} & {id(e) for e in dev}
+
+
+def test_predict_valitaan_kun_tarkkuus_pysyy():
+    report = {"baseline": {"accuracy": 0.9}, "chain_of_thought": {"accuracy": 0.95}, "predict": {"accuracy": 0.9}}
+    assert optimize.choose(report) == "predict"
+    report["predict"]["accuracy"] = 0.85
+    assert optimize.choose(report) == "chain_of_thought"
+    assert optimize.choose(report, tolerance=0.05) == "predict"
+    report["chain_of_thought"]["accuracy"] = 0.8
+    assert optimize.choose(report) is None
+
+
+def test_arviointi_laskee_tarkkuuden_tokenit_ja_viiveen():
+    lm = SimpleNamespace(history=[])
+
+    def program(**inputs):
+        lm.history.append({"usage": {"prompt_tokens": 1200}})
+        return SimpleNamespace(result=SmartSearchIntent(intent="trending", media_type="movie"))
+
+    dev = [_example("trendaa", intent="trending", media_type="movie"),
+           _example("sarjat trendaa", intent="trending", media_type="tv")]
+    result = optimize.evaluate(program, dev, lm)
+    assert result["n"] == 2
+    assert abs(result["accuracy"] - (1 + 2 / 3) / 2) < 1e-3
+    assert result["prompt_tokens"] == 1200
+    assert result["latency_ms"] is not None
+
+
+def test_ohjelma_tallennetaan_ja_ladataan(tmp_path):
+    program = dspy.Predict(classifier.QueryClassification)
+    program.demos = [dspy.Example(query="kuka on x", result=SmartSearchIntent(intent="person", media_type="movie", person_name="x"))]
+    path = tmp_path / "ohjelma.json"
+    classifier.save_program(program, "predict", path, report={"predict": {"accuracy": 1.0}})
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["version"] == 1 and data["kind"] == "predict"
+
+    loaded = classifier.load_program(path)
+    assert isinstance(loaded, dspy.Predict) and not isinstance(loaded, dspy.ChainOfThought)
+    assert loaded.demos[0]["result"]["person_name"] == "x"
+
+
+def test_nopea_luokittelija_kayttaa_ohjelman_esimerkkeja():
+    program = dspy.ChainOfThought(classifier.QueryClassification)
+    program.predict.demos = [
+        dspy.Example(query=f"q{i}", reasoning="koska", result=SmartSearchIntent(intent="trending", media_type="movie"))
+        for i in range(6)
+    ]
+    fast = classifier.fast_program(program, limit=4)
+    assert isinstance(fast, dspy.Predict) and not isinstance(fast, dspy.ChainOfThought)
+    assert [d["query"] for d in fast.demos] == ["q0", "q1", "q2", "q3"]
+    assert all("reasoning" not in d for d in fast.demos)
+    assert classifier.fast_program(dspy.ChainOfThought(classifier.QueryClassification)).demos == []
+
+
+def test_rikki_tai_puuttuva_ohjelma_ei_lataudu(tmp_path):
+    assert classifier.load_program(tmp_path / "puuttuu.json") is None
+    bad = tmp_path / "rikki.json"
+    bad.write_text('{"version": 1, "kind": "tuntematon", "state": {}}', encoding="utf-8")
+    assert classifier.load_program(bad) is None
+    bad.write_text("{", encoding="utf-8")
+    assert classifier.load_program(bad) is None
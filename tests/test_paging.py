@@ -0,0 +1,158 @@
+# test_paging.py — sivutettu haku: etukäteishaku, limit ja aikainen lopetus
+#
+# Ei API-kutsuja: conftestin tmdb_routes palauttaa tekaistut sivut ja kirjaa
+# mitkä sivut pyydettiin.
+#
+# Aja: uv run pytest tests/test_paging.py -v
+
+import asyncio
+from contextlib import aclosing
+
+import httpx
+import pytest
+
+from search import tmdb
+from search.tmdb import collect_titles, get_json, iter_pages
+
+
+@pytest.fixture
+def fake_pages(tmdb_routes):
+    """Asenna sivutettu TMDB: fake_pages(total_pages, ...) → lista pyydetyistä sivuista.
+    Sivu n sisältää id:t n*100 .. n*100+per_page-1."""
+    def install(total_pages=10, per_page=20, dup_first=False) -> list:
+        def page_body(request: httpx.Request) -> dict:
+            page = int(request.url.params["page"])
+            ids = [page * 100 + i for i in range(per_page)]
+            if dup_first and page == 2:
+                ids[0] = 100  # sama kuin sivun 1 ensimmäinen
+            return {
+                "page": page,
+                "total_pages": total_pages,
+                "total_results": total_pages * per_page,
+                "results": [{"id": i, "title": f"Teos {i}"} for i in ids],
+            }
+        return tmdb_routes({"/3/": page_body}, record=lambda request: int(request.url.params["page"]))
+    return install
+
+
+async def test_sivut_jarjestyksessa(fake_pages):
+    fake_pages(total_pages=5)
+    async with httpx.AsyncClient() as client:
+        pages = [p["page"] async for p in iter_pages(client, "/discover/movie", window=2)]
+    assert pages == [1, 2, 3, 4, 5]
+
+
+async def test_max_pages_rajaa(fake_pages):
+    requested = fake_pages(total_pages=50)
+    async with httpx.AsyncClient() as client:
+        pages = [p["page"] async for p in iter_pages(client, "/discover/movie", max_pages=3)]
+    assert pages == [1, 2, 3]
+    assert sorted(requested) == [1, 2, 3]
+
+
+async def test_aikainen_lopetus_ei_hae_koko_listaa(fake_pages):
+    requested = fake_pages(total_pages=100)
+    async with httpx.AsyncClient() as client:
+        gen = iter_pages(client, "/search/movie", window=2)
+        async with aclosing(gen):
+            async for page in gen:
+                if page["page"] == 2:
+                    break
+    # sivut 1–2 luettiin, ikkunassa enintään kaksi lisää
+    assert max(requested) <= 4
+
+
+async def test_keskeytys_odottaa_perutut_haut(tmdb_routes):
+    async def slow_page(request: httpx.Request) -> dict:
+        page = int(request.url.params["page"])
+        if page > 2:
+            await asyncio.sleep(10)
+        return {"page": page, "total_pages": 5, "total_results": 100, "results": [{"id": page, "title": "A"}]}
+
+    tmdb_routes({"/3/search/movie": slow_page})
+    async with httpx.AsyncClient() as client:
+        gen = iter_pages(client, "/search/movie", window=3)
+        async with aclosing(gen):
+            async for page in gen:
+                if page["page"] == 2:
+                    break
+        others = asyncio.all_tasks() - {asyncio.current_task()}
+    assert not [t for t in others if not t.done()]
+
+
+async def test_limit_ilman_suodatinta_hakee_vain_tarvittavat(fake_pages):
+    requested = fake_pages(total_pages=100)
+    async with httpx.AsyncClient() as client:
+        titles, total = await collect_titles(client, "/discover/movie", {}, "movie", limit=30)
+    assert len(titles) == 30
+    assert total == 2000
+    assert sorted(requested) == [1, 2]
+
+
+async def test_suodatin_hakee_kunnes_tarpeeksi(fake_pages):
+    fake_pages(total_pages=100)
+    async with httpx.AsyncClient() as client:
+        titles, _ = await collect_titles(
+            client, "/search/movie", {}, "movie", limit=5, keep=lambda t: t.id % 100 == 0,
+        )
+    assert [t.id for t in titles] == [100, 200, 300, 400, 500]
+
+
+async def test_duplikaatit_pois(fake_pages):
+    fake_pages(total_pages=2, dup_first=True)
+    async with httpx.AsyncClient() as client:
+        titles, _ = await collect_titles(client, "/discover/movie", {}, "movie", limit=40)
+    ids = [t.id for t in titles]
+    assert len(ids) == len(set(ids)) == 39
+
+
+async def test_yhteinen_rajoitin(tmdb_routes, monkeypatch):
+    monkeypatch.setattr(tmdb, "MAX_CONCURRENCY", 3)
+    in_flight = peak = 0
+
+    async def movie(request: httpx.Request) -> dict:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {}
+
+    tmdb_routes({"/3/movie/": movie})
+    async with httpx.AsyncClient() as client:
+        await asyncio.gather(*[get_json(client, f"/movie/{i}") for i in range(10)])
+    assert peak == 3
+
+
+# ─────────────────────────────────────────────────────────────
+# Vastausvälimuisti
+# ─────────────────────────────────────────────────────────────
+
+async def test_sama_pyynto_valimuistista(fake_pages):
+    requested = fake_pages()
+    async with httpx.AsyncClient() as client:
+        first = await get_json(client, "/search/movie", {"query": "x", "page": 1})
+        first["results"].clear()  # kutsuja saa muokata omaa kopiotaan
+        second = await get_json(client, "/search/movie", {"page": 1, "query": "x"})
+    assert requested == [1]
+    assert len(second["results"]) == 20
+
+
+async def test_trendaavia_ja_virheita_ei_tallenneta(tmdb_routes):
+    calls = tmdb_routes({"/3/trending/all/day": {}})  # /movie/1 → 404
+    async with httpx.AsyncClient() as client:
+        for _ in range(2):
+            await get_json(client, "/trending/all/day")
+            await get_json(client, "/movie/1", raise_for_status=False)
+    assert len(calls) == 4
+
+
+async def test_muun_kielen_trendaavat_tallennetaan(tmdb_routes):
+    calls = tmdb_routes(
+        {"/3/trending/all/day": {"results": []}}, record=lambda request: request.url.params["language"],
+    )
+    async with httpx.AsyncClient() as client:
+        for _ in range(2):
+            await get_json(client, "/trending/all/day", {"language": "fi"})
+            await get_json(client, "/trending/all/day", {"language": "en"})  # tilannekuvan haku
+    assert calls == ["fi", "en", "en"]
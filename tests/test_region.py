@@ -0,0 +1,128 @@
+# test_region.py — maakohtainen referenssidata: laiska lataus, välimuisti ja discover
+#
+# Ei API-kutsuja: reitit vastaavat conftest.py:n tmdb_routes-fixturesta.
+#
+# Aja: uv run pytest tests/test_region.py -v
+
+import asyncio
+
+import httpx
+import pytest
+
+from search import memory as memory_module, tools
+from search.memory import build_index, memory, normalize_region, reference_for
+
+
+SE_PROVIDERS = {"results": [
+    {"provider_id": 8, "provider_name": "Netflix"},
+    {"provider_id": 76, "provider_name": "Viaplay"},
+]}
+DISCOVER = {"page": 1, "total_pages": 1, "total_results": 1, "results": [{"id": 7, "title": "A"}]}
+
+
+async def _providers(request):
+    await asyncio.sleep(0.01)  # samanaikaiset lataukset ehtivät kohdata
+    if request.url.params["watch_region"] == "XX":
+        return httpx.Response(500, content=b"{}")
+    return SE_PROVIDERS
+
+
+ROUTES = {
+    "/3/watch/providers/": _providers,
+    "/3/discover/movie": DISCOVER,
+}
+
+
+@pytest.fixture
+def calls(tmdb_routes, monkeypatch):
+    calls = tmdb_routes(ROUTES, record=lambda request: (request.url.path, dict(request.url.params)))
+    monkeypatch.setitem(memory, "certifications", {
+        "movie": {"FI": [{"certification": "K18", "meaning": "", "order": 5}],
+                  "SE": [{"certification": "15", "meaning": "Från 15 år", "order": 3}]},
+        "tv": {},
+    })
+    monkeypatch.setitem(memory, "movie_genres", [{"id": 28, "name": "Toiminta"}])
+    monkeypatch.setitem(memory, "index", build_index({"movie_providers": [{"provider_id": 8, "provider_name": "Netflix"}]}))
+    return calls
+
+
+# ─────────────────────────────────────────────────────────────
+# Lataus
+# ─────────────────────────────────────────────────────────────
+
+def test_maakoodi():
+    assert normalize_region(None) == "FI"
+    assert normalize_region(" se ") == "SE"
+    with pytest.raises(ValueError):
+        normalize_region("Sweden")
+
+
+async def test_oletusmaa_muistista(calls):
+    ref = await reference_for("fi")
+    assert ref["index"] is memory["index"] and ref["region"] == "FI"
+    assert calls == []
+
+
+async def test_oletusmaan_tila_pysyy_latauksen_yli(calls, monkeypatch):
+    for key in memory_module.REFERENCE_KEYS:
+        monkeypatch.setitem(memory, key, memory[key])
+    before = await reference_for(None)
+    memory_module.publish({
+        "movie_genres": [{"id": 18, "name": "Draama"}], "tv_genres": [],
+        "movie_certifications": [], "tv_certifications": [], "movie_providers": [], "tv_providers": [],
+        "certifications": {"movie": {}, "tv": {}},
+    })
+    after = await reference_for(None)
+    assert before["movie_genres"][0]["name"] == "Toiminta"
+    assert after["movie_genres"] == ({"id": 18, "name": "Draama"},)
+    assert after["index"].genre_id("movie", "draama") == 18
+    with pytest.raises(TypeError):
+        after["index"] = None
+    with pytest.raises(TypeError):
+        after["certifications"]["movie"] = {}
+
+
+async def test_muu_maa_ladataan_kerran(calls):
+    refs = await asyncio.gather(reference_for("SE"), reference_for("se"))
+    assert refs[0] is refs[1]
+    assert sorted(path for path, _ in calls) == ["/3/watch/providers/movie", "/3/watch/providers/tv"]
+    assert refs[0]["movie_certifications"][0]["certification"] == "15"
+    assert refs[0]["index"].provider("movie", "viaplay")["provider_id"] == 76
+    assert refs[0]["index"].genre_id("movie", "toiminta") == 28
+
+    await reference_for("SE")
+    assert len(calls) == 2
+
+
+async def test_epaonnistunut_lataus_yritetaan_uudelleen(calls):
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await reference_for("XX")
+    assert len(calls) == 4
+
+
+# ─────────────────────────────────────────────────────────────
+# Työkalut
+# ─────────────────────────────────────────────────────────────
+
+async def test_ikarajat_maalle(calls):
+    assert await tools.list_certifications(region="SE") == "15: Från 15 år"
+
+
+async def test_discover_maan_palvelulla(calls):
+    out = await tools.discover(watch_provider="Viaplay", region="SE")
+    params = next(p for path, p in calls if path == "/3/discover/movie")
+    assert params["with_watch_providers"] == "76"
+    assert params["watch_region"] == "SE"
+    assert "[7] A" in out
+
+
+async def test_palvelu_puuttuu_oletusmaasta(calls):
+    out = await tools.discover(watch_provider="Viaplay")
+    assert out.startswith("Tuntematon suoratoistopalvelu: 'Viaplay'")
+
+
+async def test_virheellinen_maa(calls):
+    out = await tools.list_watch_providers(region="Suomi", format="json")
+    assert out["results"] == []
+    assert "Suomi" in out["message"]
@@ -13,8 +13,13 @@
 #
 # Aja: uv run pytest tests/test_route.py -v
 
+import json
+
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
+from mcp.types import CallToolResult
+
+import server
 from search.prompts import SmartSearchIntent
 from search.smart import route
 
@@ -142,3 +147,65 @@ async def test_discover_both_types_kutsuu_kahdesti():
     call_types = [call.kwargs["type"] for call in mock_discover.call_args_list]
     assert "movie" in call_types
     assert "tv" in call_types
+
+
+# ─────────────────────────────────────────────────────────────
+# format="json" — rakenteinen vastaus
+# ─────────────────────────────────────────────────────────────
+
+async def test_format_valitetaan_tyokalulle():
+    trending_intent = make_intent(intent="trending", media_type="tv", time_window="day")
+
+    with patch("search.smart.classify_query", new=AsyncMock(return_value=trending_intent)):
+        with patch("search.smart.trending", new=AsyncMock(return_value={"results": []})) as mock_trending:
+            result = await route("mitä trendaa nyt", format="json")
+
+    mock_trending.assert_called_once_with(type="tv", time_window="day", format="json")
+    assert result == {"results": []}
+
+
+async def test_both_types_json_erillisina_avaimina():
+    both_intent = make_intent(intent="discover", both_types=True)
+
+    with patch("search.smart.classify_query", new=AsyncMock(return_value=both_intent)):
+        with patch("search.smart.discover", new=AsyncMock(return_value={"results": [1]})):
+            result = await route("toimintaa", format="json")
+
+    assert result == {"movie": {"results": [1]}, "tv": {"results": [1]}}
+
+
+async def test_luokitteluvirhe_json():
+    with patch("search.smart.classify_query", new=AsyncMock(side_effect=Exception("API-virhe"))):
+        result = await route("jotain", format="json")
+
+    assert result["results"] == []
+    assert "API-virhe" in result["message"]
+
+
+# ─────────────────────────────────────────────────────────────
+# MCP-kerros: format="json" → structuredContent + tiivis JSON-teksti
+# ─────────────────────────────────────────────────────────────
+
+DISCOVER_PAGE = {"page": 1, "total_pages": 1, "total_results": 1, "results": [
+    {"id": 7, "title": "A", "release_date": "2001-01-01", "vote_average": 7.0, "vote_count": 100, "overview": "x"},
+]}
+
+
+async def test_mcp_json_rakenteisena_vastauksena(tmdb_routes):
+    tmdb_routes({"/3/discover/movie": DISCOVER_PAGE})
+    result = await server.mcp.call_tool("discover", {"min_votes": 0, "format": "json"})
+
+    assert isinstance(result, CallToolResult) and not result.isError
+    data = result.structuredContent["result"]
+    assert data["header"] == "Hakutulos: 1 osumaa (näytetään 1)"
+    assert [r["id"] for r in data["results"]] == [7]
+    assert result.content[0].text == json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+async def test_mcp_teksti_oletuksena(tmdb_routes):
+    tmdb_routes({"/3/discover/movie": DISCOVER_PAGE})
+    content, structured = await server.mcp.call_tool("discover", {"min_votes": 0})
+
+    assert content[0].text.startswith("Hakutulos: 1 osumaa")
+    assert "[7] A (2001)" in content[0].text
+    assert structured == {"result": content[0].text}
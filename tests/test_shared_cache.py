@@ -0,0 +1,174 @@
+# test_shared_cache.py — workerien yhteinen SQLite-välimuisti ja HTTP-sovelluksen elinkaari
+#
+# "Toinen prosessi" = toinen TTLCache samaan tiedostoon: jaettu taso on ainoa yhteys.
+#
+# Aja: uv run pytest tests/test_shared_cache.py -v
+
+import fcntl
+import json
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+import server
+from search import shared_cache
+from search.cache import TTLCache
+from search.memory import memory
+from search.prompts import SmartSearchIntent
+from search.shared_cache import SharedStore, TieredCache
+from search.tmdb import get_json
+
+PAGE = json.dumps({"page": 1, "total_pages": 1, "total_results": 1, "results": [{"id": 1, "title": "A"}]}).encode()
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SharedStore(tmp_path / "shared.sqlite")
+    yield s
+    s.close()
+
+
+def _worker(store: SharedStore, ns: str = "keyword_cache") -> TieredCache:
+    return TieredCache(TTLCache(maxsize=10, ttl=60), store, ns, *shared_cache.CODECS[ns])
+
+
+# ─────────────────────────────────────────────────────────────
+# Jaettu taso
+# ─────────────────────────────────────────────────────────────
+
+
+def test_toinen_worker_nakee_rivin(store):
+    a, b = _worker(store), _worker(store)
+    a.set("dystopia", "4565")
+    store.flush()
+    assert b.get("dystopia") == "4565"
+    assert len(b.local) == 1  # kopioitu omaan välimuistiin
+    assert "puuttuu" not in b
+    assert store.stats()["hits"] == 1
+
+
+def test_vanhentunut_rivi_on_varana(store):
+    a, b = _worker(store, "response_cache"), _worker(store, "response_cache")
+    a.set(("/movie/1", ()), PAGE, ttl=-1)
+    store.flush()
+    assert b.get(("/movie/1", ())) is None
+    assert b.get_entry(("/movie/1", ())) == (PAGE, False)
+
+
+def test_intent_sailyy_jaetussa_tasossa(store):
+    a, b = _worker(store, "intent_cache"), _worker(store, "intent_cache")
+    a.set("kuka on tom hanks", SmartSearchIntent(intent="person", media_type="movie", person_name="Tom Hanks"))
+    store.flush()
+    got = b.get("kuka on tom hanks")
+    assert got.intent == "person" and got.person_name == "Tom Hanks"
+
+
+def test_siivous_rajaa_rivit(store, monkeypatch):
+    monkeypatch.setattr(shared_cache, "MAX_ROWS", 5)
+    monkeypatch.setattr(shared_cache, "PRUNE_EVERY", 10)
+    w = _worker(store)
+    for i in range(10):
+        w.set(f"kw{i}", str(i), ttl=i + 1)
+    store.flush()
+    assert store.stats()["rows"] == 5
+    assert w.local.get("kw0") == "0" and _worker(store).get("kw0") is None  # lyhin kesto poistui ensin
+
+
+def test_kytkenta_ja_irrotus(tmp_path):
+    local = {ns: TTLCache() for ns in shared_cache.CODECS}
+    assert shared_cache.attach(local, path=None) is None  # ei polkua, ei TMDB_SHARED_CACHE:a
+    try:
+        shared_cache.attach(local, tmp_path / "shared.sqlite")
+        shared_cache.attach(local, tmp_path / "shared.sqlite")
+        assert all(isinstance(local[ns], TieredCache) and isinstance(local[ns].local, TTLCache)
+                   for ns in shared_cache.CODECS)
+    finally:
+        shared_cache.detach(local)
+    assert all(type(local[ns]) is TTLCache for ns in shared_cache.CODECS)
+    assert shared_cache.stats() is None
+
+
+def test_kirjoitus_ei_odota_lukittua_tiedostoa(store):
+    other = sqlite3.connect(store.path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")  # toinen worker pitää kirjoituslukkoa
+    try:
+        started = time.perf_counter()
+        w = _worker(store)
+        w.set("kauhu", "315058")
+        assert w.get("kauhu") == "315058"  # oma taso
+        assert _worker(store).get("kauhu") is None  # lukittu → ohitus, ei odotusta
+        assert time.perf_counter() - started < 0.5
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    store.flush()
+    assert _worker(store).get("kauhu") == "315058"
+
+
+def test_vain_yksi_johtaja(tmp_path, monkeypatch):
+    path = tmp_path / "shared.sqlite"
+    monkeypatch.setattr(shared_cache, "_store", SharedStore(path))
+    try:
+        assert shared_cache.is_leader()
+        assert shared_cache.is_leader()  # sama prosessi pysyy johtajana
+        with open(f"{path}.leader", "a") as other:  # toisen workerin näkökulma
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    finally:
+        shared_cache.detach({ns: TTLCache() for ns in shared_cache.CODECS})
+    assert shared_cache._leader_lock is None
+
+
+async def test_tmdb_vastaus_haetaan_kerran_workerien_kesken(tmdb_routes, tmp_path, monkeypatch):
+    calls = tmdb_routes({"/3/movie/1": lambda request: httpx.Response(200, content=PAGE)})
+    for ns in shared_cache.CODECS:
+        monkeypatch.setitem(memory, ns, memory[ns])
+    shared_cache.attach(memory, tmp_path / "shared.sqlite")
+    try:
+        async with httpx.AsyncClient() as client:
+            await get_json(client, "/movie/1")
+            shared_cache._store.flush()
+            memory["response_cache"].clear()  # toinen worker: oma taso tyhjä
+            data = await get_json(client, "/movie/1")
+    finally:
+        shared_cache.detach(memory)
+    assert data["results"][0]["title"] == "A"
+    assert calls == ["/3/movie/1"]
+
+
+# ─────────────────────────────────────────────────────────────
+# HTTP-sovellus
+# ─────────────────────────────────────────────────────────────
+
+
+async def test_palvelut_kaynnistyvat_kerran_prosessille(monkeypatch):
+    started = []
+
+    @asynccontextmanager
+    async def fake_services():
+        started.append("services")
+        yield
+
+    monkeypatch.setattr(server, "services", fake_services)
+    monkeypatch.setattr(server, "_app_services", False)
+    monkeypatch.setattr(server.mcp, "_session_manager", None)
+    monkeypatch.setattr(server, "STATELESS", True)
+    monkeypatch.setattr(server.mcp.settings, "stateless_http", False)
+    app = server.http_app()
+    async with app.router.lifespan_context(app):
+        async with server.lifespan(server.mcp):  # MCP-istunto: ei uudelleenkäynnistystä
+            pass
+        async with server.lifespan(server.mcp):
+            pass
+    assert started == ["services"]
+    assert server.mcp.settings.stateless_http is True
+
+
+def test_metriikat_nayttavat_workerin_ja_jaetun_tason():
+    data = server.metrics()
+    assert data["worker"] > 0
+    assert data["shared_cache"] is None
+    assert data["caches"]["keyword_cache"]["entries"] >= 0
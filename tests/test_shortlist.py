@@ -0,0 +1,87 @@
+# test_shortlist.py — rerank-kandidaattien karsinta ja tokenibudjetti
+#
+# Aja: uv run pytest tests/test_shortlist.py -v
+
+from search.models import Title
+from search.shortlist import (
+    CHARS_PER_TOKEN, OVERVIEW_MIN, RERANK_TOP_K, budgets, candidate_lines, dedupe, estimate_tokens,
+    reference_lines, shortlist,
+)
+
+
+def _t(id, title, year="2000", overview="", genres=(), votes=100):
+    return Title(id=id, media_type="movie", title=title, year=year, overview=overview,
+                 genre_ids=tuple(genres), vote_count=votes)
+
+
+def test_duplikaatit_poistetaan_idlla_ja_nimella():
+    items = [_t(1, "Alien", "1979"), _t(1, "Alien", "1979"), _t(2, "alien", "1979"), _t(3, "Alien", "1986")]
+    assert [t.id for t in dedupe(items)] == [1, 3]
+
+
+def test_pieni_joukko_ei_karsiudu():
+    items = [_t(i, f"T{i}") for i in range(5)]
+    assert shortlist(items, k=10) == items
+
+
+def test_esipisteytys_suosii_genrea_ja_teemasanoja():
+    noise = [_t(i, f"Komedia {i}", genres=(35,), overview="a funny wedding story") for i in range(10)]
+    good = _t(99, "Dark City", genres=(878, 53), overview="A dark dystopian mystery in a city without sun.")
+    kept = shortlist([*noise, good], ref_genres=[878, 53], cues="dystopia dark", k=3)
+    assert len(kept) == 3
+    assert kept[0].id == 99
+
+
+def test_kuvaukset_lyhennetaan_budjettiin():
+    items = [_t(i, f"Teos {i}", overview="sana " * 60) for i in range(20)]
+    text = candidate_lines(items, 2000)
+    assert len(text) <= 2000
+    assert text.count("\n") == 19
+    assert all(" - " in line for line in text.splitlines())
+
+
+def test_liian_pieni_budjetti_pudottaa_kuvaukset():
+    items = [_t(i, f"Teos {i}", overview="sana " * 60) for i in range(20)]
+    text = candidate_lines(items, 20 * (len("[10] Teos 10 (2000)") + 1) + 20 * (OVERVIEW_MIN - 10))
+    assert " - " not in text
+
+
+def test_lyhyet_kuvaukset_mahtuvat_kokonaan():
+    text = candidate_lines([_t(1, "A", overview="Lyhyt kuvaus.")], 1000)
+    assert text == "[1] A (2000) - Lyhyt kuvaus."
+
+
+def test_referenssirivit_teemoineen():
+    text = reference_lines([{"name": "Inception", "overview": "Dreams " * 100, "kw_names": ["dream", "heist"]}], 400)
+    assert text.startswith("1. Inception — teemat: dream, heist - Dreams")
+    assert len(text) <= 400
+
+
+def test_budjetti_ja_tokeniarvio():
+    refs, cands = budgets(1000)
+    assert refs + cands == 1000 * CHARS_PER_TOKEN and refs > 0
+    assert budgets(1000, with_references=False)[0] == 0
+    assert estimate_tokens("a" * 40, "b" * 40) == 80 // CHARS_PER_TOKEN
+
+
+async def test_rerank_lahettaa_karsitut_ja_kirjaa_tokenit(monkeypatch):
+    from types import SimpleNamespace
+
+    from search import llm, rerank
+
+    sent = {}
+
+    def fake_reranker(**kwargs):
+        sent.update(kwargs)
+        return SimpleNamespace(result=SimpleNamespace(ids=[3, 1]),
+                               get_lm_usage=lambda: {"m": {"prompt_tokens": 500, "completion_tokens": 10}})
+
+    monkeypatch.setattr(rerank, "_reranker", fake_reranker)
+    monkeypatch.setattr(llm, "_usage", {})
+    items = [_t(i, f"Teos {i}", overview="kuvaus " * 40) for i in range(50)]
+    ids = await rerank.rerank_candidates(
+        [{"name": "Ref", "overview": "x", "kw_names": ["heist"], "genre_ids": (28,)}], ["heist"], items,
+    )
+    assert ids == [3, 1]
+    assert len(sent["candidates"].splitlines()) == RERANK_TOP_K
+    assert llm.usage_stats()["rerank_reference"]["prompt_tokens"] == 500
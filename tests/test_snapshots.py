@@ -0,0 +1,56 @@
+# test_snapshots.py — trendaavien taustapäivitys ja muutosilmoitukset
+#
+# Ei API-kutsuja: reitit vastaavat conftest.py:n tmdb_routes-fixturesta.
+#
+# Aja: uv run pytest tests/test_snapshots.py -v
+
+import pytest
+
+from search.snapshots import TrendingSnapshots
+
+
+@pytest.fixture
+def upstream(tmdb_routes):
+    """Palauttaa listan pyydetyistä poluista; ids määrää mitä TMDB "palauttaa"."""
+    state = {"ids": [1, 2]}
+
+    def trending(request):
+        return {"results": [{"id": i, "title": f"T{i}", "media_type": "movie"} for i in state["ids"]]}
+
+    state["calls"] = tmdb_routes({"/3/trending/": trending})
+    return state
+
+
+async def test_tuore_tilannekuva_ilman_kutsua(upstream):
+    feed = TrendingSnapshots(interval=3600)
+    await feed.refresh_all()
+    assert len(upstream["calls"]) == 6          # 3 tyyppiä × 2 aikaikkunaa
+    snap = await feed.get("movie", "day")
+    assert [r.id for r in snap.results] == [1, 2]
+    assert len(upstream["calls"]) == 6
+
+
+async def test_ilmoitus_vain_muuttuneista(upstream):
+    feed = TrendingSnapshots(interval=3600)
+    changed_uris = []
+
+    async def listener(snap):
+        changed_uris.append(snap.uri)
+
+    feed.on_change(listener)
+    await feed.refresh_all()
+    assert len(changed_uris) == 6               # ensimmäinen haku = muutos
+    changed_uris.clear()
+    await feed.refresh_all()
+    assert changed_uris == []
+    upstream["ids"] = [2, 1]
+    await feed.refresh_all()
+    assert "tmdb://trending/movie/week" in changed_uris
+
+
+async def test_ilman_taustapaivitysta_aina_live(upstream):
+    feed = TrendingSnapshots(interval=0)
+    await feed.get("tv", "week")
+    await feed.get("tv", "week")
+    assert upstream["calls"] == ["/3/trending/tv/week"] * 2
+    assert feed.start() is None
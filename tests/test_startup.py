@@ -0,0 +1,40 @@
+# test_startup.py — palvelin käynnistyy ilman DSPy:tä, kielimallipino tuodaan laiskasti
+#
+# Tuonti tarkistetaan erillisessä prosessissa: testiajon aiemmat tuonnit eivät
+# saa vaikuttaa tulokseen.
+#
+# Aja: uv run pytest tests/test_startup.py -v
+
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+from search import llm
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_server_ei_tuo_dspyta():
+    code = "import server, sys; print('dspy' in sys.modules, 'litellm' in sys.modules)"
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", code], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "False False"
+
+
+async def test_luokittelija_tuodaan_ensimmaisella_kutsulla(monkeypatch):
+    fake = type("M", (), {"classify_query": AsyncMock(return_value="intent")})
+    imported = []
+
+    def fake_import(name):
+        imported.append(name)
+        return fake
+
+    monkeypatch.delitem(sys.modules, "search.classifier", raising=False)
+    monkeypatch.setattr(llm.importlib, "import_module", fake_import)
+    assert await llm.classify_query("q", {}) == "intent"
+    assert imported == ["search.classifier"]
+
+
+def test_esilataus_pois():
+    assert llm.preload(enabled=False) is None
@@ -0,0 +1,118 @@
+# test_warmup.py — välimuistien lämmitys kyselylokista
+#
+# Ei API-kutsuja: route ja search_by_title korvataan AsyncMockeilla.
+#
+# Aja: uv run pytest tests/test_warmup.py -v
+
+import json
+from unittest.mock import AsyncMock, patch
+
+from search import memory as memory_module
+from search import warmup
+from search.memory import log_query
+from search.prompts import SmartSearchIntent
+from search.smart import route
+
+
+def write_log(rows):
+    with open(memory_module.QUERY_LOG, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+# ─────────────────────────────────────────────────────────────
+# Lokin luku
+# ─────────────────────────────────────────────────────────────
+
+def test_yleisimmat_kyselyt_normalisoituna():
+    for q in ["Parhaat  Gundam-sarjat", "parhaat gundam-sarjat", "trendaa", "parhaat Gundam-sarjat"]:
+        log_query(q, "franchise")
+    log_query("trendaa", "trending")
+    assert warmup.top_queries(5) == ["Parhaat Gundam-sarjat", "trendaa"]
+    assert warmup.top_queries(1) == ["Parhaat Gundam-sarjat"]
+
+
+def test_rikkinainen_rivi_ohitetaan():
+    write_log([{"query": "a"}])
+    with open(memory_module.QUERY_LOG, "a", encoding="utf-8") as f:
+        f.write('{"query": "keske')
+    assert warmup.top_queries(5) == ["a"]
+
+
+def test_nimet_myos_debug_logista(tmp_path):
+    write_log([{"query": "kerro Inceptionista", "intent": "lookup", "title": "Inception", "media_type": "movie"}])
+    border = "─" * 60
+    intent = SmartSearchIntent(intent="similar_to", media_type="movie", reference_titles=["Dune", "Alien"])
+    debug = tmp_path / "debug.log"
+    debug.write_text(
+        f"\n{border}\n[LOG] INTENT (postprocess jälkeen)\n{border}\n{intent.model_dump_json(indent=2)}\n" * 2,
+        encoding="utf-8",
+    )
+    assert warmup.top_titles(5, debug_log=str(debug)) == [("Dune", "movie"), ("Inception", "movie")]
+
+
+def test_nimet_sailyttavat_mediatyypin():
+    write_log([
+        {"query": "the office", "title": "The Office", "media_type": "tv"},
+        {"query": "the office sarja", "title": "the office", "media_type": "tv"},
+        {"query": "the office elokuva", "title": "The Office", "media_type": "movie"},
+        {"query": "dune", "title": "Dune", "media_type": "all"},
+    ])
+    assert warmup.top_titles(5, debug_log="/ei/ole.log") == [
+        ("The Office", "tv"), ("The Office", "movie"), ("Dune", "movie"),
+    ]
+
+
+def test_ei_lokia():
+    assert warmup.top_queries(5) == []
+
+
+# ─────────────────────────────────────────────────────────────
+# Toisto
+# ─────────────────────────────────────────────────────────────
+
+async def test_toisto_jatkuu_virheen_jalkeen(tmp_path, monkeypatch):
+    monkeypatch.setattr(warmup, "_LOG_FILE", str(tmp_path / "ei-ole.log"))
+    write_log([
+        {"query": "a", "title": None},
+        {"query": "b", "title": "Breaking Bad", "media_type": "tv"},
+    ])
+    fake_route = AsyncMock(side_effect=[RuntimeError("luokittelija alhaalla"), "ok"])
+    fake_title = AsyncMock(return_value="ok")
+    with patch("search.smart.route", new=fake_route), patch("search.tools.search_by_title", new=fake_title):
+        result = await warmup.warm_up(top=10, rate=0)
+    assert result == {"queries": 2, "titles": 1, "errors": 1}
+    assert [c.kwargs for c in fake_route.call_args_list] == [{"record": False}] * 2
+    fake_title.assert_called_once_with("Breaking Bad", type="tv")
+
+
+def test_ei_lammitysta_oletuksena():
+    assert warmup.start(top=0) is None
+
+
+async def test_route_kirjaa_kyselyn():
+    intent = SmartSearchIntent(intent="lookup", media_type="movie", title="Inception")
+    with patch("search.smart.classify_query", new=AsyncMock(return_value=intent)):
+        with patch("search.smart.search_by_title", new=AsyncMock(return_value="ok")):
+            await route("kerro Inceptionista")
+            await route("kerro Inceptionista", record=False)
+    with open(memory_module.QUERY_LOG, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert [(r["query"], r["intent"], r["title"]) for r in rows] == [("kerro Inceptionista", "lookup", "Inception")]
+
+
+async def test_intent_valimuisti_palauttaa_kopion(monkeypatch):
+    from search import classifier
+
+    calls = []
+
+    def fake_classify(query, inputs, fast=False):
+        calls.append(query)
+        return SmartSearchIntent(intent="similar_to", media_type="movie", reference_titles=["Dune"])
+
+    monkeypatch.setattr(classifier, "_classify_sync", fake_classify)
+    first = await classifier.classify_query("Kuten  Dune", {})
+    first.watch_providers = ["Netflix"]  # route muokkaa intentiä
+    second = await classifier.classify_query("kuten dune", {})
+    assert calls == ["Kuten  Dune"]
+    assert second.watch_providers is None